@@ -3,7 +3,7 @@ import os
 from pathlib import Path
 
 from flask import Flask
-from flask_wtf.csrf import CSRFProtect
+from sqlalchemy import event
 
 from config import (
     SECRET_KEY,
@@ -12,6 +12,14 @@ from config import (
     UPLOAD_FOLDER,
     DATABASE_DIR,
     QR_UPLOAD_FOLDER,
+    REPORT_CACHE_MAX_BYTES,
+    CACHE_DIR,
+    ARCHIVE_DIR,
+    LOGBOOK_ARCHIVE_AFTER_DAYS,
+    JOB_WORKERS,
+    KIOSK_API_KEYS,
+    SURVEY_WRITE_BEHIND,
+    SURVEY_BUFFER_MAX_PENDING,
     MAIL_SERVER,
     MAIL_PORT,
     MAIL_USE_TLS,
@@ -19,7 +27,7 @@ from config import (
     MAIL_PASSWORD,
     MAIL_DEFAULT_SENDER,
 )
-from extensions import db, login_manager, mail
+from extensions import csrf, db, login_manager, mail
 
 # Ensure we use Postgres on Railway: env vars are sometimes not visible at config import
 _db_url = (
@@ -47,12 +55,21 @@ if "sqlite" in SQLALCHEMY_DATABASE_URI.lower():
     DATABASE_DIR.mkdir(parents=True, exist_ok=True)
 Path(UPLOAD_FOLDER).mkdir(parents=True, exist_ok=True)
 Path(QR_UPLOAD_FOLDER).mkdir(parents=True, exist_ok=True)
+Path(CACHE_DIR).mkdir(parents=True, exist_ok=True)
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = SECRET_KEY
 app.config["SQLALCHEMY_DATABASE_URI"] = str(SQLALCHEMY_DATABASE_URI).replace("\\", "/")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = SQLALCHEMY_TRACK_MODIFICATIONS
 app.config["UPLOAD_FOLDER"] = str(UPLOAD_FOLDER)
+app.config["REPORT_CACHE_MAX_BYTES"] = REPORT_CACHE_MAX_BYTES
+app.config["CACHE_DIR"] = str(CACHE_DIR)
+app.config["ARCHIVE_DIR"] = str(ARCHIVE_DIR)  # created by the first archive run
+app.config["LOGBOOK_ARCHIVE_AFTER_DAYS"] = LOGBOOK_ARCHIVE_AFTER_DAYS
+app.config["JOB_WORKERS"] = JOB_WORKERS
+app.config["KIOSK_API_KEYS"] = KIOSK_API_KEYS
+app.config["SURVEY_WRITE_BEHIND"] = SURVEY_WRITE_BEHIND
+app.config["SURVEY_BUFFER_MAX_PENDING"] = SURVEY_BUFFER_MAX_PENDING
 app.config["MAIL_SERVER"] = MAIL_SERVER
 app.config["MAIL_PORT"] = MAIL_PORT
 app.config["MAIL_USE_TLS"] = MAIL_USE_TLS
@@ -62,7 +79,7 @@ app.config["MAIL_DEFAULT_SENDER"] = MAIL_DEFAULT_SENDER
 
 db.init_app(app)
 mail.init_app(app)
-csrf = CSRFProtect(app)
+csrf.init_app(app)
 login_manager.init_app(app)
 login_manager.login_view = "auth.login"
 login_manager.login_message = "Please log in to access this page."
@@ -74,16 +91,35 @@ from models import (
     RequestStatusLog,
     Ticket,
     Appointment,
+    AppointmentBlackout,
+    AppointmentSlotCapacity,
+    AppointmentSlotLoad,
     Survey,
     SurveyQuestion,
+    SurveyQuestionStat,
     SurveyResponse,
     LogbookEntry,
+    LogbookEventKey,
     MonthlyReport,
     ImportLog,
     QRResource,
+    DashboardCounter,
+    DailyActivityRollup,
+    Job,
+    NumberSequence,
 )
 
 
+def _sqlite_wal(dbapi_conn, _record):
+    """WAL journal for SQLite: a long read (e.g. a report streaming its rows) does not block other connections' writes."""
+    dbapi_conn.execute("PRAGMA journal_mode=WAL")
+
+
+if "sqlite" in app.config["SQLALCHEMY_DATABASE_URI"].lower():
+    with app.app_context():
+        event.listen(db.engine, "connect", _sqlite_wal)
+
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
@@ -132,11 +168,63 @@ def _run_migrations():
         pass
 
 
+# Indexes since replaced by ones of another shape (and name); dropped from existing databases
+_REPLACED_INDEXES = {
+    "appointments": ("ix_appointments_status_date", "ix_appointments_type_date", "ix_appointments_user_date"),
+}
+
+
+def _backfill_defaults():
+    """Give rows older than a column default the value new rows get. Works on all dialects."""
+    from sqlalchemy import update
+    # The appointment list pages on preferred_time; NULL would not compare in its keyset
+    db.session.execute(update(Appointment).where(Appointment.preferred_time.is_(None)).values(preferred_time=""))
+    db.session.commit()
+
+
+def _ensure_indexes():
+    """Create model indexes missing from tables that already existed (create_all skips those). Works on all dialects."""
+    from sqlalchemy import Column, Index, MetaData, Table, inspect
+    inspector = inspect(db.engine)
+    for table_name, names in _REPLACED_INDEXES.items():
+        existing = {ix["name"] for ix in inspector.get_indexes(table_name)}
+        for name in existing.intersection(names):
+            try:
+                Index(name, Table(table_name, MetaData(), Column("id")).c.id).drop(bind=db.engine)
+            except Exception:
+                pass
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=db.engine, checkfirst=True)
+            except Exception:
+                pass
+
+
 def init_db():
     """Create all database tables and seed default admin user."""
     with app.app_context():
         db.create_all()
         _run_migrations()
+        _backfill_defaults()
+        _ensure_indexes()
+        from services.activity_rollup import ensure_backfilled
+        ensure_backfilled()
+        from services import search_index
+        search_index.ensure_schema()
+        search_index.ensure_backfilled()
+        from services import presence
+        presence.warm()
+        from services import slot_capacity
+        slot_capacity.ensure_backfilled()
+        from services import survey_stats
+        survey_stats.ensure_backfilled()
+        # Submissions left in the write-behind buffer by a worker that could not flush before exiting
+        from services import survey_submissions
+        survey_submissions.flush()
+        # Pick up jobs queued before a restart and requeue ones orphaned by a crashed worker
+        from services.jobs import recover_jobs
+        recover_jobs()
         if not User.query.filter_by(username="admin").first():
             admin = User(
                 username="admin",
@@ -162,6 +250,7 @@ from routes.tickets import tickets_bp
 from routes.surveys import surveys_bp
 from routes.logbook import logbook_bp
 from routes.reports import reports_bp
+from routes.search import search_bp
 
 app.register_blueprint(auth_bp, url_prefix="/auth")
 app.register_blueprint(dashboard_bp, url_prefix="/")
@@ -173,6 +262,11 @@ app.register_blueprint(tickets_bp, url_prefix="/tickets")
 app.register_blueprint(surveys_bp, url_prefix="/surveys")
 app.register_blueprint(logbook_bp, url_prefix="/logbook")
 app.register_blueprint(reports_bp, url_prefix="/reports")
+app.register_blueprint(search_bp, url_prefix="/search")
+
+from commands import register_commands
+
+register_commands(app)
 
 
 @app.route("/")
@@ -0,0 +1,70 @@
+"""Flask CLI maintenance commands (run with: flask --app app <command>)."""
+import click
+
+
+def register_commands(app):
+    """Attach maintenance commands to the app's CLI."""
+
+    @app.cli.command("reconcile-counters")
+    def reconcile_counters():
+        """Rebuild dashboard counters from the source tables."""
+        from services.dashboard_counters import reconcile
+        values = reconcile()
+        click.echo(
+            "Dashboard counters reconciled: "
+            f"pending={values['pending_requests']} completed={values['completed_requests']} "
+            f"open_tickets={values['open_tickets']} visitors_today={values['visitors_today']}"
+        )
+
+    @app.cli.command("rebuild-rollup")
+    def rebuild_rollup():
+        """Recompute the daily activity rollup from all history."""
+        from services.activity_rollup import rebuild
+        buckets = rebuild()
+        click.echo(f"Daily activity rollup rebuilt: {buckets} day/status/type buckets.")
+
+    @app.cli.command("rebuild-search")
+    def rebuild_search():
+        """Recreate the full-text search index from the source tables."""
+        from services.search_index import backend, rebuild
+        if backend() is None:
+            click.echo("This database has no full-text backend; search uses LIKE queries and needs no index.")
+            return
+        records = rebuild()
+        click.echo(f"Search index rebuilt ({backend()}): {records} records.")
+
+    @app.cli.command("rebuild-appointment-slots")
+    def rebuild_appointment_slots():
+        """Recompute booked places per appointment slot from the appointments table."""
+        from services.slot_capacity import rebuild
+        rows = rebuild()
+        click.echo(f"Appointment slot loads rebuilt: {rows} day/slot/type rows.")
+
+    @app.cli.command("rebuild-survey-stats")
+    def rebuild_survey_stats():
+        """Recompute per-question survey aggregates from all responses."""
+        from services.survey_stats import rebuild
+        rows = rebuild()
+        click.echo(f"Survey question stats rebuilt: {rows} question/rating rows.")
+
+    @app.cli.command("flush-survey-buffer")
+    @click.option("--retry-dead-letters", is_flag=True, help="First put submissions that kept failing back in the buffer.")
+    def flush_survey_buffer(retry_dead_letters):
+        """Write all buffered survey submissions to the database."""
+        from services.survey_submissions import dead_letters, flush, pending, retry_dead_letters as retry
+        if retry_dead_letters:
+            click.echo(f"Requeued {retry()} dead-lettered survey submissions.")
+        moved = flush()
+        click.echo(f"Flushed {moved} buffered survey submissions; {pending()} still pending, {dead_letters()} dead-lettered.")
+
+    @app.cli.command("archive-logbook")
+    @click.option("--days", type=int, default=None, help="Archive months older than this many days (default LOGBOOK_ARCHIVE_AFTER_DAYS).")
+    @click.option("--dry-run", is_flag=True, help="Only show what would be archived.")
+    def archive_logbook(days, dry_run):
+        """Move old logbook months into compressed files under ARCHIVE_DIR."""
+        from services.logbook_archive import archive
+        done = archive(days, dry_run=dry_run)
+        verb = "Would archive" if dry_run else "Archived"
+        for label, rows in done:
+            click.echo(f"{verb} {label}: {rows} entries")
+        click.echo(f"{verb} {sum(n for _l, n in done)} entries in {len(done)} months.")
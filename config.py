@@ -24,6 +24,22 @@ QR_UPLOAD_FOLDER = UPLOAD_FOLDER / "qr"  # Created on init
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
 ALLOWED_EXTENSIONS = {"csv", "xlsx", "xls"}
 ALLOWED_IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp"}
+# Generated report files are cached under uploads/reports; least recently used files are removed past this size
+REPORT_CACHE_MAX_BYTES = int(os.environ.get("REPORT_CACHE_MAX_MB", "200")) * 1024 * 1024
+# Local SQLite cache files shared by the gunicorn workers of one instance (e.g. public tracking lookups)
+CACHE_DIR = Path(os.environ.get("CACHE_DIR", "").strip() or BASE_DIR / "cache")
+# Compressed monthly files of archived logbook entries; keep on persistent storage (like the database)
+ARCHIVE_DIR = Path(os.environ.get("ARCHIVE_DIR", "").strip() or DATABASE_DIR / "archive")
+# `flask archive-logbook` moves whole months older than this many days out of logbook_entries
+LOGBOOK_ARCHIVE_AFTER_DAYS = int(os.environ.get("LOGBOOK_ARCHIVE_AFTER_DAYS", "365"))
+# Public survey submissions go to a durable buffer in CACHE_DIR and are written to the database in batches
+SURVEY_WRITE_BEHIND = os.environ.get("SURVEY_WRITE_BEHIND", "0").lower() in ("1", "true", "yes")
+# Past this many buffered submissions, new ones are written directly (backpressure instead of unbounded growth)
+SURVEY_BUFFER_MAX_PENDING = int(os.environ.get("SURVEY_BUFFER_MAX_PENDING", "20000"))
+# Keys accepted from kiosks/QR scanners posting to /logbook/api/events (comma-separated; "Authorization: Bearer <key>")
+KIOSK_API_KEYS = [k.strip() for k in os.environ.get("KIOSK_API_KEYS", "").split(",") if k.strip()]
+# Background job threads per web worker (report generation/rendering)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
 DEBUG = os.environ.get("FLASK_DEBUG", "0").lower() in ("1", "true", "yes")
 
 # Optional: email on registration (welcome message). Leave unset to skip sending.
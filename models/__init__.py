@@ -2,12 +2,16 @@
 from .user import User
 from .document_request import DocumentRequest, RequestStatusLog
 from .ticket import Ticket
-from .appointment import Appointment
-from .survey import Survey, SurveyQuestion, SurveyResponse
-from .logbook import LogbookEntry
+from .appointment import Appointment, AppointmentBlackout, AppointmentSlotCapacity, AppointmentSlotLoad
+from .survey import Survey, SurveyQuestion, SurveyQuestionStat, SurveyResponse
+from .logbook import LogbookEntry, LogbookEventKey
 from .report import MonthlyReport
 from .import_log import ImportLog
 from .qr_resource import QRResource
+from .dashboard_counter import DashboardCounter
+from .activity_rollup import DailyActivityRollup
+from .job import Job
+from .number_sequence import NumberSequence
 
 __all__ = [
     "User",
@@ -15,11 +19,20 @@ __all__ = [
     "RequestStatusLog",
     "Ticket",
     "Appointment",
+    "AppointmentBlackout",
+    "AppointmentSlotCapacity",
+    "AppointmentSlotLoad",
     "Survey",
     "SurveyQuestion",
+    "SurveyQuestionStat",
     "SurveyResponse",
     "LogbookEntry",
+    "LogbookEventKey",
     "MonthlyReport",
     "ImportLog",
     "QRResource",
+    "DashboardCounter",
+    "DailyActivityRollup",
+    "Job",
+    "NumberSequence",
 ]
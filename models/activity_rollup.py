@@ -0,0 +1,19 @@
+"""Daily activity rollup model - per-day counts per module, status and type."""
+from extensions import db
+
+
+class DailyActivityRollup(db.Model):
+    """Pre-aggregated daily counts used by charts and monthly reports."""
+
+    __tablename__ = "daily_activity_rollup"
+    __table_args__ = (
+        db.UniqueConstraint("day", "module", "status", "kind", name="uq_daily_activity_rollup_key"),
+        db.Index("ix_daily_activity_rollup_module_day", "module", "day"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    module = db.Column(db.String(30), nullable=False)  # document_requests, tickets, logbook, appointments
+    status = db.Column(db.String(50), nullable=False, default="")
+    kind = db.Column(db.String(100), nullable=False, default="")  # document type, priority, appointment type
+    count = db.Column(db.Integer, nullable=False, default=0)
@@ -7,6 +7,15 @@ class Appointment(db.Model):
     """Online appointment scheduling."""
 
     __tablename__ = "appointments"
+    __table_args__ = (
+        # List view: optional filter, then rows in keyset order (preferred_date, preferred_time, id)
+        db.Index("ix_appointments_status_slot", "status", "preferred_date", "preferred_time", "id"),
+        db.Index("ix_appointments_type_slot", "appointment_type", "preferred_date", "preferred_time", "id"),
+        db.Index("ix_appointments_user_slot", "user_id", "preferred_date", "preferred_time", "id"),
+        db.Index("ix_appointments_date_slot", "preferred_date", "preferred_time", "id"),
+        # Calendar: range scan on date, rows come out in slot order
+        db.Index("ix_appointments_date_time_status", "preferred_date", "preferred_time", "status"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
@@ -15,9 +24,48 @@ class Appointment(db.Model):
     requester_phone = db.Column(db.String(20), nullable=True)
     appointment_type = db.Column(db.String(50), nullable=False)  # Online, Walk-in, Consultation, Counseling, Others
     purpose = db.Column(db.String(200), nullable=True)
-    preferred_date = db.Column(db.Date, nullable=False)
-    preferred_time = db.Column(db.String(20), nullable=True)  # e.g. "09:00", "14:00"
+    preferred_date = db.Column(db.Date, nullable=False, index=True)
+    preferred_time = db.Column(db.String(20), nullable=True, default="")  # e.g. "09:00", "14:00"; '' = no slot (never NULL)
     status = db.Column(db.String(50), default="Pending")  # Pending, Approved, Rejected, Completed, Cancelled
     admin_notes = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class AppointmentSlotCapacity(db.Model):
+    """How many bookings a time slot takes. '' in appointment_type or slot means "all types" / "every slot";
+    the most specific row wins. Capacity 0 closes the slot."""
+
+    __tablename__ = "appointment_slot_capacities"
+    __table_args__ = (db.UniqueConstraint("appointment_type", "slot", name="uq_appointment_slot_capacity"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    appointment_type = db.Column(db.String(50), nullable=False, default="")  # '' = all types combined
+    slot = db.Column(db.String(20), nullable=False, default="")  # '' = every slot
+    capacity = db.Column(db.Integer, nullable=False)
+
+
+class AppointmentBlackout(db.Model):
+    """Day (or one slot of a day) when no bookings are taken, e.g. holidays or counselor leave."""
+
+    __tablename__ = "appointment_blackouts"
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    slot = db.Column(db.String(20), nullable=False, default="")  # '' = whole day
+    appointment_type = db.Column(db.String(50), nullable=False, default="")  # '' = all types
+    reason = db.Column(db.String(200), nullable=True)
+
+
+class AppointmentSlotLoad(db.Model):
+    """Bookings holding each (day, slot), per type and for all types combined (appointment_type '').
+    Claimed with a conditional UPDATE by services.slot_capacity."""
+
+    __tablename__ = "appointment_slot_loads"
+    __table_args__ = (db.UniqueConstraint("day", "slot", "appointment_type", name="uq_appointment_slot_load"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    slot = db.Column(db.String(20), nullable=False)
+    appointment_type = db.Column(db.String(50), nullable=False, default="")
+    booked = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,18 @@
+"""Dashboard counters model - single row kept in sync by write paths."""
+from datetime import datetime
+from extensions import db
+
+
+class DashboardCounter(db.Model):
+    """Live dashboard counters. Only row id=1 is used."""
+
+    __tablename__ = "dashboard_counters"
+
+    id = db.Column(db.Integer, primary_key=True)
+    pending_requests = db.Column(db.Integer, nullable=False, default=0)
+    completed_requests = db.Column(db.Integer, nullable=False, default=0)  # Ready + Claimed
+    open_tickets = db.Column(db.Integer, nullable=False, default=0)  # Open + In Progress
+    visitors_today = db.Column(db.Integer, nullable=False, default=0)
+    visitors_date = db.Column(db.Date, nullable=True)  # UTC day visitors_today refers to
+    reconciled_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
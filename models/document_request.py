@@ -7,6 +7,12 @@ class DocumentRequest(db.Model):
     """Document request records."""
 
     __tablename__ = "document_requests"
+    __table_args__ = (
+        # List view: filter, then seek on (requested_at, id)
+        db.Index("ix_document_requests_status_requested", "status", "requested_at", "id"),
+        db.Index("ix_document_requests_type_requested", "document_type", "requested_at", "id"),
+        db.Index("ix_document_requests_user_requested", "user_id", "requested_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     tracking_number = db.Column(db.String(50), unique=True, nullable=False, index=True)
@@ -15,7 +21,7 @@ class DocumentRequest(db.Model):
     document_type = db.Column(db.String(100), nullable=False)
     purpose = db.Column(db.Text, nullable=True)
     status = db.Column(db.String(50), default="Pending")  # Pending, Processing, Ready, Claimed, Cancelled
-    requested_at = db.Column(db.DateTime, default=datetime.utcnow)
+    requested_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     completed_at = db.Column(db.DateTime, nullable=True)
     notes = db.Column(db.Text, nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)  # requester if logged in
@@ -0,0 +1,27 @@
+"""Background job model."""
+from datetime import datetime
+from extensions import db
+
+
+class Job(db.Model):
+    """Background job (e.g. report generation) run by the in-process job runner."""
+
+    __tablename__ = "jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # report_generate, report_render
+    params = db.Column(db.Text, nullable=True)  # JSON
+    # Set while queued/running and cleared when finished, so only one active job per key exists
+    dedupe_key = db.Column(db.String(120), unique=True, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default="queued", index=True)  # queued, running, done, failed
+    progress = db.Column(db.Integer, nullable=False, default=0)  # 0-100
+    message = db.Column(db.String(200), nullable=True)
+    result = db.Column(db.Text, nullable=True)  # JSON
+    error = db.Column(db.Text, nullable=True)
+    worker = db.Column(db.String(80), nullable=True)  # host:pid running the job
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_by = db.Column(db.String(80), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
@@ -7,13 +7,33 @@ class LogbookEntry(db.Model):
     """Visitor check-in/check-out logbook entries."""
 
     __tablename__ = "logbook_entries"
+    __table_args__ = (
+        # Open entries only: presence rebuilds and the active-visitor fallback
+        db.Index(
+            "ix_logbook_entries_open",
+            "time_in",
+            sqlite_where=db.text("time_out IS NULL"),
+            postgresql_where=db.text("time_out IS NULL"),
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     visitor_name = db.Column(db.String(120), nullable=False)
     purpose = db.Column(db.String(200), nullable=True)
     time_in = db.Column(db.DateTime, nullable=False)
     time_out = db.Column(db.DateTime, nullable=True)
-    date = db.Column(db.Date, nullable=False)
+    date = db.Column(db.Date, nullable=False, index=True)
     remarks = db.Column(db.Text, nullable=True)
     document_request_id = db.Column(db.Integer, db.ForeignKey("document_requests.id"), nullable=True)  # auto-created from request
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class LogbookEventKey(db.Model):
+    """Idempotency keys of check-in/check-out events received through the batch API."""
+
+    __tablename__ = "logbook_event_keys"
+
+    key = db.Column(db.String(64), primary_key=True)  # client-generated, e.g. a UUID
+    kind = db.Column(db.String(20), nullable=False)  # check_in, check_out
+    entry_id = db.Column(db.Integer, db.ForeignKey("logbook_entries.id"), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -0,0 +1,11 @@
+"""Named number sequences (tracking numbers, ticket numbers)."""
+from extensions import db
+
+
+class NumberSequence(db.Model):
+    """Last number handed out for a prefix, e.g. name 'GCO-2025' -> 42. Updated atomically by services.sequences."""
+
+    __tablename__ = "number_sequences"
+
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
@@ -13,6 +13,6 @@ class MonthlyReport(db.Model):
     report_year = db.Column(db.Integer, nullable=False)
     report_type = db.Column(db.String(50), nullable=False)  # document_requests, tickets, surveys, logbook
     summary_data = db.Column(db.Text, nullable=True)  # JSON string
-    file_path = db.Column(db.String(256), nullable=True)
+    file_path = db.Column(db.String(256), nullable=True)  # cached artifacts folder, relative to UPLOAD_FOLDER
     generated_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -38,6 +38,12 @@ class SurveyResponse(db.Model):
     """Individual survey responses."""
 
     __tablename__ = "survey_responses"
+    __table_args__ = (
+        # Analytics: a survey's answers, and its count/max(id) cache version
+        db.Index("ix_survey_responses_survey_id", "survey_id", "id"),
+        # Write-behind flush skips submissions already written (by respondent id)
+        db.Index("ix_survey_responses_respondent_id", "respondent_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     survey_id = db.Column(db.Integer, db.ForeignKey("surveys.id"), nullable=False)
@@ -46,3 +52,23 @@ class SurveyResponse(db.Model):
     response_text = db.Column(db.Text, nullable=True)  # For text responses
     respondent_id = db.Column(db.String(80), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SurveyQuestionStat(db.Model):
+    """Running per-question answer aggregates, one row per rating value.
+
+    ``rating`` is the integer rating as text ("1".."5"); '' collects text answers
+    and numeric values that are not whole ratings. Sums cover numeric values only.
+    """
+
+    __tablename__ = "survey_question_stats"
+    __table_args__ = (db.UniqueConstraint("survey_id", "question_id", "rating", name="uq_survey_question_stats_key"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    survey_id = db.Column(db.Integer, db.ForeignKey("surveys.id"), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey("survey_questions.id"), nullable=False)
+    rating = db.Column(db.String(20), nullable=False, default="")
+    answers = db.Column(db.Integer, nullable=False, default=0)  # all answers, text included
+    value_count = db.Column(db.Integer, nullable=False, default=0)
+    value_sum = db.Column(db.Float, nullable=False, default=0.0)
+    value_sum_sq = db.Column(db.Float, nullable=False, default=0.0)
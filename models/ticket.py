@@ -7,6 +7,12 @@ class Ticket(db.Model):
     """Help desk support tickets."""
 
     __tablename__ = "tickets"
+    __table_args__ = (
+        # List view: filter, then seek on (created_at, id)
+        db.Index("ix_tickets_status_created", "status", "created_at", "id"),
+        db.Index("ix_tickets_priority_created", "priority", "created_at", "id"),
+        db.Index("ix_tickets_assignee_created", "assigned_to", "created_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     ticket_number = db.Column(db.String(50), unique=True, nullable=False, index=True)
@@ -18,6 +24,6 @@ class Ticket(db.Model):
     priority = db.Column(db.String(20), default="Medium")  # Low, Medium, High
     assigned_to = db.Column(db.String(80), nullable=True)
     attachment_path = db.Column(db.String(256), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     resolved_at = db.Column(db.DateTime, nullable=True)
@@ -1,39 +1,58 @@
 """Online appointment scheduling routes."""
-from datetime import date, datetime, timezone
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 
 from extensions import db
-from models import Appointment
+from models import Appointment, AppointmentBlackout, AppointmentSlotCapacity
+from services import activity_rollup, appointment_calendar, search_index, slot_capacity
+from services.slot_capacity import TIME_SLOTS
+from utils.date_ranges import in_range
 from utils.decorators import staff_required
+from utils.pagination import filter_params, keyset_page, list_args, page_args
 
 appointments_bp = Blueprint("appointments", __name__)
 
 APPOINTMENT_TYPES = ["Online", "Walk-in", "Consultation", "Counseling", "Document Request", "Others"]
-TIME_SLOTS = [
-    "08:00", "08:30", "09:00", "09:30", "10:00", "10:30", "11:00", "11:30",
-    "13:00", "13:30", "14:00", "14:30", "15:00", "15:30", "16:00", "16:30",
-]
+
+
+APPOINTMENT_STATUSES = ["Pending", "Approved", "Rejected", "Completed", "Cancelled"]
 
 
 @appointments_bp.route("/")
 @login_required
 def index():
+    f = list_args("status", "appointment_type")
+    query = Appointment.query
+    if not current_user.is_staff:
+        query = query.filter_by(user_id=current_user.id)
+    if f["status"]:
+        query = query.filter(Appointment.status == f["status"])
+    if f["appointment_type"]:
+        query = query.filter(Appointment.appointment_type == f["appointment_type"])
+    if f["start"] or f["end"]:
+        query = query.filter(in_range(Appointment.preferred_date, f["start"], f["end"]))
+    page = keyset_page(
+        query,
+        [Appointment.preferred_date, Appointment.preferred_time, Appointment.id],
+        row_key=lambda a: [a.preferred_date, a.preferred_time, a.id],
+        **page_args(),
+    )
+    total = None
     if current_user.is_staff:
-        appointments = Appointment.query.order_by(
-            Appointment.preferred_date.desc(),
-            Appointment.preferred_time.desc(),
-        ).all()
-    else:
-        appointments = Appointment.query.filter_by(
-            user_id=current_user.id
-        ).order_by(
-            Appointment.preferred_date.desc(),
-            Appointment.preferred_time.desc(),
-        ).all()
+        total = activity_rollup.count_matching(
+            "appointments", f["start"], f["end"], status=f["status"], kind=f["appointment_type"]
+        )
     return render_template(
         "appointments/index.html",
-        appointments=appointments,
+        appointments=page.items,
+        page=page,
+        total=total,
+        filters=f,
+        params=filter_params(f),
+        statuses=APPOINTMENT_STATUSES,
+        types=APPOINTMENT_TYPES,
     )
 
 
@@ -67,6 +86,14 @@ def book():
         if d < date.today():
             flash("Please select a future date.", "error")
             return render_template("appointments/book.html", **ctx)
+        if pref_time not in TIME_SLOTS:
+            flash("Please choose a time slot.", "error")
+            return render_template("appointments/book.html", **ctx)
+        err = slot_capacity.claim(d, pref_time, apt_type)
+        if err:
+            db.session.rollback()
+            flash(err, "error")
+            return render_template("appointments/book.html", **ctx)
         apt = Appointment(
             user_id=current_user.id if current_user.is_authenticated else None,
             requester_name=name,
@@ -75,11 +102,15 @@ def book():
             appointment_type=apt_type,
             purpose=purpose or None,
             preferred_date=d,
-            preferred_time=pref_time if pref_time in TIME_SLOTS else TIME_SLOTS[0],
+            preferred_time=pref_time,
             status="Pending",
         )
         db.session.add(apt)
+        db.session.flush()
+        search_index.index(apt)
+        activity_rollup.record_added(apt)
         db.session.commit()
+        appointment_calendar.invalidate(d)
         flash("Appointment requested successfully! Wait for admin approval.", "success")
         if current_user.is_authenticated:
             return redirect(url_for("appointments.index"))
@@ -97,9 +128,17 @@ def accept(aid):
     if not apt:
         flash("Appointment not found.", "error")
         return redirect(url_for("appointments.index"))
+    old_key, old_hold = activity_rollup.key_for(apt), slot_capacity.hold_for(apt)
     apt.status = "Approved"
     apt.admin_notes = request.form.get("admin_notes", "").strip() or apt.admin_notes
+    err = slot_capacity.moved(old_hold, apt)
+    if err:
+        db.session.rollback()
+        flash(err, "error")
+        return redirect(url_for("appointments.index"))
+    activity_rollup.record_changed(old_key, apt)
     db.session.commit()
+    appointment_calendar.invalidate(apt.preferred_date)
     flash(f"Appointment for {apt.requester_name} approved.", "success")
     return redirect(url_for("appointments.index"))
 
@@ -112,9 +151,17 @@ def reject(aid):
     if not apt:
         flash("Appointment not found.", "error")
         return redirect(url_for("appointments.index"))
+    old_key, old_hold = activity_rollup.key_for(apt), slot_capacity.hold_for(apt)
     apt.status = "Rejected"
     apt.admin_notes = request.form.get("admin_notes", "").strip() or apt.admin_notes
+    err = slot_capacity.moved(old_hold, apt)
+    if err:
+        db.session.rollback()
+        flash(err, "error")
+        return redirect(url_for("appointments.index"))
+    activity_rollup.record_changed(old_key, apt)
     db.session.commit()
+    appointment_calendar.invalidate(apt.preferred_date)
     flash(f"Appointment for {apt.requester_name} rejected.", "info")
     return redirect(url_for("appointments.index"))
 
@@ -129,9 +176,17 @@ def update_status(aid):
         return redirect(url_for("appointments.index"))
     status = request.form.get("status", "").strip()
     if status in ("Pending", "Approved", "Rejected", "Completed", "Cancelled"):
+        old_key, old_hold = activity_rollup.key_for(apt), slot_capacity.hold_for(apt)
         apt.status = status
         apt.admin_notes = request.form.get("admin_notes", "").strip() or apt.admin_notes
+        err = slot_capacity.moved(old_hold, apt)
+        if err:
+            db.session.rollback()
+            flash(err, "error")
+            return redirect(url_for("appointments.index"))
+        activity_rollup.record_changed(old_key, apt)
         db.session.commit()
+        appointment_calendar.invalidate(apt.preferred_date)
         flash("Status updated.", "success")
     return redirect(url_for("appointments.index"))
 
@@ -150,6 +205,8 @@ def edit(aid):
         pref_time = request.form.get("preferred_time", "").strip()
         status = request.form.get("status", "").strip()
         admin_notes = request.form.get("admin_notes", "").strip()
+        old_key, old_hold = activity_rollup.key_for(apt), slot_capacity.hold_for(apt)
+        old_date = apt.preferred_date
         if pref_date:
             try:
                 apt.preferred_date = datetime.strptime(pref_date, "%Y-%m-%d").date()
@@ -161,7 +218,137 @@ def edit(aid):
         if status in ("Pending", "Approved", "Rejected", "Completed", "Cancelled"):
             apt.status = status
         apt.admin_notes = admin_notes or None
+        err = slot_capacity.moved(old_hold, apt)
+        if err:
+            db.session.rollback()
+            flash(err, "error")
+            return render_template("appointments/edit.html", appointment=apt, slots=TIME_SLOTS)
+        activity_rollup.record_changed(old_key, apt)
         db.session.commit()
+        appointment_calendar.invalidate(old_date, apt.preferred_date)
         flash("Appointment updated. Rescheduled date/time and notes saved.", "success")
         return redirect(url_for("appointments.index"))
     return render_template("appointments/edit.html", appointment=apt, slots=TIME_SLOTS)
+
+
+def _calendar_args():
+    view = request.args.get("view", "month")
+    if view not in appointment_calendar.VIEWS:
+        view = "month"
+    try:
+        anchor = date.fromisoformat(request.args.get("date") or date.today().isoformat())
+    except ValueError:
+        anchor = None
+    return view, anchor
+
+
+@appointments_bp.route("/calendar")
+@login_required
+@staff_required
+def calendar():
+    """Counselor calendar: month grid with per-day counts and appointments by slot."""
+    view, anchor = _calendar_args()
+    if anchor is None:
+        flash("Invalid date.", "error")
+        anchor = date.today()
+    data = appointment_calendar.calendar(view, anchor)
+    start, end = appointment_calendar.window(view, anchor)
+    return render_template(
+        "appointments/calendar.html",
+        cal=data,
+        view=view,
+        anchor=anchor,
+        prev_date=(start - timedelta(days=1)).isoformat(),
+        next_date=end.isoformat(),
+        lead_days=start.weekday() if view == "month" else 0,
+        status_totals=sum((Counter(d["by_status"]) for d in data["days"]), Counter()),
+    )
+
+
+@appointments_bp.route("/api/calendar")
+@login_required
+@staff_required
+def api_calendar():
+    """?view=day|week|month&date=YYYY-MM-DD: the window containing date, appointments grouped by slot."""
+    view, anchor = _calendar_args()
+    if anchor is None:
+        return jsonify({"error": "Invalid date."}), 400
+    return jsonify(appointment_calendar.calendar(view, anchor))
+
+
+@appointments_bp.route("/api/availability")
+def api_availability():
+    """Open slots per day: ?start=YYYY-MM-DD&days=N (1-62, default 1)&type=<appointment type>."""
+    try:
+        start = date.fromisoformat(request.args.get("start") or date.today().isoformat())
+        days = max(1, min(slot_capacity.MAX_RANGE_DAYS, int(request.args.get("days") or 1)))
+    except ValueError:
+        return jsonify({"error": "Invalid start or days."}), 400
+    apt_type = request.args.get("type", "")
+    if apt_type not in APPOINTMENT_TYPES:
+        apt_type = ""
+    return jsonify({
+        "slots": TIME_SLOTS,
+        "type": apt_type or None,
+        "days": slot_capacity.availability(start, start + timedelta(days=days), apt_type),
+    })
+
+
+@appointments_bp.route("/slots", methods=["GET", "POST"])
+@login_required
+@staff_required
+def slot_settings():
+    """Slot capacities and blackout dates."""
+    if request.method == "POST":
+        action = request.form.get("action")
+        apt_type = request.form.get("appointment_type", "")
+        slot = request.form.get("slot", "")
+        if apt_type not in APPOINTMENT_TYPES:
+            apt_type = ""
+        if slot not in TIME_SLOTS:
+            slot = ""
+        if action == "capacity":
+            try:
+                cap = int(request.form.get("capacity", ""))
+            except ValueError:
+                cap = -1
+            if cap < 0:
+                flash("Capacity must be 0 or more.", "error")
+                return redirect(url_for("appointments.slot_settings"))
+            row = AppointmentSlotCapacity.query.filter_by(appointment_type=apt_type, slot=slot).first()
+            if row:
+                row.capacity = cap
+            else:
+                db.session.add(AppointmentSlotCapacity(appointment_type=apt_type, slot=slot, capacity=cap))
+            flash("Capacity saved.", "success")
+        elif action == "blackout":
+            try:
+                day = date.fromisoformat(request.form.get("day", ""))
+            except ValueError:
+                flash("Invalid date.", "error")
+                return redirect(url_for("appointments.slot_settings"))
+            reason = request.form.get("reason", "").strip()[:200] or None
+            db.session.add(AppointmentBlackout(day=day, slot=slot, appointment_type=apt_type, reason=reason))
+            flash("Blackout added. Existing bookings are not changed.", "success")
+        elif action == "delete_capacity":
+            AppointmentSlotCapacity.query.filter_by(id=request.form.get("id", type=int)).delete()
+            flash("Capacity removed.", "info")
+        elif action == "delete_blackout":
+            AppointmentBlackout.query.filter_by(id=request.form.get("id", type=int)).delete()
+            flash("Blackout removed.", "info")
+        db.session.commit()
+        return redirect(url_for("appointments.slot_settings"))
+    capacities = AppointmentSlotCapacity.query.order_by(
+        AppointmentSlotCapacity.appointment_type, AppointmentSlotCapacity.slot
+    ).all()
+    blackouts = AppointmentBlackout.query.filter(AppointmentBlackout.day >= date.today()).order_by(
+        AppointmentBlackout.day, AppointmentBlackout.slot
+    ).all()
+    return render_template(
+        "appointments/slots.html",
+        capacities=capacities,
+        blackouts=blackouts,
+        types=APPOINTMENT_TYPES,
+        slots=TIME_SLOTS,
+        default_capacity=slot_capacity.DEFAULT_CAPACITY,
+    )
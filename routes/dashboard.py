@@ -1,11 +1,14 @@
 """Dashboard and office monitoring routes."""
-from datetime import datetime, timedelta
-from flask import Blueprint, render_template, jsonify
+import calendar
+from datetime import date, datetime, timedelta
+from flask import Blueprint, render_template, jsonify, request
 from flask_login import login_required
 from utils.decorators import staff_required
 from sqlalchemy import func
 from extensions import db
-from models import DocumentRequest, Ticket, LogbookEntry, SurveyResponse
+from models import DocumentRequest
+from services import activity_rollup, survey_stats
+from services.dashboard_counters import get_counters
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
@@ -21,20 +24,8 @@ def index():
 @login_required
 @staff_required
 def api_stats():
-    """Live counters for dashboard."""
-    pending_requests = DocumentRequest.query.filter_by(status="Pending").count()
-    open_tickets = Ticket.query.filter(Ticket.status.in_(["Open", "In Progress"])).count()
-    completed_requests = DocumentRequest.query.filter(
-        DocumentRequest.status.in_(["Ready", "Claimed"]),
-    ).count()
-    today = datetime.utcnow().date()
-    total_visitors_today = LogbookEntry.query.filter(LogbookEntry.date == today).count()
-    return jsonify({
-        "pending_requests": pending_requests,
-        "open_tickets": open_tickets,
-        "completed_requests": completed_requests,
-        "visitors_today": total_visitors_today,
-    })
+    """Live counters for dashboard (one-row read, kept current by write paths)."""
+    return jsonify(get_counters())
 
 
 @dashboard_bp.route("/api/dashboard/request-status-distribution")
@@ -54,19 +45,32 @@ def api_request_status():
 @login_required
 @staff_required
 def api_monthly_trend():
-    """Monthly trend for document requests."""
-    six_months_ago = datetime.utcnow() - timedelta(days=180)
-    rows = (
-        db.session.query(
-            func.strftime("%Y-%m", DocumentRequest.requested_at).label("month"),
-            func.count(DocumentRequest.id).label("count"),
-        )
-        .filter(DocumentRequest.requested_at >= six_months_ago)
-        .group_by("month")
-        .order_by("month")
-        .all()
-    )
-    return jsonify({"labels": [r[0] for r in rows], "data": [r[1] for r in rows]})
+    """Monthly trend for document requests (from the daily rollup)."""
+    today = datetime.utcnow().date()
+    six_months_ago = today - timedelta(days=180)
+    series = activity_rollup.monthly_series("document_requests", six_months_ago, today + timedelta(days=1))
+    return jsonify({"labels": list(series), "data": list(series.values())})
+
+
+@dashboard_bp.route("/api/dashboard/year-over-year")
+@login_required
+@staff_required
+def api_year_over_year():
+    """Monthly counts for a module, this year vs. last year (from the daily rollup)."""
+    module = request.args.get("module", "document_requests")
+    if module not in activity_rollup.MODULES:
+        return jsonify({"error": "Unknown module"}), 400
+    try:
+        year = int(request.args.get("year") or datetime.utcnow().year)
+    except ValueError:
+        return jsonify({"error": "Invalid year"}), 400
+    series = activity_rollup.monthly_series(module, date(year - 1, 1, 1), date(year + 1, 1, 1))
+    return jsonify({
+        "module": module,
+        "labels": [calendar.month_abbr[m] for m in range(1, 13)],
+        "current": {"year": year, "data": [series.get(f"{year}-{m:02d}", 0) for m in range(1, 13)]},
+        "previous": {"year": year - 1, "data": [series.get(f"{year - 1}-{m:02d}", 0) for m in range(1, 13)]},
+    })
 
 
 @dashboard_bp.route("/api/dashboard/survey-average")
@@ -74,5 +78,5 @@ def api_monthly_trend():
 @staff_required
 def api_survey_average():
     """Average survey rating."""
-    avg = db.session.query(func.avg(SurveyResponse.response_value)).scalar() or 0
+    avg = survey_stats.overall_average() or 0
     return jsonify({"average": round(float(avg), 2)})
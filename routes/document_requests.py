@@ -1,4 +1,7 @@
 """Document request and tracking routes."""
+import hashlib
+from datetime import datetime, timezone
+
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
 from flask_login import login_required, current_user
 
@@ -6,11 +9,15 @@ from extensions import db
 from models import DocumentRequest
 from services.document_request_service import (
     create_request,
-    get_request_by_tracking,
+    track_request,
     update_request_status,
     generate_tracking_number,
 )
 from services.import_export import import_requests_excel, export_requests_excel
+from services import activity_rollup
+from services.xlsx_export import XLSX_MIMETYPE
+from utils.date_ranges import in_range
+from utils.pagination import filter_params, keyset_page, list_args, page_args
 
 document_requests_bp = Blueprint("document_requests", __name__)
 
@@ -27,14 +34,40 @@ def _staff_required(f):
     return inner
 
 
+REQUEST_STATUSES = ["Pending", "Processing", "Ready", "Claimed", "Cancelled"]
+
+
 @document_requests_bp.route("/")
 @login_required
 def index():
-    if current_user.is_staff:
-        requests = DocumentRequest.query.order_by(DocumentRequest.requested_at.desc()).all()
-    else:
-        requests = DocumentRequest.query.filter_by(user_id=current_user.id).order_by(DocumentRequest.requested_at.desc()).all()
-    return render_template("document_requests/index.html", requests=requests)
+    f = list_args("status", "document_type", "tracking_number")
+    query = DocumentRequest.query
+    if not current_user.is_staff:
+        query = query.filter_by(user_id=current_user.id)
+    if f["tracking_number"]:
+        query = query.filter(DocumentRequest.tracking_number == f["tracking_number"])
+    if f["status"]:
+        query = query.filter(DocumentRequest.status == f["status"])
+    if f["document_type"]:
+        query = query.filter(DocumentRequest.document_type == f["document_type"])
+    if f["start"] or f["end"]:
+        query = query.filter(in_range(DocumentRequest.requested_at, f["start"], f["end"]))
+    page = keyset_page(query, [DocumentRequest.requested_at, DocumentRequest.id], **page_args())
+    total = None
+    if current_user.is_staff and not f["tracking_number"]:
+        # From the daily rollup: no COUNT(*) over the table per page view
+        total = activity_rollup.count_matching(
+            "document_requests", f["start"], f["end"], status=f["status"], kind=f["document_type"]
+        )
+    return render_template(
+        "document_requests/index.html",
+        requests=page.items,
+        page=page,
+        total=total,
+        filters=f,
+        params=filter_params(f),
+        statuses=REQUEST_STATUSES,
+    )
 
 
 @document_requests_bp.route("/create", methods=["GET", "POST"])
@@ -65,9 +98,7 @@ def track():
     if request.method == "POST":
         tn = request.form.get("tracking_number", "").strip()
         if tn:
-            req = get_request_by_tracking(tn) if tn else None
-            if not req:
-                req = DocumentRequest.query.filter_by(tracking_number=tn).first()
+            req = track_request(tn)
             if not req:
                 flash("Tracking number not found.", "error")
     return render_template("document_requests/track.html", request_obj=req)
@@ -92,15 +123,20 @@ def update_status(req_id):
 
 @document_requests_bp.route("/api/track/<tracking_number>")
 def api_track(tracking_number):
-    req = get_request_by_tracking(tracking_number) or DocumentRequest.query.filter_by(tracking_number=tracking_number).first()
-    if not req:
+    """Public status lookup. Supports If-None-Match / If-Modified-Since for polling clients."""
+    snap = track_request(tracking_number)
+    if not snap:
         return jsonify({"error": "Not found"}), 404
-    return jsonify({
-        "tracking_number": req.tracking_number,
-        "status": req.status,
-        "requester_name": req.requester_name,
-        "document_type": req.document_type,
+    resp = jsonify({
+        "tracking_number": snap["tracking_number"],
+        "status": snap["status"],
+        "requester_name": snap["requester_name"],
+        "document_type": snap["document_type"],
     })
+    resp.set_etag(hashlib.sha1(f"{snap['tracking_number']}|{snap['status']}|{snap['updated_at']}".encode()).hexdigest())
+    resp.last_modified = datetime.fromisoformat(snap["updated_at"]).replace(tzinfo=timezone.utc)
+    resp.cache_control.no_cache = True  # clients may keep it but must revalidate
+    return resp.make_conditional(request)
 
 
 @document_requests_bp.route("/import", methods=["GET", "POST"])
@@ -125,13 +161,12 @@ def import_requests():
 @login_required
 @_staff_required
 def export_requests():
-    buf = export_requests_excel()
-    from io import BytesIO
+    out = export_requests_excel()
     from datetime import datetime
     fn = f"document_requests_{datetime.utcnow().strftime('%Y%m%d_%H%M')}.xlsx"
     return send_file(
-        BytesIO(buf),
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        out,
+        mimetype=XLSX_MIMETYPE,
         as_attachment=True,
         download_name=fn,
     )
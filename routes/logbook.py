@@ -1,12 +1,17 @@
 """Digital logbook / visitor tracking routes."""
-from datetime import datetime, date, timedelta
+from collections import Counter
+from datetime import date, datetime, timedelta
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
 from flask_login import login_required, current_user
-from utils.decorators import staff_required
+from utils.decorators import kiosk_or_staff_required, staff_required
 
-from extensions import db
+from extensions import csrf, db
 from models import LogbookEntry
+from services import activity_rollup, dashboard_counters, logbook_analytics, logbook_archive, presence, search_index
+from services.logbook_events import MAX_BATCH_EVENTS, apply_events
 from services.import_export import import_logbook_excel, export_logbook_excel
+from services.visitor_suggest import visitor_index
+from services.xlsx_export import XLSX_MIMETYPE
 
 logbook_bp = Blueprint("logbook", __name__)
 
@@ -15,7 +20,7 @@ logbook_bp = Blueprint("logbook", __name__)
 @login_required
 @staff_required
 def index():
-    today = date.today()
+    today = datetime.utcnow().date()  # entries are dated in UTC
     entries = LogbookEntry.query.filter(LogbookEntry.date == today).order_by(LogbookEntry.time_in.desc()).all()
     return render_template("logbook/index.html", entries=entries)
 
@@ -37,7 +42,13 @@ def check_in():
         date=now.date(),
     )
     db.session.add(entry)
+    db.session.flush()
+    search_index.index(entry)
+    dashboard_counters.visitors_checked_in(entry.date)
+    activity_rollup.record_added(entry)
     db.session.commit()
+    visitor_index.record(entry)
+    presence.checked_in(entry)
     flash(f"{name} checked in.", "success")
     return redirect(url_for("logbook.index"))
 
@@ -53,8 +64,11 @@ def check_out(eid):
     if entry.time_out:
         flash("Already checked out.", "warning")
         return redirect(url_for("logbook.index"))
+    old_key = activity_rollup.key_for(entry)
     entry.time_out = datetime.utcnow()
+    activity_rollup.record_changed(old_key, entry)
     db.session.commit()
+    presence.checked_out(entry)
     flash(f"{entry.visitor_name} checked out.", "success")
     return redirect(url_for("logbook.index"))
 
@@ -64,25 +78,87 @@ def check_out(eid):
 @staff_required
 def api_active():
     """Active visitors (checked in, not out)."""
-    today = date.today()
-    active = LogbookEntry.query.filter(
-        LogbookEntry.date == today,
-        LogbookEntry.time_out.is_(None),
-    ).all()
-    return jsonify([{"id": e.id, "name": e.visitor_name, "time_in": e.time_in.isoformat()} for e in active])
+    return jsonify(presence.active())
+
+
+@logbook_bp.route("/api/events", methods=["POST"])
+@csrf.exempt
+@kiosk_or_staff_required
+def api_events():
+    """Apply a batch of check-in/check-out events: {"events": [...]}. Retries with the same keys are safe.
+
+    Kiosks authenticate with ``Authorization: Bearer <KIOSK_API_KEYS entry>``; a staff
+    browser session sends the page's csrf-token meta value as ``X-CSRFToken``.
+    """
+    payload = request.get_json(silent=True)
+    events = payload.get("events") if isinstance(payload, dict) else payload
+    if not isinstance(events, list):
+        return jsonify({"error": "Expected a JSON list of events or {\"events\": [...]}."}), 400
+    if len(events) > MAX_BATCH_EVENTS:
+        return jsonify({"error": f"At most {MAX_BATCH_EVENTS} events per request."}), 413
+    results = apply_events(events)
+    return jsonify({"results": results, "summary": dict(Counter(r["status"] for r in results))})
+
+
+@logbook_bp.route("/api/occupancy")
+@login_required
+@staff_required
+def api_occupancy():
+    """Current occupancy and today's arrivals / peak occupancy per UTC hour."""
+    return jsonify(presence.occupancy())
+
+
+@logbook_bp.route("/api/suggest")
+@login_required
+@staff_required
+def api_suggest():
+    """Visitor name completions for check-in, with visit count and last purpose."""
+    q = request.args.get("q", "")
+    try:
+        limit = max(1, min(20, int(request.args.get("limit") or 8)))
+    except ValueError:
+        limit = 8
+    return jsonify(visitor_index.suggest(q, limit=limit))
+
+
+def _report_range():
+    """(from, to) dates from the query string, inclusive; defaults to the last 30 days."""
+    today = datetime.utcnow().date()
+    try:
+        from_date = date.fromisoformat(request.args.get("from") or str(today - timedelta(days=30)))
+        to_date = date.fromisoformat(request.args.get("to") or today.isoformat())
+    except ValueError:
+        from_date, to_date = today - timedelta(days=30), today
+    return from_date, to_date
 
 
 @logbook_bp.route("/reports")
 @login_required
 @staff_required
 def reports():
-    from_date = request.args.get("from") or str(date.today() - timedelta(days=30))
-    to_date = request.args.get("to") or date.today().isoformat()
-    entries = LogbookEntry.query.filter(
-        LogbookEntry.date >= from_date,
-        LogbookEntry.date <= to_date,
-    ).order_by(LogbookEntry.time_in.desc()).all()
-    return render_template("logbook/reports.html", entries=entries, from_date=from_date, to_date=to_date)
+    from_date, to_date = _report_range()
+    view = "analytics" if request.args.get("view") == "analytics" else "entries"
+    ctx = {"from_date": from_date.isoformat(), "to_date": to_date.isoformat(), "view": view}
+    if view == "analytics":
+        ctx["stats"] = logbook_analytics.analyze(from_date, to_date + timedelta(days=1))
+    else:
+        end = to_date + timedelta(days=1)
+        live = LogbookEntry.query.filter(
+            LogbookEntry.date >= from_date,
+            LogbookEntry.date <= to_date,
+            logbook_archive.live_filter(from_date, end),
+        ).order_by(LogbookEntry.time_in.desc(), LogbookEntry.id.desc())
+        ctx["entries"] = list(logbook_archive.merge_newest_first(live, from_date, end))
+    return render_template("logbook/reports.html", **ctx)
+
+
+@logbook_bp.route("/api/analytics")
+@login_required
+@staff_required
+def api_analytics():
+    """Visit analytics for ?from=&to= (inclusive dates)."""
+    from_date, to_date = _report_range()
+    return jsonify(logbook_analytics.analyze(from_date, to_date + timedelta(days=1)))
 
 
 @logbook_bp.route("/import", methods=["GET", "POST"])
@@ -107,12 +183,11 @@ def import_entries():
 @login_required
 @staff_required
 def export_entries():
-    buf = export_logbook_excel()
-    from io import BytesIO
+    out = export_logbook_excel()
     fn = f"logbook_{datetime.utcnow().strftime('%Y%m%d_%H%M')}.xlsx"
     return send_file(
-        BytesIO(buf),
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        out,
+        mimetype=XLSX_MIMETYPE,
         as_attachment=True,
         download_name=fn,
     )
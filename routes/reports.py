@@ -1,74 +1,23 @@
 """Automated monthly reports routes."""
-import csv
-import json
 from datetime import datetime
-from io import BytesIO, StringIO
 
-from flask import Blueprint, render_template, request, send_file
-from flask_login import login_required
-from sqlalchemy import func
-import pandas as pd
+from flask import Blueprint, Response, render_template, request, redirect, url_for, flash, jsonify, send_file, stream_with_context
+from flask_login import login_required, current_user
 
 from utils.decorators import staff_required
 from extensions import db
-from models import DocumentRequest, Ticket, LogbookEntry, MonthlyReport, Appointment
+from models import Job, MonthlyReport
+from services import monthly_report, report_artifacts, report_jobs
+from services.jobs import job_dict
 
 reports_bp = Blueprint("reports", __name__)
 
-YM_FMT = "%Y-%m"
-
-
-def _all_transactions_rows(year: int, month: int):
-    """Return list of dicts with keys: Type, Date, Reference, Subject, Status for CSV/Excel."""
-    ym = f"{year}-{month:02d}"
-    rows = []
-
-    for r in DocumentRequest.query.filter(
-        func.strftime(YM_FMT, DocumentRequest.requested_at) == ym,
-    ).order_by(DocumentRequest.requested_at).all():
-        rows.append({
-            "Type": "Document Request",
-            "Date": r.requested_at.strftime("%Y-%m-%d %H:%M") if r.requested_at else "",
-            "Reference": r.tracking_number or "",
-            "Subject": r.document_type or "",
-            "Status": r.status or "",
-        })
-
-    for t in Ticket.query.filter(
-        func.strftime(YM_FMT, Ticket.created_at) == ym,
-    ).order_by(Ticket.created_at).all():
-        rows.append({
-            "Type": "Ticket",
-            "Date": t.created_at.strftime("%Y-%m-%d %H:%M") if t.created_at else "",
-            "Reference": t.ticket_number or "",
-            "Subject": t.subject or "",
-            "Status": t.status or "",
-        })
-
-    for e in LogbookEntry.query.filter(
-        func.strftime(YM_FMT, LogbookEntry.date) == ym,
-    ).order_by(LogbookEntry.date, LogbookEntry.time_in).all():
-        rows.append({
-            "Type": "Logbook",
-            "Date": f"{e.date} {e.time_in.strftime('%H:%M') if e.time_in else ''}".strip(),
-            "Reference": e.visitor_name or "",
-            "Subject": (e.purpose or "")[:80],
-            "Status": "Out" if e.time_out else "In",
-        })
-
-    for a in Appointment.query.filter(
-        func.strftime("%Y", Appointment.preferred_date) == str(year),
-        func.strftime("%m", Appointment.preferred_date) == f"{month:02d}",
-    ).order_by(Appointment.preferred_date, Appointment.preferred_time).all():
-        rows.append({
-            "Type": "Appointment",
-            "Date": a.preferred_date.strftime("%Y-%m-%d") + (f" {a.preferred_time}" if a.preferred_time else ""),
-            "Reference": a.requester_name or "",
-            "Subject": a.appointment_type or "",
-            "Status": a.status or "",
-        })
-
-    return rows
+RECENT_JOBS = 15
+MAX_PER_PAGE = 500
+
+
+def _wants_json() -> bool:
+    return request.accept_mimetypes.best == "application/json" or request.headers.get("X-Requested-With") == "XMLHttpRequest"
 
 
 @reports_bp.route("/")
@@ -79,7 +28,8 @@ def index():
         MonthlyReport.report_year.desc(),
         MonthlyReport.report_month.desc(),
     ).all()
-    return render_template("reports/index.html", reports=reports)
+    jobs = Job.query.filter(Job.kind.like("report_%")).order_by(Job.id.desc()).limit(RECENT_JOBS).all()
+    return render_template("reports/index.html", reports=reports, jobs=[job_dict(j) for j in jobs])
 
 
 @reports_bp.route("/generate", methods=["GET", "POST"])
@@ -89,113 +39,86 @@ def generate():
     if request.method == "POST":
         year = int(request.form.get("year", datetime.utcnow().year))
         month = int(request.form.get("month", datetime.utcnow().month))
-
-        ym = f"{year}-{month:02d}"
-        dr_count = DocumentRequest.query.filter(
-            func.strftime(YM_FMT, DocumentRequest.requested_at) == ym,
-        ).count()
-        tk_count = Ticket.query.filter(
-            func.strftime(YM_FMT, Ticket.created_at) == ym,
-        ).count()
-        lb_count = LogbookEntry.query.filter(
-            func.strftime(YM_FMT, LogbookEntry.date) == ym,
-        ).count()
-        ap_count = db.session.query(Appointment).filter(
-            func.strftime("%Y", Appointment.preferred_date) == str(year),
-            func.strftime("%m", Appointment.preferred_date) == f"{month:02d}",
-        ).count()
-
-        summary = {
-            "document_requests": dr_count,
-            "tickets": tk_count,
-            "logbook": lb_count,
-            "appointments": ap_count,
-            "total": dr_count + tk_count + lb_count + ap_count,
-        }
-
-        report = MonthlyReport(
-            report_month=month,
-            report_year=year,
-            report_type="all_transactions",
-            summary_data=json.dumps(summary),
-        )
-        db.session.add(report)
-        db.session.commit()
-        from flask import flash, redirect, url_for
-        flash(f"Report generated for {year}-{month:02d} ({summary['total']} transactions)", "success")
+        job = report_jobs.queue_generate(year, month, current_user.username)
+        if _wants_json():
+            return jsonify(job_dict(job)), 202
+        flash(f"Report for {year}-{month:02d} queued (job #{job.id}). It will appear below when done.", "info")
         return redirect(url_for("reports.index"))
 
-    from datetime import datetime as dt
-    return render_template("reports/generate.html", now=dt.utcnow())
+    return render_template("reports/generate.html", now=datetime.utcnow())
 
 
 @reports_bp.route("/<int:rid>/download")
 @login_required
 @staff_required
 def download(rid):
-    report = MonthlyReport.query.get(rid)
+    report = db.session.get(MonthlyReport, rid)
     if not report:
-        from flask import flash, redirect, url_for
         flash("Report not found.", "error")
         return redirect(url_for("reports.index"))
 
     fmt = request.args.get("format", "pdf").lower().strip()
-    year, month = report.report_year, report.report_month
-    base_name = f"report_{year}_{month:02d}"
+    if fmt == "excel":
+        fmt = "xlsx"
+    if fmt not in monthly_report.FORMATS:
+        fmt = "pdf"
+    ext, mimetype, _writer = monthly_report.FORMATS[fmt]
+    download_name = f"{monthly_report.base_name(report)}.{ext}"
+
+    fp = report_artifacts.fingerprint(report)
+    path = report_artifacts.cached_artifact(report, fmt, fp)
+    if path:
+        return send_file(path, mimetype=mimetype, as_attachment=True, download_name=download_name)
 
     if fmt == "csv":
-        rows = _all_transactions_rows(year, month)
-        out = StringIO()
-        if not rows:
-            writer = csv.writer(out)
-            writer.writerow(["Type", "Date", "Reference", "Subject", "Status"])
-        else:
-            writer = csv.DictWriter(out, fieldnames=["Type", "Date", "Reference", "Subject", "Status"])
-            writer.writeheader()
-            writer.writerows(rows)
-        out.seek(0)
-        return send_file(
-            BytesIO(out.getvalue().encode("utf-8-sig")),
-            mimetype="text/csv",
-            as_attachment=True,
-            download_name=f"{base_name}.csv",
+        # CSV streams in constant memory, so it stays on the request path: the header goes
+        # out before the first query runs and rows are saved to the cache as they are sent.
+        chunks = monthly_report.csv_chunks(monthly_report.iter_transactions(report.report_year, report.report_month))
+        return Response(
+            stream_with_context(report_artifacts.tee_to_cache(report, fmt, chunks, fp)),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f'attachment; filename="{download_name}"'},
         )
 
-    if fmt == "xlsx" or fmt == "excel":
-        rows = _all_transactions_rows(year, month)
-        df = pd.DataFrame(rows, columns=["Type", "Date", "Reference", "Subject", "Status"])
-        buf = BytesIO()
-        df.to_excel(buf, index=False, sheet_name="Transactions", engine="openpyxl")
-        buf.seek(0)
-        return send_file(
-            buf,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            as_attachment=True,
-            download_name=f"{base_name}.xlsx",
-        )
+    job = report_jobs.queue_render(report, fmt, current_user.username)
+    if _wants_json():
+        return jsonify(job_dict(job)), 202
+    flash(f"Preparing {ext.upper()} for {report.report_year}-{report.report_month:02d} (job #{job.id}). The download link will work once it is done.", "info")
+    return redirect(url_for("reports.index"))
+
 
-    # PDF
-    from reportlab.lib.pagesizes import letter
-    from reportlab.pdfgen import canvas
-    buf = BytesIO()
-    c = canvas.Canvas(buf, pagesize=letter)
-    c.drawString(72, 750, f"GCO Monthly Report - {year}-{month:02d}")
-    c.drawString(72, 720, "Type: All transactions")
-    c.drawString(72, 690, f"Generated: {report.generated_at.strftime('%Y-%m-%d %H:%M')}")
-    if report.summary_data:
-        try:
-            data = json.loads(report.summary_data)
-            y = 660
-            for k, v in data.items():
-                c.drawString(72, y, f"{k}: {v}")
-                y -= 20
-        except Exception:
-            pass
-    c.save()
-    buf.seek(0)
-    return send_file(
-        buf,
-        mimetype="application/pdf",
-        as_attachment=True,
-        download_name=f"{base_name}.pdf",
-    )
+@reports_bp.route("/jobs/<int:jid>")
+@login_required
+@staff_required
+def job_status(jid):
+    """Job status/progress for polling."""
+    job = db.session.get(Job, jid)
+    if not job:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(job_dict(job))
+
+
+@reports_bp.route("/api/transactions")
+@login_required
+@staff_required
+def api_transactions():
+    """Paginated JSON feed of a month's transactions in chronological order."""
+    now = datetime.utcnow()
+    try:
+        year = int(request.args.get("year") or now.year)
+        month = int(request.args.get("month") or now.month)
+        page = max(1, int(request.args.get("page") or 1))
+        per_page = min(MAX_PER_PAGE, max(1, int(request.args.get("per_page") or 100)))
+    except ValueError:
+        return jsonify({"error": "Invalid parameters"}), 400
+    if not 1 <= month <= 12:
+        return jsonify({"error": "Invalid month"}), 400
+    items, has_more = monthly_report.transactions_page(year, month, page, per_page)
+    return jsonify({
+        "year": year,
+        "month": month,
+        "page": page,
+        "per_page": per_page,
+        "items": items,
+        "next_page": page + 1 if has_more else None,
+    })
@@ -0,0 +1,74 @@
+"""Staff search across document requests, tickets, appointments and visitors."""
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask_login import login_required
+from utils.decorators import staff_required
+
+from extensions import db
+from models import Appointment, DocumentRequest, LogbookEntry, Ticket
+from services import search_index
+
+search_bp = Blueprint("search", __name__)
+
+MAX_RESULTS = 100
+
+
+def _results():
+    q = request.args.get("q", "").strip()
+    module = request.args.get("module", "").strip() or None
+    try:
+        limit = max(1, min(MAX_RESULTS, int(request.args.get("limit") or 50)))
+    except ValueError:
+        limit = 50
+    return q, module, search_index.search(q, module=module, limit=limit)
+
+
+@search_bp.route("/")
+@login_required
+@staff_required
+def index():
+    q, module, results = _results()
+    return render_template(
+        "search/index.html",
+        q=q,
+        module=module,
+        results=results,
+        modules=search_index.MODULE_LABELS,
+    )
+
+
+@search_bp.route("/api")
+@login_required
+@staff_required
+def api():
+    q, _module, results = _results()
+    return jsonify({
+        "q": q,
+        "results": [
+            {**r, "snippet": str(r["snippet"]), "url": url_for("search.open_result", module=r["module"], ref_id=r["ref_id"])}
+            for r in results
+        ],
+    })
+
+
+@search_bp.route("/open/<module>/<int:ref_id>")
+@login_required
+@staff_required
+def open_result(module, ref_id):
+    """Send a search hit to the page that shows the record."""
+    if module == "document_requests":
+        req = db.session.get(DocumentRequest, ref_id)
+        if req:
+            return redirect(url_for("document_requests.index", tracking_number=req.tracking_number))
+    elif module == "tickets":
+        t = db.session.get(Ticket, ref_id)
+        if t:
+            return redirect(url_for("tickets.index", ticket_number=t.ticket_number))
+    elif module == "appointments":
+        if db.session.get(Appointment, ref_id):
+            return redirect(url_for("appointments.edit", aid=ref_id))
+    elif module == "logbook":
+        e = db.session.get(LogbookEntry, ref_id)
+        if e:
+            return redirect(url_for("logbook.reports", **{"from": e.date.isoformat(), "to": e.date.isoformat()}))
+    flash("Record not found.", "error")
+    return redirect(url_for("search.index"))
@@ -2,10 +2,10 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 from utils.decorators import staff_required
-from sqlalchemy import func
 
-from extensions import db
-from models import Survey, SurveyQuestion, SurveyResponse
+from extensions import csrf, db
+from models import Survey, SurveyQuestion
+from services import survey_analytics, survey_stats, survey_submissions
 from services.import_export import import_survey_responses_excel
 
 surveys_bp = Blueprint("surveys", __name__)
@@ -51,23 +51,32 @@ def create():
 
 
 @surveys_bp.route("/<int:sid>/respond", methods=["GET", "POST"])
+@csrf.exempt
 def respond(sid):
-    """Public survey response - no login required."""
-    survey = Survey.query.get(sid)
-    if not survey or not survey.is_active:
+    """Public survey response - no login required. Accepts the form or JSON ({"answers": {"<question id>": value}}).
+
+    JSON needs no CSRF token: the endpoint is public and only appends answers, and
+    a cross-site page cannot send a JSON body without a CORS preflight. The form still checks its token.
+    """
+    survey = survey_submissions.definition(sid)
+    if not survey or not survey["is_active"]:
+        if request.is_json:
+            return jsonify({"error": "Survey not found or inactive."}), 404
         flash("Survey not found or inactive.", "error")
         return redirect(url_for("surveys.index"))
     if request.method == "POST":
-        for q in survey.questions:
-            val = request.form.get(f"q{q.id}")
-            if val is not None and val != "":
-                try:
-                    fval = float(val)
-                    resp = SurveyResponse(survey_id=sid, question_id=q.id, response_value=fval)
-                except ValueError:
-                    resp = SurveyResponse(survey_id=sid, question_id=q.id, response_text=str(val))
-                db.session.add(resp)
-        db.session.commit()
+        if not request.is_json:
+            csrf.protect()
+        try:
+            answers = survey_submissions.parse(survey, request.get_json(silent=True) if request.is_json else request.form)
+        except ValueError as e:
+            if request.is_json:
+                return jsonify({"error": str(e)}), 400
+            flash(str(e), "error")
+            return redirect(url_for("surveys.respond", sid=sid))
+        respondent_id = survey_submissions.submit(survey, answers)
+        if request.is_json:
+            return jsonify({"respondent_id": respondent_id, "answers": len(answers)}), 201
         flash("Thank you for your response.", "success")
         return redirect(url_for("surveys.respond", sid=sid))
     return render_template("surveys/respond.html", survey=survey)
@@ -81,19 +90,8 @@ def detail(sid):
     if not survey:
         flash("Survey not found.", "error")
         return redirect(url_for("surveys.index"))
-    # Compute averages per question
-    avgs = (
-        db.session.query(
-            SurveyResponse.question_id,
-            func.avg(SurveyResponse.response_value).label("avg"),
-            func.count(SurveyResponse.id).label("count"),
-        )
-        .filter(SurveyResponse.survey_id == sid)
-        .group_by(SurveyResponse.question_id)
-        .all()
-    )
-    avg_map = {a[0]: {"avg": round(float(a[1] or 0), 2), "count": a[2]} for a in avgs}
-    return render_template("surveys/detail.html", survey=survey, avg_map=avg_map)
+    questions = SurveyQuestion.query.filter_by(survey_id=sid).order_by(SurveyQuestion.order_index).all()
+    return render_template("surveys/detail.html", survey=survey, questions=questions, stats=survey_stats.summary(sid))
 
 
 @surveys_bp.route("/api/<int:sid>/chart-data")
@@ -101,17 +99,32 @@ def detail(sid):
 @staff_required
 def api_chart_data(sid):
     """JSON for Chart.js - question averages."""
-    avgs = (
-        db.session.query(
-            SurveyQuestion.question_text,
-            func.avg(SurveyResponse.response_value).label("avg"),
-        )
-        .join(SurveyResponse, SurveyResponse.question_id == SurveyQuestion.id)
-        .filter(SurveyQuestion.survey_id == sid)
-        .group_by(SurveyQuestion.id)
-        .all()
-    )
-    return jsonify({"labels": [a[0][:30] for a in avgs], "data": [round(float(a[1] or 0), 2) for a in avgs]})
+    stats = survey_stats.summary(sid)
+    questions = SurveyQuestion.query.filter_by(survey_id=sid).order_by(SurveyQuestion.order_index).all()
+    rated = [(q.question_text[:30], stats[q.id]["mean"]) for q in questions if stats.get(q.id, {}).get("mean") is not None]
+    return jsonify({"labels": [label for label, _m in rated], "data": [mean for _l, mean in rated]})
+
+
+@surveys_bp.route("/api/<int:sid>/analytics")
+@login_required
+@staff_required
+def api_analytics(sid):
+    """Per-question histogram, percentiles, std, top terms, and answers over time."""
+    if not db.session.get(Survey, sid):
+        return jsonify({"error": "Survey not found."}), 404
+    return jsonify(survey_analytics.analyze(sid))
+
+
+@surveys_bp.route("/api/<int:sid>/crosstab")
+@login_required
+@staff_required
+def api_crosstab(sid):
+    """?q1=<question id>&q2=<question id>: respondents by their answers to both questions."""
+    q1, q2 = request.args.get("q1", type=int), request.args.get("q2", type=int)
+    known = {q.id for q in SurveyQuestion.query.filter_by(survey_id=sid).with_entities(SurveyQuestion.id)}
+    if q1 not in known or q2 not in known or q1 == q2:
+        return jsonify({"error": "q1 and q2 must be two different questions of this survey."}), 400
+    return jsonify(survey_analytics.crosstab(sid, q1, q2))
 
 
 @surveys_bp.route("/<int:sid>/import", methods=["GET", "POST"])
@@ -8,23 +8,50 @@ import os
 
 from extensions import db
 from models import Ticket
+from services import activity_rollup, dashboard_counters, search_index
 from services.import_export import import_tickets_excel, export_tickets_excel
+from services.ticket_service import generate_ticket_number
+from services.xlsx_export import XLSX_MIMETYPE
+from utils.date_ranges import in_range
+from utils.pagination import filter_params, keyset_page, list_args, page_args
 
 tickets_bp = Blueprint("tickets", __name__)
 
 
-def _next_ticket_number():
-    last = Ticket.query.order_by(Ticket.id.desc()).first()
-    n = (last.id + 1) if last else 1
-    return f"TKT-{datetime.utcnow().strftime('%Y%m%d')}-{n:04d}"
+TICKET_STATUSES = ["Open", "In Progress", "Resolved", "Closed"]
+TICKET_PRIORITIES = ["Low", "Medium", "High"]
 
 
 @tickets_bp.route("/")
 @login_required
 @staff_required
 def index():
-    tickets = Ticket.query.order_by(Ticket.created_at.desc()).all()
-    return render_template("tickets/index.html", tickets=tickets)
+    f = list_args("status", "priority", "assigned_to", "ticket_number")
+    query = Ticket.query
+    if f["ticket_number"]:
+        query = query.filter(Ticket.ticket_number == f["ticket_number"])
+    if f["status"]:
+        query = query.filter(Ticket.status == f["status"])
+    if f["priority"]:
+        query = query.filter(Ticket.priority == f["priority"])
+    if f["assigned_to"]:
+        query = query.filter(Ticket.assigned_to == f["assigned_to"])
+    if f["start"] or f["end"]:
+        query = query.filter(in_range(Ticket.created_at, f["start"], f["end"]))
+    page = keyset_page(query, [Ticket.created_at, Ticket.id], **page_args())
+    total = None
+    if not f["assigned_to"] and not f["ticket_number"]:  # the rollup has no assignee dimension
+        total = activity_rollup.count_matching("tickets", f["start"], f["end"], status=f["status"], kind=f["priority"])
+    return render_template(
+        "tickets/index.html",
+        tickets=page.items,
+        page=page,
+        total=total,
+        filters=f,
+        params=filter_params(f),
+        statuses=TICKET_STATUSES,
+        priorities=TICKET_PRIORITIES,
+    )
 
 
 @tickets_bp.route("/create", methods=["GET", "POST"])
@@ -41,7 +68,7 @@ def create():
             flash("Subject and requester name are required.", "error")
             return render_template("tickets/form.html")
         t = Ticket(
-            ticket_number=_next_ticket_number(),
+            ticket_number=generate_ticket_number(),
             subject=subject,
             description=description or None,
             requester_name=requester,
@@ -59,6 +86,10 @@ def create():
             f.save(path)
             t.attachment_path = fn
         db.session.add(t)
+        db.session.flush()
+        search_index.index(t)
+        dashboard_counters.ticket_created(t.status)
+        activity_rollup.record_added(t)
         db.session.commit()
         flash(f"Ticket created: {t.ticket_number}", "success")
         return redirect(url_for("tickets.index"))
@@ -75,10 +106,13 @@ def update_ticket(tid):
         return redirect(url_for("tickets.index"))
     status = request.form.get("status", t.status)
     assigned = request.form.get("assigned_to", "").strip()
+    dashboard_counters.ticket_status_changed(t.status, status)
+    old_key = activity_rollup.key_for(t)
     t.status = status
     t.assigned_to = assigned or None
     if status in ("Resolved", "Closed"):
         t.resolved_at = datetime.utcnow()
+    activity_rollup.record_changed(old_key, t)
     db.session.commit()
     flash("Ticket updated.", "success")
     return redirect(url_for("tickets.index"))
@@ -106,12 +140,11 @@ def import_tickets():
 @login_required
 @staff_required
 def export_tickets():
-    buf = export_tickets_excel()
-    from io import BytesIO
+    out = export_tickets_excel()
     fn = f"tickets_{datetime.utcnow().strftime('%Y%m%d_%H%M')}.xlsx"
     return send_file(
-        BytesIO(buf),
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        out,
+        mimetype=XLSX_MIMETYPE,
         as_attachment=True,
         download_name=fn,
     )
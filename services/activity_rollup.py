@@ -0,0 +1,195 @@
+"""Daily activity rollup: incremental maintenance, rebuild and reads.
+
+Each tracked record maps to one (module, day, status, kind) bucket. Write paths
+call ``record_added`` / ``record_changed`` before committing; imports pass a
+Counter of keys to ``record_keys``.
+"""
+from collections import Counter
+from datetime import date, datetime
+
+from sqlalchemy import case, func, insert, literal_column
+
+from extensions import db
+from models import Appointment, DailyActivityRollup, DocumentRequest, LogbookEntry, Ticket
+from services import logbook_archive
+from utils.date_ranges import as_date, day_bucket, in_range, month_bucket, month_range
+from utils.db_helpers import increment
+
+MODULES = ("document_requests", "tickets", "logbook", "appointments")
+
+
+def key_for(obj) -> tuple | None:
+    """Rollup bucket (module, day, status, kind) a record currently counts towards."""
+    if isinstance(obj, DocumentRequest):
+        day = (obj.requested_at or datetime.utcnow()).date()
+        return ("document_requests", day, obj.status or "", (obj.document_type or "")[:100])
+    if isinstance(obj, Ticket):
+        day = (obj.created_at or datetime.utcnow()).date()
+        return ("tickets", day, obj.status or "", obj.priority or "")
+    if isinstance(obj, LogbookEntry):
+        return ("logbook", obj.date, "Out" if obj.time_out else "In", "")
+    if isinstance(obj, Appointment):
+        return ("appointments", obj.preferred_date, obj.status or "", obj.appointment_type or "")
+    return None
+
+
+def _bump(key, delta: int) -> None:
+    if key is None or not delta:
+        return
+    module, day, status, kind = key
+    if day is None:
+        return
+    increment(
+        DailyActivityRollup,
+        {"day": day, "module": module, "status": status, "kind": kind},
+        {"count": delta},
+    )
+
+
+def record_added(obj, count: int = 1) -> None:
+    """Count a newly created record."""
+    _bump(key_for(obj), count)
+
+
+def record_changed(old_key, obj) -> None:
+    """Move a record from ``old_key`` (taken before the change) to its current bucket."""
+    new_key = key_for(obj)
+    if old_key == new_key:
+        return
+    _bump(old_key, -1)
+    _bump(new_key, 1)
+
+
+def record_keys(keys: Counter) -> None:
+    """Add many records at once, e.g. ``Counter(key_for(o) for o in imported)``."""
+    for key, n in keys.items():
+        _bump(key, n)
+
+
+def _source_counts() -> Counter:
+    """Aggregate the source tables into rollup buckets (used by rebuild)."""
+    counts = Counter()
+    specs = [
+        ("document_requests", day_bucket(DocumentRequest.requested_at), DocumentRequest.status, DocumentRequest.document_type),
+        ("tickets", day_bucket(Ticket.created_at), Ticket.status, Ticket.priority),
+        ("logbook", LogbookEntry.date, case((LogbookEntry.time_out.is_(None), literal_column("'In'")), else_=literal_column("'Out'")), None),
+        ("appointments", Appointment.preferred_date, Appointment.status, Appointment.appointment_type),
+    ]
+    for module, day_col, status_col, kind_col in specs:
+        cols = [day_col, status_col] + ([kind_col] if kind_col is not None else [])
+        q = db.session.query(*cols, func.count())
+        if module == "logbook":
+            q = q.filter(logbook_archive.live_filter())
+        for row in q.group_by(*cols).all():
+            day = as_date(row[0])
+            if day is None:
+                continue
+            kind = (row[2] or "")[:100] if kind_col is not None else ""
+            counts[(module, day, row[1] or "", kind)] += row[-1]
+    counts.update(logbook_archive.daily_counts())  # archived visits still count
+    return counts
+
+
+def rebuild() -> int:
+    """Recompute the whole rollup from the source tables and commit. Returns number of buckets."""
+    counts = _source_counts()
+    db.session.query(DailyActivityRollup).delete()
+    rows = [
+        {"module": module, "day": day, "status": status, "kind": kind, "count": n}
+        for (module, day, status, kind), n in counts.items()
+        if n
+    ]
+    if rows:
+        db.session.execute(insert(DailyActivityRollup), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def ensure_backfilled() -> None:
+    """Build the rollup once for databases that predate it."""
+    if db.session.query(DailyActivityRollup.id).first() is not None:
+        return
+    has_data = any(
+        db.session.query(m.id).first() is not None
+        for m in (DocumentRequest, Ticket, LogbookEntry, Appointment)
+    )
+    if has_data:
+        rebuild()
+
+
+def totals_between(start: date, end: date) -> dict:
+    """Record counts per module for days in [start, end)."""
+    rows = (
+        db.session.query(DailyActivityRollup.module, func.sum(DailyActivityRollup.count))
+        .filter(in_range(DailyActivityRollup.day, start, end))
+        .group_by(DailyActivityRollup.module)
+        .all()
+    )
+    totals = {m: 0 for m in MODULES}
+    totals.update({m: int(n or 0) for m, n in rows})
+    return totals
+
+
+def month_totals(year: int, month: int) -> dict:
+    return totals_between(*month_range(year, month))
+
+
+def count_matching(module: str, start: date = None, end: date = None, status: str = None, kind: str = None) -> int:
+    """Records of a module on days in [start, end), optionally with one status/kind. Bounds may be None."""
+    q = db.session.query(func.sum(DailyActivityRollup.count)).filter(
+        DailyActivityRollup.module == module,
+        in_range(DailyActivityRollup.day, start, end),
+    )
+    if status:
+        q = q.filter(DailyActivityRollup.status == status)
+    if kind:
+        q = q.filter(DailyActivityRollup.kind == kind)
+    return int(q.scalar() or 0)
+
+
+def breakdown_between(start: date, end: date, module: str) -> dict:
+    """Per-status and per-kind counts of one module for days in [start, end)."""
+    rows = (
+        db.session.query(
+            DailyActivityRollup.status,
+            DailyActivityRollup.kind,
+            func.sum(DailyActivityRollup.count),
+        )
+        .filter(DailyActivityRollup.module == module, in_range(DailyActivityRollup.day, start, end))
+        .group_by(DailyActivityRollup.status, DailyActivityRollup.kind)
+        .all()
+    )
+    by_status, by_kind = Counter(), Counter()
+    for status, kind, n in rows:
+        if status:
+            by_status[status] += int(n or 0)
+        if kind:
+            by_kind[kind] += int(n or 0)
+    return {"by_status": dict(by_status), "by_kind": dict(by_kind)}
+
+
+def monthly_series(module: str, start: date, end: date) -> dict:
+    """{'YYYY-MM': count} for one module over days in [start, end)."""
+    bucket = month_bucket(DailyActivityRollup.day).label("month")
+    rows = (
+        db.session.query(bucket, func.sum(DailyActivityRollup.count))
+        .filter(DailyActivityRollup.module == module, in_range(DailyActivityRollup.day, start, end))
+        .group_by("month")
+        .order_by("month")
+        .all()
+    )
+    return {label: int(n or 0) for label, n in rows if n}
+
+
+def daily_counts(start: date, end: date) -> dict:
+    """{module: {day: count}} for days in [start, end)."""
+    rows = (
+        db.session.query(DailyActivityRollup.module, DailyActivityRollup.day, func.sum(DailyActivityRollup.count))
+        .filter(in_range(DailyActivityRollup.day, start, end))
+        .group_by(DailyActivityRollup.module, DailyActivityRollup.day)
+        .all()
+    )
+    series = {m: {} for m in MODULES}
+    for module, day, n in rows:
+        series.setdefault(module, {})[as_date(day)] = int(n or 0)
+    return series
@@ -0,0 +1,115 @@
+"""Appointment calendar: a day, week or month of appointments grouped by time slot.
+
+Windows are aligned (a day, a Monday-to-Sunday week, a calendar month), so a
+change on one date maps to exactly three cached windows. Routes that change an
+appointment call ``invalidate()`` with its old and new dates after commit; the
+TTL only bounds staleness from writes that bypass the routes.
+"""
+from calendar import monthrange
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, select
+
+from extensions import db
+from models import Appointment
+from services.slot_capacity import TIME_SLOTS
+from utils.date_ranges import in_range
+from utils.local_cache import MISS, LocalCache
+
+calendar_cache = LocalCache("appointment_calendar", max_entries=500)
+CALENDAR_TTL = 300
+VIEWS = ("day", "week", "month")
+UNSCHEDULED = ""  # slot key for appointments without one of TIME_SLOTS
+
+
+def window(view: str, anchor: date) -> tuple:
+    """[start, end) of the ``view`` window containing ``anchor``."""
+    if view == "day":
+        return anchor, anchor + timedelta(days=1)
+    if view == "week":
+        start = anchor - timedelta(days=anchor.weekday())
+        return start, start + timedelta(days=7)
+    start = anchor.replace(day=1)
+    return start, start + timedelta(days=monthrange(anchor.year, anchor.month)[1])
+
+
+def _key(view: str, start: date) -> str:
+    return f"{view}|{start.isoformat()}"
+
+
+def compute(view: str, start: date, end: date) -> dict:
+    """Calendar payload for [start, end): two queries, both range scans on preferred_date."""
+    counts = {}
+    totals = db.session.execute(
+        select(Appointment.preferred_date, Appointment.status, Appointment.appointment_type, func.count())
+        .where(in_range(Appointment.preferred_date, start, end))
+        .group_by(Appointment.preferred_date, Appointment.status, Appointment.appointment_type)
+    )
+    for day, status, apt_type, n in totals:
+        c = counts.setdefault(day, {"total": 0, "by_status": Counter(), "by_type": Counter()})
+        c["total"] += n
+        c["by_status"][status or "Pending"] += n
+        c["by_type"][apt_type] += n
+
+    slots = {}
+    rows = db.session.execute(
+        select(
+            Appointment.id, Appointment.preferred_date, Appointment.preferred_time, Appointment.status,
+            Appointment.appointment_type, Appointment.requester_name, Appointment.purpose,
+        )
+        .where(in_range(Appointment.preferred_date, start, end))
+        .order_by(Appointment.preferred_date, Appointment.preferred_time, Appointment.id)
+    )
+    for r in rows:
+        slot = r.preferred_time if r.preferred_time in TIME_SLOTS else UNSCHEDULED
+        slots.setdefault(r.preferred_date, {}).setdefault(slot, []).append({
+            "id": r.id,
+            "time": r.preferred_time,
+            "status": r.status or "Pending",
+            "type": r.appointment_type,
+            "requester_name": r.requester_name,
+            "purpose": r.purpose,
+        })
+
+    days = []
+    for n in range((end - start).days):
+        day = start + timedelta(days=n)
+        c = counts.get(day, {"total": 0, "by_status": {}, "by_type": {}})
+        days.append({
+            "date": day.isoformat(),
+            "total": c["total"],
+            "by_status": dict(c["by_status"]),
+            "by_type": dict(c["by_type"]),
+            "slots": slots.get(day, {}),
+        })
+    return {
+        "view": view,
+        "start": start.isoformat(),
+        "end": (end - timedelta(days=1)).isoformat(),
+        "slots": TIME_SLOTS,
+        "generated_at": datetime.utcnow().isoformat(),
+        "days": days,
+    }
+
+
+def calendar(view: str, anchor: date) -> dict:
+    """Cached calendar for the ``view`` window containing ``anchor``."""
+    start, end = window(view, anchor)
+    key = _key(view, start)
+    result = calendar_cache.get(key)
+    if result is MISS:
+        result = compute(view, start, end)
+        calendar_cache.set(key, result, CALENDAR_TTL)
+    return result
+
+
+def invalidate(*days: date) -> None:
+    """Drop cached windows containing any of ``days`` (call after commit)."""
+    keys = set()
+    for day in days:
+        if day is None:
+            continue
+        for view in VIEWS:
+            keys.add(_key(view, window(view, day)[0]))
+    calendar_cache.delete(*keys)
@@ -0,0 +1,145 @@
+"""Incrementally maintained dashboard counters.
+
+Write paths call the ``*_created`` / ``*_changed`` helpers inside their own
+transaction (before commit), so the counters row moves together with the data.
+``reconcile()`` rebuilds the row from the source tables.
+"""
+from datetime import datetime
+
+from sqlalchemy import case, func, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import DashboardCounter, DocumentRequest, Ticket, LogbookEntry
+
+COUNTER_ROW_ID = 1
+
+# Status -> counter column. Statuses not listed are not counted on the dashboard.
+REQUEST_STATUS_COUNTERS = {
+    "Pending": "pending_requests",
+    "Ready": "completed_requests",
+    "Claimed": "completed_requests",
+}
+TICKET_STATUS_COUNTERS = {
+    "Open": "open_tickets",
+    "In Progress": "open_tickets",
+}
+
+
+def _apply(deltas: dict) -> None:
+    """Add deltas to counter columns with a single atomic UPDATE."""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    values = {k: getattr(DashboardCounter, k) + v for k, v in deltas.items()}
+    db.session.execute(
+        update(DashboardCounter).where(DashboardCounter.id == COUNTER_ROW_ID).values(**values)
+    )
+
+
+def _status_deltas(mapping: dict, old_status, new_status, count: int) -> dict:
+    deltas = {}
+    old_col, new_col = mapping.get(old_status), mapping.get(new_status)
+    if old_col == new_col:
+        return deltas
+    if old_col:
+        deltas[old_col] = deltas.get(old_col, 0) - count
+    if new_col:
+        deltas[new_col] = deltas.get(new_col, 0) + count
+    return deltas
+
+
+def request_status_changed(old_status, new_status, count: int = 1) -> None:
+    """Move document request(s) between counters. Use old_status=None for new rows."""
+    _apply(_status_deltas(REQUEST_STATUS_COUNTERS, old_status, new_status, count))
+
+
+def request_created(status: str = "Pending", count: int = 1) -> None:
+    request_status_changed(None, status, count)
+
+
+def ticket_status_changed(old_status, new_status, count: int = 1) -> None:
+    """Move ticket(s) between counters. Use old_status=None for new rows."""
+    _apply(_status_deltas(TICKET_STATUS_COUNTERS, old_status, new_status, count))
+
+
+def ticket_created(status: str = "Open", count: int = 1) -> None:
+    ticket_status_changed(None, status, count)
+
+
+def visitors_checked_in(day, count: int = 1) -> None:
+    """Count visitors logged for ``day``. Only the current UTC day is tracked."""
+    if not count or day != datetime.utcnow().date():
+        return
+    db.session.execute(
+        update(DashboardCounter)
+        .where(DashboardCounter.id == COUNTER_ROW_ID)
+        .values(
+            visitors_today=case(
+                (DashboardCounter.visitors_date == day, DashboardCounter.visitors_today + count),
+                else_=count,
+            ),
+            visitors_date=day,
+        )
+    )
+
+
+def _count_from_sources() -> dict:
+    today = datetime.utcnow().date()
+    req_counts = dict(
+        db.session.query(DocumentRequest.status, func.count(DocumentRequest.id))
+        .group_by(DocumentRequest.status)
+        .all()
+    )
+    ticket_counts = dict(
+        db.session.query(Ticket.status, func.count(Ticket.id))
+        .group_by(Ticket.status)
+        .all()
+    )
+    values = {"pending_requests": 0, "completed_requests": 0, "open_tickets": 0}
+    for status, n in req_counts.items():
+        col = REQUEST_STATUS_COUNTERS.get(status)
+        if col:
+            values[col] += n
+    for status, n in ticket_counts.items():
+        col = TICKET_STATUS_COUNTERS.get(status)
+        if col:
+            values[col] += n
+    values["visitors_today"] = LogbookEntry.query.filter(LogbookEntry.date == today).count()
+    values["visitors_date"] = today
+    return values
+
+
+def reconcile() -> dict:
+    """Rebuild the counters row from the source tables and commit. Returns the new values."""
+    values = _count_from_sources()
+    values["reconciled_at"] = datetime.utcnow()
+    for _attempt in range(2):
+        row = db.session.get(DashboardCounter, COUNTER_ROW_ID)
+        if row is None:
+            db.session.add(DashboardCounter(id=COUNTER_ROW_ID, **values))
+        else:
+            for k, v in values.items():
+                setattr(row, k, v)
+        try:
+            db.session.commit()
+            break
+        except IntegrityError:
+            # Another worker created the row first; retry as an update.
+            db.session.rollback()
+    return values
+
+
+def get_counters() -> dict:
+    """Read the dashboard counters (one row). Creates the row on first use."""
+    row = db.session.get(DashboardCounter, COUNTER_ROW_ID)
+    if row is None:
+        reconcile()
+        row = db.session.get(DashboardCounter, COUNTER_ROW_ID)
+    today = datetime.utcnow().date()
+    return {
+        "pending_requests": row.pending_requests,
+        "open_tickets": row.open_tickets,
+        "completed_requests": row.completed_requests,
+        "visitors_today": row.visitors_today if row.visitors_date == today else 0,
+    }
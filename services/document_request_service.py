@@ -1,26 +1,46 @@
 """Document request business logic."""
 import re
 from datetime import datetime
+from sqlalchemy import func
 from extensions import db
 from models import DocumentRequest, RequestStatusLog
+from services import activity_rollup, dashboard_counters, search_index, sequences
+from utils.local_cache import MISS, LocalCache
 
 
-def generate_tracking_number() -> str:
-    """Generate unique tracking number (e.g., GCO-2025-00001)."""
-    year = datetime.utcnow().year
-    last = (
-        DocumentRequest.query.filter(
-            DocumentRequest.tracking_number.like(f"GCO-{year}-%")
-        )
-        .order_by(DocumentRequest.id.desc())
-        .first()
+TRACKING_PREFIX = "GCO"
+
+# Public tracking lookups: tracking number -> status snapshot, or None for unknown numbers
+tracking_cache = LocalCache("tracking", max_entries=5000)
+TRACKING_HIT_TTL = 300
+TRACKING_MISS_TTL = 30
+
+
+def _highest_tracking_seq(year: int) -> int:
+    """Highest sequence number used in the year's tracking numbers (seeds the sequence once)."""
+    rows = (
+        db.session.query(DocumentRequest.tracking_number)
+        .filter(DocumentRequest.tracking_number.like(f"{TRACKING_PREFIX}-{year}-%"))
+        .order_by(func.length(DocumentRequest.tracking_number).desc(), DocumentRequest.tracking_number.desc())
+        .limit(20)
     )
-    seq = 1
-    if last:
-        m = re.search(r"GCO-\d{4}-(\d+)", last.tracking_number)
+    for (tn,) in rows:
+        m = re.fullmatch(rf"{TRACKING_PREFIX}-\d{{4}}-(\d+)", tn)
         if m:
-            seq = int(m.group(1)) + 1
-    return f"GCO-{year}-{seq:05d}"
+            return int(m.group(1))
+    return 0
+
+
+def reserve_tracking_numbers(count: int) -> list[str]:
+    """Reserve ``count`` consecutive tracking numbers for this year in one allocation."""
+    year = datetime.utcnow().year
+    first = sequences.allocate(f"{TRACKING_PREFIX}-{year}", count, seed=lambda: _highest_tracking_seq(year))
+    return [f"{TRACKING_PREFIX}-{year}-{n:05d}" for n in range(first, first + count)]
+
+
+def generate_tracking_number() -> str:
+    """Generate unique tracking number (e.g., GCO-2025-00001)."""
+    return reserve_tracking_numbers(1)[0]
 
 
 def create_request(
@@ -43,7 +63,11 @@ def create_request(
     db.session.add(req)
     db.session.flush()
     _add_status_log(req.id, "Pending", "Request created", None)
+    search_index.index(req)
+    dashboard_counters.request_created("Pending")
+    activity_rollup.record_added(req)
     db.session.commit()
+    invalidate_tracking(req.tracking_number)  # drop a cached "not found"
     return req
 
 
@@ -54,6 +78,35 @@ def get_request_by_tracking(tracking_number: str):
     ).first()
 
 
+def tracking_snapshot(req: DocumentRequest) -> dict:
+    """Public view of a request, as shown on the tracking page and API."""
+    return {
+        "tracking_number": req.tracking_number,
+        "status": req.status,
+        "requester_name": req.requester_name,
+        "document_type": req.document_type,
+        "updated_at": (req.updated_at or req.requested_at or datetime.utcnow()).isoformat(),
+    }
+
+
+def track_request(tracking_number: str) -> dict | None:
+    """Cached public lookup: snapshot of the request, or None if the number is unknown."""
+    tn = tracking_number.strip()
+    if not tn or len(tn) > DocumentRequest.tracking_number.type.length:
+        return None
+    snap = tracking_cache.get(tn)
+    if snap is MISS:
+        req = get_request_by_tracking(tn)
+        snap = tracking_snapshot(req) if req else None
+        tracking_cache.set(tn, snap, TRACKING_HIT_TTL if snap else TRACKING_MISS_TTL)
+    return snap
+
+
+def invalidate_tracking(*tracking_numbers: str) -> None:
+    """Drop cached lookups after the requests were changed (call after commit)."""
+    tracking_cache.delete(*tracking_numbers)
+
+
 def update_request_status(
     request_id: int,
     new_status: str,
@@ -65,11 +118,15 @@ def update_request_status(
     if not req:
         return False
     old_status = req.status
+    old_key = activity_rollup.key_for(req)
     req.status = new_status
     if new_status in ("Ready", "Claimed", "Cancelled"):
         req.completed_at = datetime.utcnow()
     _add_status_log(request_id, new_status, notes, changed_by)
+    dashboard_counters.request_status_changed(old_status, new_status)
+    activity_rollup.record_changed(old_key, req)
     db.session.commit()
+    invalidate_tracking(req.tracking_number)
     return True
 
 
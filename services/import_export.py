@@ -1,11 +1,14 @@
 """CSV/Excel import and export with validation."""
-import io
-import re
+import uuid
+from collections import Counter
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 from flask import current_app
+from sqlalchemy import insert, select
 from werkzeug.utils import secure_filename
 
 from extensions import db
@@ -19,6 +22,11 @@ from models import (
     LogbookEntry,
     ImportLog,
 )
+from services import activity_rollup, dashboard_counters, logbook_archive, presence, search_index, survey_stats
+from services.document_request_service import invalidate_tracking, reserve_tracking_numbers
+from services.ticket_service import reserve_ticket_numbers
+from services.xlsx_export import write_xlsx
+from utils.db_helpers import stream_select
 
 
 def _allowed_file(filename):
@@ -34,6 +42,10 @@ def _parse_file(file) -> pd.DataFrame:
     return pd.read_excel(file)
 
 
+def _fmt_dt(value) -> str:
+    return value.strftime("%Y-%m-%d %H:%M") if value else ""
+
+
 def _log_import(import_type: str, filename: str, rows_imported: int, rows_failed: int, status: str, error: str, user: str):
     log = ImportLog(
         import_type=import_type,
@@ -61,22 +73,22 @@ def import_requests_excel(file, user: str) -> tuple[int, int, str | None]:
         missing = [c for c in REQ_COLUMNS if c not in df.columns]
         if missing:
             return 0, 0, f"Missing required columns: {', '.join(missing)}"
-        imported, failed = 0, 0
-        year = datetime.utcnow().year
-        max_seq = 0
-        for r in DocumentRequest.query.filter(DocumentRequest.tracking_number.like(f"GCO-{year}-%")).all():
-            m = re.search(r"GCO-\d{4}-(\d+)", r.tracking_number)
-            if m:
-                max_seq = max(max_seq, int(m.group(1)))
+        failed = 0
+        rows = []
         for idx, row in df.iterrows():
+            name = str(row.get("requester_name", "")).strip()
+            doc_type = str(row.get("document_type", "")).strip()
+            if not name or not doc_type:
+                failed += 1
+                continue
+            rows.append((name, doc_type, row))
+        imported = 0
+        rollup_keys = Counter()
+        created = []
+        # One allocation for the whole file instead of one lookup per row
+        tracking_numbers = reserve_tracking_numbers(len(rows)) if rows else []
+        for tn, (name, doc_type, row) in zip(tracking_numbers, rows):
             try:
-                name = str(row.get("requester_name", "")).strip()
-                doc_type = str(row.get("document_type", "")).strip()
-                if not name or not doc_type:
-                    failed += 1
-                    continue
-                max_seq += 1
-                tn = f"GCO-{year}-{max_seq:05d}"
                 req = DocumentRequest(
                     tracking_number=tn,
                     requester_name=name,
@@ -86,10 +98,17 @@ def import_requests_excel(file, user: str) -> tuple[int, int, str | None]:
                     status="Pending",
                 )
                 db.session.add(req)
+                created.append(req)
+                rollup_keys[activity_rollup.key_for(req)] += 1
                 imported += 1
             except Exception:
                 failed += 1
+        db.session.flush()
+        search_index.index(*created)
+        dashboard_counters.request_created("Pending", imported)
+        activity_rollup.record_keys(rollup_keys)
         db.session.commit()
+        invalidate_tracking(*tracking_numbers)
         status = "Success" if failed == 0 else ("Partial" if imported else "Failed")
         _log_import("document_requests", getattr(file, "filename", "upload"), imported, failed, status, None, user)
         return imported, failed, None
@@ -99,25 +118,26 @@ def import_requests_excel(file, user: str) -> tuple[int, int, str | None]:
         return 0, 0, str(e)
 
 
-def export_requests_excel() -> bytes:
-    """Export document requests to Excel bytes."""
-    reqs = DocumentRequest.query.order_by(DocumentRequest.requested_at.desc()).all()
-    data = [
-        {
-            "Tracking Number": r.tracking_number,
-            "Requester Name": r.requester_name,
-            "Email": r.requester_email or "",
-            "Document Type": r.document_type,
-            "Purpose": r.purpose or "",
-            "Status": r.status,
-            "Requested At": r.requested_at.strftime("%Y-%m-%d %H:%M") if r.requested_at else "",
-        }
-        for r in reqs
-    ]
-    df = pd.DataFrame(data)
-    buf = io.BytesIO()
-    df.to_excel(buf, index=False, engine="openpyxl")
-    return buf.getvalue()
+REQ_EXPORT_HEADERS = ["Tracking Number", "Requester Name", "Email", "Document Type", "Purpose", "Status", "Requested At"]
+
+
+def export_requests_excel():
+    """Export document requests to an Excel file object (rewound, ready for send_file)."""
+    stmt = select(
+        DocumentRequest.tracking_number,
+        DocumentRequest.requester_name,
+        DocumentRequest.requester_email,
+        DocumentRequest.document_type,
+        DocumentRequest.purpose,
+        DocumentRequest.status,
+        DocumentRequest.requested_at,
+    ).order_by(DocumentRequest.requested_at.desc())
+    rows = (
+        (tn, name, email or "", doc_type, purpose or "", status, _fmt_dt(requested_at))
+        for tn, name, email, doc_type, purpose, status, requested_at in stream_select(stmt)
+    )
+    out, _stats = write_xlsx(rows, REQ_EXPORT_HEADERS, label="document_requests")
+    return out
 
 
 # Tickets
@@ -132,29 +152,41 @@ def import_tickets_excel(file, user: str) -> tuple[int, int, str | None]:
         df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
         if "subject" not in df.columns or "requester_name" not in df.columns:
             return 0, 0, "Missing required columns: subject, requester_name"
-        imported, failed = 0, 0
-        for idx, row in df.iterrows():
-            try:
-                subj = str(row.get("subject", "")).strip()
-                name = str(row.get("requester_name", "")).strip()
-                if not subj or not name:
-                    failed += 1
-                    continue
-                last = Ticket.query.order_by(Ticket.id.desc()).first()
-                tn = f"TKT-{datetime.utcnow().strftime('%Y%m%d')}-{(last.id + 1) if last else 1:04d}"
-                t = Ticket(
-                    ticket_number=tn,
-                    subject=subj,
-                    description=str(row.get("description", "")).strip() or None,
-                    requester_name=name,
-                    requester_email=str(row.get("requester_email", "")).strip() or None,
-                    priority=str(row.get("priority", "Medium")).strip() or "Medium",
-                    status="Open",
-                )
-                db.session.add(t)
-                imported += 1
-            except Exception:
+        now = datetime.utcnow()
+        records = df.reindex(columns=TICKET_COLUMNS).fillna("").astype(str).to_dict("records")
+        values, failed = [], 0
+        rollup_keys = Counter()
+        for row in records:
+            subj = row["subject"].strip()
+            name = row["requester_name"].strip()
+            if not subj or not name:
                 failed += 1
+                continue
+            priority = row["priority"].strip() or "Medium"
+            values.append({
+                "subject": subj[:200],
+                "description": row["description"].strip() or None,
+                "requester_name": name[:120],
+                "requester_email": row["requester_email"].strip()[:120] or None,
+                "priority": priority[:20],
+                "status": "Open",
+                "created_at": now,
+                "updated_at": now,
+            })
+            rollup_keys[("tickets", now.date(), "Open", priority[:20])] += 1
+        imported = len(values)
+        if values:
+            # One block of numbers and one executemany INSERT for the whole file
+            for v, tn in zip(values, reserve_ticket_numbers(imported)):
+                v["ticket_number"] = tn
+            if search_index.backend():
+                # RETURNING hands back the new ids and text for the search index in the same round trips
+                stmt = insert(Ticket).returning(Ticket.id, Ticket.ticket_number, Ticket.subject, Ticket.description)
+                search_index.index_rows(Ticket, db.session.execute(stmt, values).all())
+            else:
+                db.session.execute(insert(Ticket), values)
+        dashboard_counters.ticket_created("Open", imported)
+        activity_rollup.record_keys(rollup_keys)
         db.session.commit()
         status = "Success" if failed == 0 else ("Partial" if imported else "Failed")
         _log_import("tickets", getattr(file, "filename", "upload"), imported, failed, status, None, user)
@@ -165,24 +197,25 @@ def import_tickets_excel(file, user: str) -> tuple[int, int, str | None]:
         return 0, 0, str(e)
 
 
-def export_tickets_excel() -> bytes:
-    tickets = Ticket.query.order_by(Ticket.created_at.desc()).all()
-    data = [
-        {
-            "Ticket #": t.ticket_number,
-            "Subject": t.subject,
-            "Requester": t.requester_name,
-            "Email": t.requester_email or "",
-            "Status": t.status,
-            "Priority": t.priority,
-            "Created": t.created_at.strftime("%Y-%m-%d %H:%M") if t.created_at else "",
-        }
-        for t in tickets
-    ]
-    df = pd.DataFrame(data)
-    buf = io.BytesIO()
-    df.to_excel(buf, index=False, engine="openpyxl")
-    return buf.getvalue()
+TICKET_EXPORT_HEADERS = ["Ticket #", "Subject", "Requester", "Email", "Status", "Priority", "Created"]
+
+
+def export_tickets_excel():
+    stmt = select(
+        Ticket.ticket_number,
+        Ticket.subject,
+        Ticket.requester_name,
+        Ticket.requester_email,
+        Ticket.status,
+        Ticket.priority,
+        Ticket.created_at,
+    ).order_by(Ticket.created_at.desc())
+    rows = (
+        (tn, subject, name, email or "", status, priority, _fmt_dt(created_at))
+        for tn, subject, name, email, status, priority, created_at in stream_select(stmt)
+    )
+    out, _stats = write_xlsx(rows, TICKET_EXPORT_HEADERS, label="tickets")
+    return out
 
 
 # Logbook
@@ -198,6 +231,9 @@ def import_logbook_excel(file, user: str) -> tuple[int, int, str | None]:
         if "visitor_name" not in df.columns or "date" not in df.columns:
             return 0, 0, "Missing required columns: visitor_name, date"
         imported, failed = 0, 0
+        rollup_keys = Counter()
+        per_day = {}
+        created = []
         for idx, row in df.iterrows():
             try:
                 name = str(row.get("visitor_name", "")).strip()
@@ -219,10 +255,19 @@ def import_logbook_excel(file, user: str) -> tuple[int, int, str | None]:
                     remarks=str(row.get("remarks", "")).strip() or None,
                 )
                 db.session.add(entry)
+                created.append(entry)
+                rollup_keys[activity_rollup.key_for(entry)] += 1
+                per_day[d] = per_day.get(d, 0) + 1
                 imported += 1
             except Exception:
                 failed += 1
+        db.session.flush()
+        search_index.index(*created)
+        for d, n in per_day.items():
+            dashboard_counters.visitors_checked_in(d, n)
+        activity_rollup.record_keys(rollup_keys)
         db.session.commit()
+        presence.invalidate()
         status = "Success" if failed == 0 else ("Partial" if imported else "Failed")
         _log_import("logbook", getattr(file, "filename", "upload"), imported, failed, status, None, user)
         return imported, failed, None
@@ -232,25 +277,64 @@ def import_logbook_excel(file, user: str) -> tuple[int, int, str | None]:
         return 0, 0, str(e)
 
 
-def export_logbook_excel() -> bytes:
-    entries = LogbookEntry.query.order_by(LogbookEntry.time_in.desc()).all()
-    data = [
-        {
-            "Visitor": e.visitor_name,
-            "Purpose": e.purpose or "",
-            "Time In": e.time_in.strftime("%Y-%m-%d %H:%M") if e.time_in else "",
-            "Time Out": e.time_out.strftime("%Y-%m-%d %H:%M") if e.time_out else "",
-            "Date": str(e.date) if e.date else "",
-        }
-        for e in entries
-    ]
-    df = pd.DataFrame(data)
-    buf = io.BytesIO()
-    df.to_excel(buf, index=False, engine="openpyxl")
-    return buf.getvalue()
+LOGBOOK_EXPORT_HEADERS = ["Visitor", "Purpose", "Time In", "Time Out", "Date"]
+
+
+def export_logbook_excel():
+    """All entries, newest first, including months moved to the archive."""
+    stmt = (
+        select(
+            LogbookEntry.id,
+            LogbookEntry.visitor_name,
+            LogbookEntry.purpose,
+            LogbookEntry.time_in,
+            LogbookEntry.time_out,
+            LogbookEntry.date,
+        )
+        .where(logbook_archive.live_filter())
+        .order_by(LogbookEntry.time_in.desc(), LogbookEntry.id.desc())
+    )
+    rows = (
+        (e.visitor_name, e.purpose or "", _fmt_dt(e.time_in), _fmt_dt(e.time_out), str(e.date) if e.date else "")
+        for e in logbook_archive.merge_newest_first(stream_select(stmt))
+    )
+    out, _stats = write_xlsx(rows, LOGBOOK_EXPORT_HEADERS, label="logbook")
+    return out
 
 
 # Survey responses
+SURVEY_INSERT_CHUNK = 5000  # rows per executemany; bounds the parameter dicts held in memory
+
+
+def _normalize_column(name: str) -> str:
+    return name.strip().lower().replace(" ", "_")
+
+
+def _survey_column_map(columns, questions) -> dict:
+    """{file column: question id}, resolved once: ``q<id>`` first, else the first 30 characters of the question."""
+    available = set(columns)
+    mapping = {}
+    for q in questions:
+        prefix = _normalize_column(q.question_text[:30])
+        column = f"q{q.id}" if f"q{q.id}" in available else (prefix if prefix in available else None)
+        if column is not None and column not in mapping:
+            mapping[column] = q.id
+    return mapping
+
+
+def _survey_long_frame(df: pd.DataFrame, mapping: dict) -> pd.DataFrame:
+    """One row per answered cell: source row, question_id, response_value or response_text."""
+    wide = df[list(mapping)].set_axis(list(mapping.values()), axis=1)
+    long = wide.rename_axis("row").reset_index().melt(id_vars="row", var_name="question_id", value_name="value")
+    long = long[long["value"].notna()]
+    numeric = pd.to_numeric(long["value"], errors="coerce")
+    is_number = numeric.notna() & np.isfinite(numeric)
+    text = long["value"].astype(str).str.strip().where(~is_number)
+    long = long.assign(response_value=numeric.where(is_number), response_text=text)
+    long = long[is_number | (text.fillna("") != "")]
+    return long.sort_values("row", kind="stable")
+
+
 def import_survey_responses_excel(file, survey_id: int, user: str) -> tuple[int, int, str | None]:
     if not _allowed_file(getattr(file, "filename", "")):
         return 0, 0, "Invalid file type. Use .csv or .xlsx"
@@ -259,34 +343,49 @@ def import_survey_responses_excel(file, survey_id: int, user: str) -> tuple[int,
         return 0, 0, "Survey not found"
     try:
         df = _parse_file(file)
-        df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
+        df.columns = df.columns.astype(str).map(_normalize_column)
+        df = df.loc[:, ~df.columns.duplicated()]
         questions = SurveyQuestion.query.filter_by(survey_id=survey_id).order_by(SurveyQuestion.order_index).all()
         if not questions:
             return 0, 0, "Survey has no questions"
-        imported, failed = 0, 0
-        for idx, row in df.iterrows():
-            try:
-                for q in questions:
-                    qkey = f"q{q.id}" if f"q{q.id}" in df.columns else (q.question_text[:30] if q.question_text[:30] in df.columns else None)
-                    if qkey is None:
-                        continue
-                    val = row.get(qkey)
-                    if pd.isna(val):
-                        continue
-                    resp = SurveyResponse(
-                        survey_id=survey_id,
-                        question_id=q.id,
-                        response_value=float(val) if isinstance(val, (int, float)) else None,
-                        response_text=str(val) if not isinstance(val, (int, float)) else None,
-                    )
-                    db.session.add(resp)
-                    imported += 1
-            except Exception:
-                failed += 1
+        mapping = _survey_column_map(df.columns, questions)
+        if not mapping:
+            return 0, 0, "No columns match the survey's questions (use q<question id> or the question text)"
+        long = _survey_long_frame(df, mapping)
+        survey_stats.record_frame(survey_id, long)
+        # Cells of one source row share a respondent id; the batch prefix keeps ids unique across imports
+        batch = uuid.uuid4().hex[:12]
+        respondents = ("import-" + batch + "-") + (long["row"] + 1).astype(str)
+        columns = zip(
+            long["question_id"].astype(int).tolist(),
+            long["response_value"].astype(object).where(long["response_value"].notna(), None).tolist(),
+            long["response_text"].astype(object).where(long["response_text"].notna(), None).tolist(),
+            respondents.tolist(),
+        )
+        now = datetime.utcnow()
+        imported = 0
+        while True:
+            chunk = [
+                {
+                    "survey_id": survey_id,
+                    "question_id": qid,
+                    "response_value": value,
+                    "response_text": text,
+                    "respondent_id": respondent,
+                    "created_at": now,
+                }
+                for qid, value, text, respondent in islice(columns, SURVEY_INSERT_CHUNK)
+            ]
+            if not chunk:
+                break
+            # Core executemany of one cached statement; drivers batch it into multi-row VALUES
+            # (a literal .values(chunk) is recompiled per chunk and costs more than the inserts)
+            db.session.connection().execute(insert(SurveyResponse.__table__), chunk)
+            imported += len(chunk)
         db.session.commit()
-        status = "Success" if failed == 0 else ("Partial" if imported else "Failed")
-        _log_import("survey_responses", getattr(file, "filename", "upload"), imported, failed, status, None, user)
-        return imported, failed, None
+        status = "Success" if imported else "Failed"
+        _log_import("survey_responses", getattr(file, "filename", "upload"), imported, 0, status, None, user)
+        return imported, 0, None
     except Exception as e:
         db.session.rollback()
         _log_import("survey_responses", getattr(file, "filename", "upload"), 0, 0, "Failed", str(e), user)
@@ -0,0 +1,185 @@
+"""In-process background job runner backed by the ``jobs`` table.
+
+Jobs are rows in ``jobs``; each web worker runs them on a small thread pool.
+A job is claimed with a conditional UPDATE (queued -> running), so submitting
+the same job from several workers is harmless. ``dedupe_key`` is unique and
+only set while a job is active, which gives "one active job per key" across
+workers. Running jobs refresh ``heartbeat_at``; jobs whose heartbeat went
+stale (their worker died) are put back in the queue at startup, and by
+``enqueue`` when it is asked for the same ``dedupe_key`` again (a restarted
+worker may start before the heartbeat is stale).
+"""
+import json
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Job
+
+ACTIVE_STATUSES = ("queued", "running")
+STALE_AFTER = timedelta(minutes=5)  # running job without heartbeat for this long is considered orphaned
+MAX_ATTEMPTS = 3
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_handlers = {}
+_executor = None
+
+
+def job_handler(kind: str):
+    """Register ``fn(job, **params)`` as the handler for a job kind. Its return value is stored as the result."""
+    def register(fn):
+        _handlers[kind] = fn
+        return fn
+    return register
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=current_app.config.get("JOB_WORKERS", 2),
+            thread_name_prefix="gco-job",
+        )
+    return _executor
+
+
+def _submit(job_id: int) -> None:
+    app = current_app._get_current_object()
+    _get_executor().submit(_run, app, job_id)
+
+
+def enqueue(kind: str, params: dict, dedupe_key: str = None, created_by: str = None) -> Job:
+    """Queue a job, or return the active job with the same ``dedupe_key``."""
+    if dedupe_key:
+        existing = Job.query.filter_by(dedupe_key=dedupe_key).first()
+        if existing and existing.status == "running":
+            # Its worker may have died without a restart noticing (the heartbeat was still fresh then)
+            if _requeue_stale(Job.id == existing.id):
+                _submit(existing.id)
+            db.session.refresh(existing)
+        if existing and existing.dedupe_key == dedupe_key:
+            return existing  # still active; a job failed for good has released its key
+    job = Job(
+        kind=kind,
+        params=json.dumps(params),
+        dedupe_key=dedupe_key,
+        status="queued",
+        created_by=created_by,
+    )
+    db.session.add(job)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker queued the same key between our check and insert
+        db.session.rollback()
+        return Job.query.filter_by(dedupe_key=dedupe_key).first()
+    _submit(job.id)
+    return job
+
+
+def _claim(job_id: int) -> bool:
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == "queued")
+        .values(
+            status="running",
+            worker=WORKER_ID,
+            started_at=now,
+            heartbeat_at=now,
+            attempts=Job.attempts + 1,
+        )
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def report_progress(job: Job, percent: int = None, message: str = None) -> None:
+    """Update progress/message and refresh the heartbeat. Call from handlers.
+
+    Written and committed on a connection of its own: handlers call this while
+    streaming a query on the session, and committing the session would end that
+    transaction (and close its cursor) mid-iteration.
+    """
+    values = {"heartbeat_at": datetime.utcnow()}
+    if percent is not None:
+        values["progress"] = max(0, min(100, int(percent)))
+    if message is not None:
+        values["message"] = message[:200]
+    with db.engine.begin() as conn:
+        conn.execute(update(Job).where(Job.id == job.id).values(**values))
+
+
+def _finish(job_id: int, **values) -> None:
+    values.update(dedupe_key=None, finished_at=datetime.utcnow(), heartbeat_at=datetime.utcnow())
+    db.session.execute(update(Job).where(Job.id == job_id).values(**values))
+    db.session.commit()
+
+
+def _run(app, job_id: int) -> None:
+    with app.app_context():
+        try:
+            if not _claim(job_id):
+                return
+            job = db.session.get(Job, job_id)
+            handler = _handlers.get(job.kind)
+            if handler is None:
+                _finish(job_id, status="failed", error=f"No handler for job kind '{job.kind}'")
+                return
+            result = handler(job, **json.loads(job.params or "{}"))
+            _finish(job_id, status="done", progress=100, result=json.dumps(result) if result is not None else None)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.exception("Job %s failed", job_id)
+            _finish(job_id, status="failed", error=str(e)[:2000])
+
+
+def _requeue_stale(*criteria) -> int:
+    """Requeue (or, past MAX_ATTEMPTS, fail) running jobs matching ``criteria`` whose heartbeat is stale.
+
+    Commits. Returns how many were requeued; the caller submits them.
+    """
+    cutoff = datetime.utcnow() - STALE_AFTER
+    stale = or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < cutoff)
+    requeued = db.session.execute(
+        update(Job)
+        .where(Job.status == "running", stale, Job.attempts < MAX_ATTEMPTS, *criteria)
+        .values(status="queued", worker=None, message="Recovered after worker restart")
+    ).rowcount
+    db.session.execute(
+        update(Job)
+        .where(Job.status == "running", stale, Job.attempts >= MAX_ATTEMPTS, *criteria)
+        .values(status="failed", dedupe_key=None, error="Worker stopped repeatedly while running this job", finished_at=datetime.utcnow())
+    )
+    db.session.commit()
+    return requeued
+
+
+def recover_jobs() -> int:
+    """Requeue jobs orphaned by a crashed worker and submit everything queued. Returns jobs requeued."""
+    requeued = _requeue_stale()
+    for (job_id,) in db.session.query(Job.id).filter(Job.status == "queued").order_by(Job.id).all():
+        _submit(job_id)
+    return requeued
+
+
+def job_dict(job: Job) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "params": json.loads(job.params or "{}"),
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
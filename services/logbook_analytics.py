@@ -0,0 +1,140 @@
+"""Visit analytics for logbook reports.
+
+One column-projected query loads the range into pandas (plus the matching
+archive files); every figure is a vectorized operation over those columns. Results are cached per date range in
+a local SQLite file: ranges that include today for ``CURRENT_TTL`` seconds,
+past ranges keyed by their In/Out counts from the activity rollup, so an import
+or a late check-out moves the key instead of waiting for ``PAST_TTL``.
+"""
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import String, select, type_coerce
+
+from extensions import db
+from models import LogbookEntry
+from services import activity_rollup, logbook_archive
+from services.presence import STALE_AFTER_HOURS
+from services.visitor_suggest import normalize
+from utils.date_ranges import in_range
+from utils.local_cache import MISS, LocalCache
+
+analytics_cache = LocalCache("logbook_analytics", max_entries=200)
+CURRENT_TTL = 60  # ranges that include today ("still checked in" moves with the clock)
+PAST_TTL = 6 * 3600
+TOP_PURPOSES = 15
+MAX_ANOMALIES = 50
+DURATION_BUCKETS = (0, 15, 30, 60, 120, 240)  # minutes; the last bucket is open-ended
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+def _frame(start: date, end: date) -> pd.DataFrame:
+    # Timestamps come back unconverted and are parsed in bulk by pandas
+    stmt = select(
+        LogbookEntry.id,
+        LogbookEntry.visitor_name,
+        LogbookEntry.purpose,
+        type_coerce(LogbookEntry.time_in, String).label("time_in"),
+        type_coerce(LogbookEntry.time_out, String).label("time_out"),
+    ).where(in_range(LogbookEntry.date, start, end), logbook_archive.live_filter(start, end))
+    # Core execution: plain tuples, no ORM row processing
+    result = db.session.connection().execute(stmt)
+    df = pd.DataFrame.from_records(result.fetchall(), columns=list(result.keys()))
+    archived = logbook_archive.frame(start, end, list(df.columns))
+    if archived is not None:
+        df = pd.concat([archived, df], ignore_index=True)
+    df["time_in"] = pd.to_datetime(df["time_in"], format="ISO8601")
+    df["time_out"] = pd.to_datetime(df["time_out"], format="ISO8601")
+    return df
+
+
+def _durations(df: pd.DataFrame) -> dict:
+    minutes = ((df["time_out"] - df["time_in"]).dt.total_seconds() / 60).dropna().to_numpy()
+    minutes = minutes[minutes >= 0]
+    edges = np.array(DURATION_BUCKETS[1:])
+    counts = np.bincount(np.searchsorted(edges, minutes, side="right"), minlength=len(DURATION_BUCKETS))
+    labels = [f"{lo}-{hi} min" for lo, hi in zip(DURATION_BUCKETS, DURATION_BUCKETS[1:])] + [f"{DURATION_BUCKETS[-1]}+ min"]
+    stats = {"count": int(minutes.size), "mean": None, "median": None, "p90": None}
+    if minutes.size:
+        p50, p90 = np.percentile(minutes, [50, 90])
+        stats.update(mean=round(float(minutes.mean()), 1), median=round(float(p50), 1), p90=round(float(p90), 1))
+    stats["histogram"] = [{"label": lbl, "count": int(n)} for lbl, n in zip(labels, counts)]
+    return stats
+
+
+def _heatmap(df: pd.DataFrame) -> list:
+    """7 x 24 visit counts, Monday first, UTC hours."""
+    cells = df["time_in"].dt.weekday.to_numpy() * 24 + df["time_in"].dt.hour.to_numpy()
+    return np.bincount(cells, minlength=7 * 24).reshape(7, 24).tolist()
+
+
+def _purposes(df: pd.DataFrame) -> list:
+    purpose = df["purpose"].fillna("").str.strip()
+    counts = purpose.where(purpose != "", "(none)").value_counts()
+    return [{"purpose": p, "visits": int(n)} for p, n in counts.head(TOP_PURPOSES).items()]
+
+
+def _repeat_visitors(df: pd.DataFrame) -> dict:
+    names = df["visitor_name"].fillna("")
+    uniques = names.unique()
+    keys = names.map(dict(zip(uniques, map(normalize, uniques))))
+    per_visitor = keys[keys != ""].value_counts()
+    repeat = per_visitor[per_visitor > 1]
+    unique = int(per_visitor.size)
+    return {
+        "unique_visitors": unique,
+        "repeat_visitors": int(repeat.size),
+        "repeat_rate": round(repeat.size / unique, 3) if unique else 0.0,
+        "repeat_visit_share": round(int(repeat.sum()) / int(per_visitor.sum()), 3) if unique else 0.0,
+    }
+
+
+def _still_checked_in(df: pd.DataFrame, now: datetime) -> dict:
+    """Entries still open more than ``STALE_AFTER_HOURS`` after check-in (forgotten check-outs)."""
+    stale = df[df["time_out"].isna() & (df["time_in"] < now - timedelta(hours=STALE_AFTER_HOURS))]
+    stale = stale.sort_values("time_in")
+    hours_open = ((now - stale["time_in"]).dt.total_seconds() / 3600).round(1)
+    return {
+        "count": int(len(stale)),
+        "entries": [
+            {"id": int(i), "name": n, "time_in": t.isoformat(), "hours_open": float(h)}
+            for i, n, t, h in zip(
+                stale["id"][:MAX_ANOMALIES], stale["visitor_name"][:MAX_ANOMALIES],
+                stale["time_in"][:MAX_ANOMALIES], hours_open[:MAX_ANOMALIES],
+            )
+        ],
+    }
+
+
+def compute(start: date, end: date) -> dict:
+    """Analytics for entries dated in [start, end)."""
+    now = datetime.utcnow()
+    df = _frame(start, end)
+    return {
+        "start": start.isoformat(),
+        "end": (end - timedelta(days=1)).isoformat(),
+        "generated_at": now.isoformat(),
+        "visits": int(len(df)),
+        "durations": _durations(df),
+        "heatmap": _heatmap(df),
+        "weekdays": list(WEEKDAYS),
+        "purposes": _purposes(df),
+        "visitors": _repeat_visitors(df),
+        "still_checked_in": _still_checked_in(df, now),
+    }
+
+
+def analyze(start: date, end: date) -> dict:
+    """Cached ``compute(start, end)``; ``end`` is exclusive."""
+    if end > datetime.utcnow().date():
+        # Changes every check-in: recompute at most once per CURRENT_TTL instead
+        key, ttl = f"{start}|{end}", CURRENT_TTL
+    else:
+        counts = activity_rollup.breakdown_between(start, end, "logbook")["by_status"]
+        key, ttl = f"{start}|{end}|{counts.get('In', 0)}|{counts.get('Out', 0)}", PAST_TTL
+    result = analytics_cache.get(key)
+    if result is MISS:
+        result = compute(start, end)
+        analytics_cache.set(key, result, ttl)
+    return result
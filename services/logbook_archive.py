@@ -0,0 +1,279 @@
+"""Cold storage for old logbook entries: one gzip CSV per month plus a manifest.
+
+``archive()`` (``flask archive-logbook``) moves whole months older than
+``LOGBOOK_ARCHIVE_AFTER_DAYS`` from ``logbook_entries`` into
+``ARCHIVE_DIR/logbook/``. The manifest records, per month, the file, its row
+count and per-day In/Out counts (used when the activity rollup is rebuilt).
+
+Ids are not used as ranges: SQLite reuses the ids of deleted rows and other
+databases can commit ids out of order, so an entry added later to an archived
+month may get any id. A run copies every table row of the month into the
+file, then deletes exactly the ids it copied. A table row already in the file
+(same id and created_at: a leftover of an interrupted run) replaces its copy
+there, since it may have been edited in between. The copied ids are listed
+in the manifest as ``pending`` before the delete and cleared after it;
+readers combine archived rows with live rows through ``live_filter()``, which
+hides pending ids, so a run interrupted in between never shows a visit twice
+and the next run deletes the leftovers. Entries added later to an archived
+month stay visible in the table and are appended to the month's file by the
+next run.
+"""
+import csv
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import os
+from collections import Counter, namedtuple
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+from flask import current_app
+from sqlalchemy import and_, delete, func, not_, select, true
+
+from extensions import db
+from models import LogbookEntry, LogbookEventKey
+from services import search_index
+from utils.date_ranges import in_month, month_range, next_month, ym_label
+from utils.db_helpers import stream_select
+
+COLUMNS = (
+    "id", "visitor_name", "purpose", "time_in", "time_out", "date", "remarks", "document_request_id", "created_at",
+)
+ArchivedEntry = namedtuple("ArchivedEntry", COLUMNS)  # same attribute names as LogbookEntry for templates/exports
+DELETE_CHUNK = 1000
+STALE_FILE_SECONDS = 3600  # superseded month files are removed after this, once no request can still be reading them
+
+_manifest_cache = {}  # path -> (mtime_ns, manifest)
+
+
+def _dir() -> Path:
+    return Path(current_app.config["ARCHIVE_DIR"]) / "logbook"
+
+
+def manifest() -> dict:
+    """{"YYYY-MM": {"file", "rows", "sha256", "archived_at", "daily": {day: [in, out]}, "pending": [ids]}}.
+
+    ``pending`` lists ids copied into the file whose table rows may not be deleted yet.
+    """
+    path = _dir() / "manifest.json"
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    cached = _manifest_cache.get(str(path))
+    if cached is None or cached[0] != mtime:
+        with open(path, encoding="utf-8") as f:
+            cached = (mtime, json.load(f).get("months", {}))
+        _manifest_cache[str(path)] = cached
+    return cached[1]
+
+
+def _write_manifest(months: dict) -> None:
+    path = _dir() / "manifest.json"
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "months": dict(sorted(months.items()))}, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def months_between(start: date = None, end: date = None) -> list:
+    """Archived (year, month, info) overlapping [start, end), oldest first. Bounds may be None."""
+    found = []
+    for label, info in sorted(manifest().items()):
+        year, month = int(label[:4]), int(label[5:7])
+        first, after = month_range(year, month)
+        if (end is None or first < end) and (start is None or after > start):
+            found.append((year, month, info))
+    return found
+
+
+def live_filter(start: date = None, end: date = None):
+    """SQL predicate hiding table rows already copied into an archive file (for [start, end)).
+
+    Only rows of an archive run that has not finished deleting them; usually none.
+    """
+    hidden = [
+        and_(in_month(LogbookEntry.date, year, month), LogbookEntry.id.in_(info["pending"]))
+        for year, month, info in months_between(start, end)
+        if info.get("pending")
+    ]
+    return and_(true(), *[not_(h) for h in hidden])
+
+
+def _parse_dt(value: str):
+    return datetime.fromisoformat(value) if value else None
+
+
+def _read(info: dict) -> list:
+    with gzip.open(_dir() / info["file"], "rt", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        next(reader)  # header
+        return [
+            ArchivedEntry(
+                int(r[0]), r[1], r[2] or None, _parse_dt(r[3]), _parse_dt(r[4]), date.fromisoformat(r[5]),
+                r[6] or None, int(r[7]) if r[7] else None, _parse_dt(r[8]),
+            )
+            for r in reader
+        ]
+
+
+def entries_between(start: date = None, end: date = None, newest_first: bool = False):
+    """Archived entries dated in [start, end), ordered by time_in (then id)."""
+    months = months_between(start, end)
+    for _year, _month, info in (reversed(months) if newest_first else months):
+        rows = [r for r in _read(info) if (start is None or r.date >= start) and (end is None or r.date < end)]
+        yield from (reversed(rows) if newest_first else rows)
+
+
+def frame(start: date, end: date, columns: list) -> pd.DataFrame | None:
+    """Archived entries dated in [start, end) as a DataFrame of ``columns`` (timestamps as ISO strings)."""
+    parts = []
+    for _year, _month, info in months_between(start, end):
+        df = pd.read_csv(
+            _dir() / info["file"], usecols=list(dict.fromkeys([*columns, "date"])),
+            dtype={"visitor_name": str, "purpose": str, "time_in": str, "time_out": str, "date": str},
+            keep_default_na=False, na_values={"time_out": [""], "purpose": [""]},
+        )
+        parts.append(df[(df["date"] >= start.isoformat()) & (df["date"] < end.isoformat())][columns])
+    return pd.concat(parts, ignore_index=True) if parts else None
+
+
+def merge_newest_first(live_rows, start: date = None, end: date = None):
+    """Interleave live rows (newest first) with archived entries of [start, end) by time_in."""
+    archived = entries_between(start, end, newest_first=True)
+    return heapq.merge(live_rows, archived, key=lambda r: (r.time_in, r.id), reverse=True)
+
+
+def daily_counts() -> Counter:
+    """Rollup counts {("logbook", day, "In"/"Out", ""): n} of all archived entries."""
+    counts = Counter()
+    for info in manifest().values():
+        for day, (n_in, n_out) in info["daily"].items():
+            d = date.fromisoformat(day)
+            counts[("logbook", d, "In", "")] += n_in
+            counts[("logbook", d, "Out", "")] += n_out
+    return counts
+
+
+def _fmt(value) -> str:
+    if value is None:
+        return ""
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def _write_month(label: str, rows: list, version: int) -> dict:
+    """Write rows to a new versioned file; returns its manifest entry."""
+    name = f"logbook-{label}.v{version}.csv.gz"
+    path = _dir() / name
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMNS)
+    daily = {}
+    for r in rows:
+        writer.writerow([_fmt(getattr(r, c)) for c in COLUMNS])
+        counts = daily.setdefault(r.date.isoformat(), [0, 0])
+        counts[1 if r.time_out else 0] += 1
+    data = gzip.compress(buf.getvalue().encode("utf-8"), compresslevel=9)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return {
+        "file": name,
+        "version": version,
+        "rows": len(rows),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "archived_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "daily": dict(sorted(daily.items())),
+    }
+
+
+def _identity(row) -> tuple:
+    """What tells an archived row from a later entry that reused its id (created_at is never edited)."""
+    return row.id, row.created_at or row.time_in
+
+
+def _fields(row) -> tuple:
+    """Column values as written to the file, for comparing a table row with its archived copy."""
+    return tuple(_fmt(getattr(row, c)) for c in COLUMNS)
+
+
+def _delete_archived(year: int, month: int, ids: list) -> int:
+    """Delete the month's table rows with these ids (and what points at them). Caller commits."""
+    for j in range(0, len(ids), DELETE_CHUNK):
+        chunk = ids[j:j + DELETE_CHUNK]
+        db.session.execute(delete(LogbookEventKey).where(LogbookEventKey.entry_id.in_(chunk)))
+        search_index.remove(LogbookEntry, chunk)
+        db.session.execute(
+            delete(LogbookEntry).where(in_month(LogbookEntry.date, year, month), LogbookEntry.id.in_(chunk))
+        )
+    return len(ids)
+
+
+def _remove_superseded(months: dict) -> None:
+    current = {info["file"] for info in months.values()}
+    now = datetime.utcnow().timestamp()
+    for path in _dir().glob("logbook-*.csv.gz"):
+        if path.name not in current and now - path.stat().st_mtime > STALE_FILE_SECONDS:
+            path.unlink(missing_ok=True)
+
+
+def archive(after_days: int = None, dry_run: bool = False) -> list:
+    """Move whole months ending more than ``after_days`` ago into archive files.
+
+    Returns [(label, rows archived this run)]. Safe to re-run; months already
+    archived only pick up rows added since.
+    """
+    if after_days is None:
+        after_days = current_app.config["LOGBOOK_ARCHIVE_AFTER_DAYS"]
+    horizon = datetime.utcnow().date() - timedelta(days=after_days)
+    cutoff = horizon.replace(day=1)  # months before this one are complete and old enough
+    first = db.session.query(func.min(LogbookEntry.date)).filter(LogbookEntry.date < cutoff).scalar()
+    if first is None:
+        return []
+    _dir().mkdir(parents=True, exist_ok=True)
+    months = dict(manifest())
+    if not dry_run:
+        _remove_superseded(months)
+    done = []
+    year, month = first.year, first.month
+    while (year, month) < (cutoff.year, cutoff.month):
+        label = ym_label(year, month)
+        info = months.get(label)
+        stmt = (
+            select(*[getattr(LogbookEntry, c) for c in COLUMNS])
+            .where(in_month(LogbookEntry.date, year, month))
+            .order_by(LogbookEntry.time_in, LogbookEntry.id)
+        )
+        table_rows = [ArchivedEntry(*r) for r in stream_select(stmt)]
+        archived = {_identity(r): r for r in _read(info)} if info and table_rows else {}
+        new_rows = [r for r in table_rows if _identity(r) not in archived]  # the rest: leftovers of an interrupted run
+        edited = [r for r in table_rows if _identity(r) in archived and _fields(r) != _fields(archived[_identity(r)])]
+        if dry_run:
+            if new_rows:
+                done.append((label, len(new_rows)))
+        else:
+            if new_rows or edited:
+                archived.update((_identity(r), r) for r in table_rows)  # the table copy is the current one
+                rows = sorted(archived.values(), key=lambda r: (r.time_in, r.id))
+                info = _write_month(label, rows, (info["version"] + 1) if info else 1)
+            if new_rows:
+                done.append((label, len(new_rows)))
+            if table_rows:
+                copied = [r.id for r in table_rows]  # every one is in the file now
+                months[label] = {**info, "pending": copied}
+                _write_manifest(months)  # before deleting: readers now hide these rows
+                _delete_archived(year, month, copied)
+                db.session.commit()
+            if info and (table_rows or "pending" in info):
+                months[label] = {k: v for k, v in info.items() if k != "pending"}
+                _write_manifest(months)
+        year, month = next_month(year, month)
+    return done
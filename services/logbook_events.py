@@ -0,0 +1,182 @@
+"""Batched, idempotent check-in/check-out events for kiosks and QR scanners.
+
+A client queues events while offline and posts them in batches. Each event
+carries a client-generated ``key``; keys of applied events are stored in
+``logbook_event_keys``, so a retried batch reports its events as duplicates
+instead of logging visitors twice. A batch is applied in one transaction:
+check-ins are inserted with one batched INSERT, check-outs with one
+executemany UPDATE by primary key.
+
+Event fields::
+
+    {"key": "...", "type": "check_in", "visitor_name": "...", "purpose": "...", "at": "ISO time"}
+    {"key": "...", "type": "check_out", "entry_id": 12, "at": "..."}
+    {"key": "...", "type": "check_out", "check_in_key": "<key of the check-in>", "at": "..."}
+
+``at`` is optional (default: now); times with an offset are converted to UTC.
+"""
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import LogbookEntry, LogbookEventKey
+from services import activity_rollup, dashboard_counters, presence, search_index
+
+MAX_BATCH_EVENTS = 500
+KEY_MAX_LENGTH = 64
+KEY_RETENTION_DAYS = 30  # a queue older than this is not expected to be replayed
+LOOKUP_CHUNK = 500
+EVENT_TYPES = ("check_in", "check_out")
+
+
+def _event_time(value, now: datetime) -> datetime:
+    if not value:
+        return now
+    at = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(at, now)  # a kiosk clock running ahead must not log future visits
+
+
+def _parse(raw, now: datetime) -> dict:
+    """Validated event dict; raises ValueError with a message for the client."""
+    if not isinstance(raw, dict):
+        raise ValueError("Event must be an object.")
+    key = str(raw.get("key") or "").strip()
+    if not key or len(key) > KEY_MAX_LENGTH:
+        raise ValueError(f"key is required (at most {KEY_MAX_LENGTH} characters).")
+    kind = raw.get("type")
+    if kind not in EVENT_TYPES:
+        raise ValueError("type must be check_in or check_out.")
+    event = {"key": key, "type": kind, "at": _event_time(raw.get("at"), now)}
+    if kind == "check_in":
+        name = str(raw.get("visitor_name") or "").strip()
+        if not name:
+            raise ValueError("visitor_name is required.")
+        event["visitor_name"] = name[:120]
+        event["purpose"] = str(raw.get("purpose") or "").strip()[:200] or None
+    else:
+        entry_id, check_in_key = raw.get("entry_id"), str(raw.get("check_in_key") or "").strip()
+        if entry_id is None and not check_in_key:
+            raise ValueError("entry_id or check_in_key is required.")
+        event["entry_id"] = int(entry_id) if entry_id is not None else None
+        event["check_in_key"] = check_in_key or None
+    return event
+
+
+def _known_keys(keys: list, kind: str = None) -> dict:
+    """{key: entry_id} for keys already applied (only events of ``kind`` when given)."""
+    known = {}
+    for i in range(0, len(keys), LOOKUP_CHUNK):
+        stmt = select(LogbookEventKey.key, LogbookEventKey.entry_id).where(LogbookEventKey.key.in_(keys[i:i + LOOKUP_CHUNK]))
+        if kind:
+            stmt = stmt.where(LogbookEventKey.kind == kind)
+        known.update((key, entry_id) for key, entry_id in db.session.execute(stmt))
+    return known
+
+
+def _apply(events: list, now: datetime) -> list:
+    results = [None] * len(events)
+    parsed = []
+    for i, raw in enumerate(events):
+        try:
+            parsed.append((i, _parse(raw, now)))
+        except (ValueError, TypeError) as e:
+            key = raw.get("key") if isinstance(raw, dict) else None
+            results[i] = {"key": key, "status": "invalid", "error": str(e)}
+
+    known = _known_keys(list({ev["key"] for _i, ev in parsed}))
+    check_ins, check_outs, repeats = [], [], []
+    seen = set()
+    for i, ev in parsed:
+        if ev["key"] in known:
+            results[i] = {"key": ev["key"], "status": "duplicate", "entry_id": known[ev["key"]]}
+        elif ev["key"] in seen:
+            repeats.append((i, ev))  # same key twice in one batch: answered like its first occurrence
+        else:
+            seen.add(ev["key"])
+            (check_ins if ev["type"] == "check_in" else check_outs).append((i, ev))
+
+    applied = []  # LogbookEventKey rows
+    rollup_keys = Counter()
+    per_day = Counter()
+    entries = []
+    for _i, ev in check_ins:
+        entries.append(
+            LogbookEntry(visitor_name=ev["visitor_name"], purpose=ev["purpose"], time_in=ev["at"], date=ev["at"].date())
+        )
+    db.session.add_all(entries)
+    db.session.flush()  # one batched INSERT (RETURNING ids where supported)
+    # A check-out may name a check-in posted in an earlier batch (queued offline)
+    entry_for_key = _known_keys(list({ev["check_in_key"] for _i, ev in check_outs if ev["check_in_key"]}), kind="check_in")
+    for (i, ev), entry in zip(check_ins, entries):
+        entry_for_key[ev["key"]] = entry.id
+        results[i] = {"key": ev["key"], "status": "checked_in", "entry_id": entry.id}
+        applied.append({"key": ev["key"], "kind": "check_in", "entry_id": entry.id, "created_at": now})
+        rollup_keys[activity_rollup.key_for(entry)] += 1
+        per_day[entry.date] += 1
+
+    targets = {}
+    for i, ev in check_outs:
+        targets[i] = ev["entry_id"] if ev["entry_id"] is not None else entry_for_key.get(ev["check_in_key"])
+    ids = [eid for eid in set(targets.values()) if eid is not None]
+    found = {}
+    for j in range(0, len(ids), LOOKUP_CHUNK):
+        rows = db.session.execute(
+            select(LogbookEntry.id, LogbookEntry.date, LogbookEntry.time_in, LogbookEntry.time_out)
+            .where(LogbookEntry.id.in_(ids[j:j + LOOKUP_CHUNK]))
+        )
+        found.update((r.id, r) for r in rows)
+    closed = {}  # entry id -> time_out set by this batch
+    for i, ev in check_outs:
+        eid = targets[i]
+        row = found.get(eid)
+        if row is None:
+            results[i] = {"key": ev["key"], "status": "not_found", "entry_id": eid}
+        elif row.time_out is not None or eid in closed:
+            results[i] = {"key": ev["key"], "status": "already_checked_out", "entry_id": eid}
+        else:
+            closed[eid] = max(ev["at"], row.time_in)
+            results[i] = {"key": ev["key"], "status": "checked_out", "entry_id": eid}
+            applied.append({"key": ev["key"], "kind": "check_out", "entry_id": eid, "created_at": now})
+            rollup_keys[("logbook", row.date, "In", "")] -= 1
+            rollup_keys[("logbook", row.date, "Out", "")] += 1
+    if closed:
+        db.session.execute(update(LogbookEntry), [{"id": eid, "time_out": t} for eid, t in closed.items()])
+
+    if applied:
+        db.session.execute(insert(LogbookEventKey), applied)
+    db.session.execute(delete(LogbookEventKey).where(LogbookEventKey.created_at < now - timedelta(days=KEY_RETENTION_DAYS)))
+    search_index.index(*entries)
+    for day, n in per_day.items():
+        dashboard_counters.visitors_checked_in(day, n)
+    activity_rollup.record_keys(rollup_keys)
+
+    first = {r["key"]: r for r in results if r and r["status"] != "invalid"}
+    for i, ev in repeats:
+        original = first.get(ev["key"], {})
+        results[i] = {"key": ev["key"], "status": "duplicate", "entry_id": original.get("entry_id")}
+    return results
+
+
+def apply_events(events: list) -> list:
+    """Apply a batch in one transaction. Returns one result per event, in order:
+    ``{"key", "status", "entry_id"}`` with status checked_in, checked_out, duplicate,
+    already_checked_out, not_found or invalid (plus ``error``).
+    """
+    now = datetime.utcnow()
+    for attempt in range(2):
+        try:
+            results = _apply(events, now)
+            db.session.commit()
+            break
+        except IntegrityError:
+            # The same keys were committed concurrently (a retry racing the original); replay once
+            db.session.rollback()
+            if attempt:
+                raise
+    presence.invalidate()
+    return results
@@ -0,0 +1,228 @@
+"""Monthly transactions report: row feed, summary and CSV/XLSX/PDF writers."""
+import csv
+import heapq
+from datetime import datetime, time
+from io import StringIO
+from itertools import islice
+
+from sqlalchemy import DateTime, case, literal_column, select, type_coerce, union_all
+
+from extensions import db
+from models import Appointment, DocumentRequest, LogbookEntry, Ticket
+from services import activity_rollup, logbook_archive, report_pdf
+from services.xlsx_export import XLSX_MIMETYPE, write_xlsx
+from utils.date_ranges import at_time, in_month, month_range
+from utils.db_helpers import stream_select
+
+TRANSACTION_COLUMNS = ["Type", "Date", "Reference", "Subject", "Status"]
+CSV_FLUSH_BYTES = 64 * 1024  # CSV output is emitted in chunks of about this size
+PROGRESS_EVERY = 2000  # rows between progress callbacks
+PDF_MAX_ROWS_PER_MODULE = 5000  # detail rows per module in the PDF; CSV/XLSX carry the full list
+FEED_MODULES = {
+    "Document Request": "document_requests",
+    "Ticket": "tickets",
+    "Logbook": "logbook",
+    "Appointment": "appointments",
+}
+
+
+def transactions_select(year: int, month: int):
+    """One UNION ALL over the four modules, projected to the report columns and ordered by time.
+
+    Each branch is a range scan on its own date index; rows come back as
+    (type, ts, ref_id, reference, subject, status). An appointment's ts is its
+    date at its preferred time.
+    """
+    def branch(label, ts, model, reference, subject, status, date_col, *extra):
+        return select(
+            literal_column(f"'{label}'").label("type"),
+            type_coerce(ts, DateTime).label("ts"),
+            model.id.label("ref_id"),
+            reference.label("reference"),
+            subject.label("subject"),
+            status.label("status"),
+        ).where(in_month(date_col, year, month), *extra)
+
+    feed = union_all(
+        branch(
+            "Document Request", DocumentRequest.requested_at, DocumentRequest,
+            DocumentRequest.tracking_number, DocumentRequest.document_type, DocumentRequest.status,
+            DocumentRequest.requested_at,
+        ),
+        branch(
+            "Ticket", Ticket.created_at, Ticket,
+            Ticket.ticket_number, Ticket.subject, Ticket.status,
+            Ticket.created_at,
+        ),
+        branch(
+            "Logbook", LogbookEntry.time_in, LogbookEntry,
+            LogbookEntry.visitor_name, LogbookEntry.purpose,
+            case((LogbookEntry.time_out.is_(None), literal_column("'In'")), else_=literal_column("'Out'")),
+            LogbookEntry.date, logbook_archive.live_filter(*month_range(year, month)),
+        ),
+        branch(
+            "Appointment", at_time(Appointment.preferred_date, Appointment.preferred_time), Appointment,
+            Appointment.requester_name, Appointment.appointment_type, Appointment.status,
+            Appointment.preferred_date,
+        ),
+    ).subquery("feed")
+    return select(feed).order_by(feed.c.ts, feed.c.type, feed.c.ref_id)
+
+
+def format_transaction(row) -> tuple:
+    """Turn a feed row into the (Type, Date, Reference, Subject, Status) report row."""
+    kind, ts, _ref_id, reference, subject, status = row
+    if not ts:
+        when = ""
+    elif kind == "Appointment" and ts.time() == time.min:
+        when = ts.strftime("%Y-%m-%d")  # no preferred time
+    else:
+        when = ts.strftime("%Y-%m-%d %H:%M")
+    if kind == "Logbook":
+        subject = (subject or "")[:80]
+    return (kind, when, reference or "", subject or "", status or "")
+
+
+def _feed_order(row) -> tuple:
+    """Python twin of the feed's ORDER BY, for merging archived rows into it."""
+    kind, ts, ref_id = row[:3]
+    return (ts or datetime.min, kind, ref_id)
+
+
+def _archived_feed(year: int, month: int):
+    """Feed rows for logbook entries of the month that live in archive files."""
+    for e in logbook_archive.entries_between(*month_range(year, month)):
+        yield ("Logbook", e.time_in, e.id, e.visitor_name, e.purpose, "Out" if e.time_out else "In")
+
+
+def _feed(year: int, month: int):
+    rows = stream_select(transactions_select(year, month))
+    if not logbook_archive.months_between(*month_range(year, month)):
+        return rows
+    return heapq.merge(rows, _archived_feed(year, month), key=_feed_order)
+
+
+def iter_transactions(year: int, month: int):
+    """Yield report rows for a month in chronological order, streamed from a single query
+    (merged with the month's archived logbook file, if any)."""
+    for row in _feed(year, month):
+        yield format_transaction(row)
+
+
+def transactions_page(year: int, month: int, page: int = 1, per_page: int = 100) -> tuple[list, bool]:
+    """One page of report rows as dicts, plus whether another page follows (no COUNT needed)."""
+    offset = (page - 1) * per_page
+    if logbook_archive.months_between(*month_range(year, month)):
+        feed = islice(_feed(year, month), offset, offset + per_page + 1)
+    else:
+        feed = db.session.execute(transactions_select(year, month).offset(offset).limit(per_page + 1))
+    rows = [format_transaction(r) for r in feed]
+    return [dict(zip(TRANSACTION_COLUMNS, r)) for r in rows[:per_page]], len(rows) > per_page
+
+
+def csv_chunks(rows):
+    """Encode rows as CSV (UTF-8 with BOM, for Excel) and yield them in chunks."""
+    out = StringIO()
+    writer = csv.writer(out)
+    out.write("\ufeff")
+    writer.writerow(TRANSACTION_COLUMNS)
+    yield out.getvalue().encode("utf-8")
+    out.seek(0)
+    out.truncate()
+    for row in rows:
+        writer.writerow(row)
+        if out.tell() >= CSV_FLUSH_BYTES:
+            yield out.getvalue().encode("utf-8")
+            out.seek(0)
+            out.truncate()
+    if out.tell():
+        yield out.getvalue().encode("utf-8")
+
+
+def build_summary(year: int, month: int) -> dict:
+    """Per-module transaction counts for a month (from the daily rollup)."""
+    totals = activity_rollup.month_totals(year, month)
+    return {
+        "document_requests": totals["document_requests"],
+        "tickets": totals["tickets"],
+        "logbook": totals["logbook"],
+        "appointments": totals["appointments"],
+        "total": sum(totals.values()),
+    }
+
+
+def base_name(report) -> str:
+    return f"report_{report.report_year}_{report.report_month:02d}"
+
+
+def with_progress(rows, progress=None):
+    """Pass rows through, calling ``progress(rows_done)`` every PROGRESS_EVERY rows."""
+    if progress is None:
+        yield from rows
+        return
+    n = 0
+    for n, row in enumerate(rows, 1):
+        yield row
+        if n % PROGRESS_EVERY == 0:
+            progress(n)
+    progress(n)
+
+
+def write_csv(report, out, progress=None) -> None:
+    """Write the report CSV into a binary file."""
+    rows = with_progress(iter_transactions(report.report_year, report.report_month), progress)
+    for chunk in csv_chunks(rows):
+        out.write(chunk)
+
+
+def write_excel(report, out, progress=None) -> None:
+    """Write the report workbook into a binary file."""
+    write_xlsx(
+        with_progress(iter_transactions(report.report_year, report.report_month), progress),
+        TRANSACTION_COLUMNS,
+        sheet_name="Transactions",
+        label=base_name(report),
+        out=out,
+    )
+
+
+def pdf_data(report, progress=None) -> dict:
+    """Everything the PDF shows, as plain picklable data for ``report_pdf.render_pdf``."""
+    year, month = report.report_year, report.report_month
+    start, end = month_range(year, month)
+    totals = activity_rollup.month_totals(year, month)
+    daily = activity_rollup.daily_counts(start, end)
+    modules = {m: {"name": m, "total": 0, "rows": []} for m in activity_rollup.MODULES}
+    for row in with_progress(iter_transactions(year, month), progress):
+        module = modules[FEED_MODULES[row[0]]]
+        module["total"] += 1
+        if len(module["rows"]) < PDF_MAX_ROWS_PER_MODULE:
+            module["rows"].append([row[1], row[2][:40], row[3][:60], row[4]])
+    for name, module in modules.items():
+        module.update(activity_rollup.breakdown_between(start, end, name))
+    days = [start.fromordinal(n) for n in range(start.toordinal(), end.toordinal())]
+    return {
+        "title": f"GCO Monthly Report - {year}-{month:02d}",
+        "generated_at": (report.generated_at or datetime.utcnow()).strftime("%Y-%m-%d %H:%M"),
+        "totals": totals,
+        "columns": TRANSACTION_COLUMNS[1:],
+        "days": [d.isoformat() for d in days],
+        "daily": {m: {d.isoformat(): n for d, n in counts.items()} for m, counts in daily.items()},
+        "modules": list(modules.values()),
+    }
+
+
+def write_pdf(report, out, progress=None) -> None:
+    """Write the full report PDF into a binary file, laid out in a worker process."""
+    data = pdf_data(report, progress)
+    rows = sum(m["total"] for m in data["modules"])
+    heartbeat = (lambda: progress(rows)) if progress else None
+    out.write(report_pdf.render_in_worker(data, heartbeat=heartbeat))
+
+
+# format -> (file extension, mimetype, writer)
+FORMATS = {
+    "csv": ("csv", "text/csv", write_csv),
+    "xlsx": ("xlsx", XLSX_MIMETYPE, write_excel),
+    "pdf": ("pdf", "application/pdf", write_pdf),
+}
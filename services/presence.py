@@ -0,0 +1,255 @@
+"""Who is in the office right now, shared by all gunicorn workers of an instance.
+
+The set of checked-in visitors and today's hourly occupancy live in a local
+SQLite file (``CACHE_DIR/presence.db``). ``check_in``/``check_out`` update it
+after committing, so reads cost O(active visitors) instead of a scan of the
+logbook. The database stays the source of truth: the store is rebuilt from
+open entries (partial index ``ix_logbook_entries_open``) at startup, after
+imports, and every ``RESYNC_SECONDS`` to pick up changes from other instances.
+If the file cannot be used, reads fall back to the database.
+
+Entries still open ``STALE_AFTER_HOURS`` after check-in are treated as
+forgotten check-outs. Times and hours are UTC, like the logbook.
+"""
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import or_, select
+
+from extensions import db
+from models import LogbookEntry
+from utils.local_cache import local_db
+
+STALE_AFTER_HOURS = 12
+RESYNC_SECONDS = 300
+KEEP_DAYS = 7  # hourly occupancy history kept in the store
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS present ("
+    "entry_id INTEGER PRIMARY KEY, name TEXT NOT NULL, purpose TEXT, time_in TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_present_time_in ON present (time_in)",
+    # Per UTC hour: arrivals, highest occupancy, occupancy after the hour's last event
+    "CREATE TABLE IF NOT EXISTS hourly ("
+    "day TEXT NOT NULL, hour INTEGER NOT NULL, arrivals INTEGER NOT NULL DEFAULT 0, "
+    "peak INTEGER NOT NULL DEFAULT 0, closing INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (day, hour))",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL NOT NULL)",
+)
+
+
+def _conn() -> sqlite3.Connection:
+    return local_db("presence", *SCHEMA)
+
+
+def _failed(action: str, e: Exception) -> None:
+    current_app.logger.warning("Presence store: %s failed: %s", action, e)
+
+
+def _cutoff(now: datetime) -> str:
+    return (now - timedelta(hours=STALE_AFTER_HOURS)).isoformat()
+
+
+def _occupancy(conn, now: datetime) -> int:
+    (count,) = conn.execute("SELECT count(*) FROM present WHERE time_in >= ?", (_cutoff(now),)).fetchone()
+    return count
+
+
+def _record_hour(conn, now: datetime, before: int, after: int, arrivals: int) -> None:
+    conn.execute(
+        "INSERT INTO hourly (day, hour, arrivals, peak, closing) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (day, hour) DO UPDATE SET arrivals = arrivals + excluded.arrivals, "
+        "peak = max(peak, excluded.peak), closing = excluded.closing",
+        (now.date().isoformat(), now.hour, arrivals, max(before, after), after),
+    )
+
+
+def checked_in(entry: LogbookEntry) -> None:
+    """Add a committed check-in."""
+    now = datetime.utcnow()
+    try:
+        conn = _conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = _occupancy(conn, now)
+            conn.execute(
+                "INSERT OR REPLACE INTO present (entry_id, name, purpose, time_in) VALUES (?, ?, ?, ?)",
+                (entry.id, entry.visitor_name, entry.purpose, entry.time_in.isoformat()),
+            )
+            _record_hour(conn, now, before, _occupancy(conn, now), 1)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    except sqlite3.Error as e:
+        _failed("check-in", e)
+        invalidate()
+
+
+def checked_out(entry: LogbookEntry) -> None:
+    """Remove a committed check-out."""
+    now = datetime.utcnow()
+    try:
+        conn = _conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = _occupancy(conn, now)
+            conn.execute("DELETE FROM present WHERE entry_id = ?", (entry.id,))
+            _record_hour(conn, now, before, _occupancy(conn, now), 0)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    except sqlite3.Error as e:
+        _failed("check-out", e)
+        invalidate()
+
+
+def invalidate() -> None:
+    """Force a rebuild on the next read (e.g. after an import)."""
+    try:
+        _conn().execute("DELETE FROM meta WHERE key = 'synced_at'")
+    except sqlite3.Error as e:
+        _failed("invalidate", e)
+
+
+def _open_entries(now: datetime) -> list:
+    """Open entries from the database (served by the partial index)."""
+    return db.session.execute(
+        select(LogbookEntry.id, LogbookEntry.visitor_name, LogbookEntry.purpose, LogbookEntry.time_in)
+        .where(LogbookEntry.time_out.is_(None), LogbookEntry.time_in >= now - timedelta(hours=STALE_AFTER_HOURS))
+        .order_by(LogbookEntry.time_in)
+    ).all()
+
+
+def _hours_from_db(now: datetime) -> list:
+    """Today's (day, hour, arrivals, peak, closing) rows, replayed from the entries overlapping today."""
+    day_start = datetime.combine(now.date(), datetime.min.time())
+    rows = db.session.execute(
+        select(LogbookEntry.time_in, LogbookEntry.time_out).where(
+            LogbookEntry.date.in_([now.date() - timedelta(days=1), now.date()]),
+            LogbookEntry.time_in <= now,
+            or_(LogbookEntry.time_out.is_(None), LogbookEntry.time_out >= day_start),
+        )
+    ).all()
+    events = []  # (time, change, is_arrival)
+    for time_in, time_out in rows:
+        stale_at = time_in + timedelta(hours=STALE_AFTER_HOURS)
+        leaves = min(time_out, stale_at) if time_out else stale_at
+        if leaves <= day_start:
+            continue
+        events.append((max(time_in, day_start), 1, time_in >= day_start))
+        if leaves <= now:
+            events.append((leaves, -1, False))
+    events.sort(key=lambda e: (e[0], -e[1]))
+    hours = {}
+    occupancy = 0
+    for at, change, arrival in events:
+        h = hours.setdefault(at.hour, {"arrivals": 0, "peak": occupancy})
+        occupancy += change
+        h["arrivals"] += int(arrival)
+        h["peak"] = max(h["peak"], occupancy)
+        h["closing"] = occupancy
+    day = now.date().isoformat()
+    return [(day, hour, h["arrivals"], h["peak"], h["closing"]) for hour, h in sorted(hours.items())]
+
+
+def rebuild() -> int:
+    """Replace the store with the database's open entries and today's hours. Returns the occupancy."""
+    now = datetime.utcnow()
+    conn = _conn()
+    # Hold the store's write lock while reading the database, so a check-in committed meanwhile
+    # is written after the snapshot instead of being overwritten by it.
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        entries = _open_entries(now)
+        hours = _hours_from_db(now)
+        conn.execute("DELETE FROM present")
+        conn.executemany(
+            "INSERT INTO present (entry_id, name, purpose, time_in) VALUES (?, ?, ?, ?)",
+            [(e.id, e.visitor_name, e.purpose, e.time_in.isoformat()) for e in entries],
+        )
+        conn.execute(
+            "DELETE FROM hourly WHERE day = ? OR day < ?",
+            (now.date().isoformat(), (now.date() - timedelta(days=KEEP_DAYS)).isoformat()),
+        )
+        conn.executemany("INSERT INTO hourly (day, hour, arrivals, peak, closing) VALUES (?, ?, ?, ?, ?)", hours)
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('synced_at', ?)", (time.time(),))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return len(entries)
+
+
+def warm() -> None:
+    """Rebuild the store from the database (startup)."""
+    invalidate()
+    _synced_conn()
+
+
+def _synced_conn():
+    """The store's connection, rebuilt first if it is stale; None if the store is unusable."""
+    try:
+        conn = _conn()
+        row = conn.execute("SELECT value FROM meta WHERE key = 'synced_at'").fetchone()
+        if row is None or time.time() - row[0] > RESYNC_SECONDS:
+            rebuild()
+        return conn
+    except sqlite3.Error as e:
+        _failed("read", e)
+        return None
+
+
+def active() -> list[dict]:
+    """Checked-in visitors, earliest first."""
+    now = datetime.utcnow()
+    conn = _synced_conn()
+    if conn is not None:
+        try:
+            rows = conn.execute(
+                "SELECT entry_id, name, purpose, time_in FROM present WHERE time_in >= ? ORDER BY time_in",
+                (_cutoff(now),),
+            ).fetchall()
+            return [{"id": r[0], "name": r[1], "purpose": r[2], "time_in": r[3]} for r in rows]
+        except sqlite3.Error as e:
+            _failed("read", e)
+    return [
+        {"id": e.id, "name": e.visitor_name, "purpose": e.purpose, "time_in": e.time_in.isoformat()}
+        for e in _open_entries(now)
+    ]
+
+
+def occupancy() -> dict:
+    """Current occupancy plus today's arrivals and peak occupancy per UTC hour."""
+    now = datetime.utcnow()
+    conn = _synced_conn()
+    current, recorded = None, None
+    if conn is not None:
+        try:
+            current = _occupancy(conn, now)
+            recorded = conn.execute(
+                "SELECT hour, arrivals, peak, closing FROM hourly WHERE day = ?", (now.date().isoformat(),)
+            ).fetchall()
+        except sqlite3.Error as e:
+            _failed("read", e)
+    if recorded is None:
+        current = len(_open_entries(now))
+        recorded = [row[1:] for row in _hours_from_db(now)]
+    by_hour = {r[0]: r for r in recorded}
+    hours = []
+    carried = 0  # occupancy at the start of an hour without events
+    for hour in range(now.hour + 1):
+        if hour in by_hour:
+            _h, arrivals, peak, carried = by_hour[hour]
+        else:
+            arrivals, peak = 0, carried
+        hours.append({"hour": hour, "arrivals": arrivals, "peak": peak})
+    busiest = max(hours, key=lambda h: (h["peak"], h["arrivals"]))
+    return {
+        "as_of": now.isoformat(),
+        "occupancy": current,
+        "hours": hours,
+        "peak_hour": busiest["hour"] if busiest["peak"] else None,
+        "peak_occupancy": busiest["peak"],
+    }
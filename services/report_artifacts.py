@@ -0,0 +1,183 @@
+"""On-disk cache of generated report files (CSV/XLSX/PDF).
+
+Files live under ``UPLOAD_FOLDER/reports/<report id>/`` and are named
+``<format>-<fingerprint>.<ext>``. The fingerprint covers the month's rollup
+buckets and the latest ``updated_at`` of its records, so a late import,
+status change or edit produces a new name and the old file is replaced.
+Total size is capped; least recently served files are evicted first.
+"""
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from flask import current_app
+from sqlalchemy import func
+
+from extensions import db
+from models import Appointment, DailyActivityRollup, DocumentRequest, Ticket
+from services.monthly_report import FORMATS
+from utils.date_ranges import in_month, in_range, month_range
+
+ARTIFACT_VERSION = "2"  # bump when report layout changes to invalidate old files
+REPORTS_SUBDIR = "reports"
+TMP_MAX_AGE_SECONDS = 3600
+
+
+def cache_root() -> Path:
+    return Path(current_app.config["UPLOAD_FOLDER"]) / REPORTS_SUBDIR
+
+
+def fingerprint(report) -> str:
+    """Hash of everything the report's content depends on."""
+    year, month = report.report_year, report.report_month
+    h = hashlib.sha256()
+    h.update(f"{ARTIFACT_VERSION}|{report.id}|{report.summary_data or ''}|".encode())
+    buckets = (
+        db.session.query(
+            DailyActivityRollup.module,
+            DailyActivityRollup.status,
+            DailyActivityRollup.kind,
+            func.sum(DailyActivityRollup.count),
+        )
+        .filter(in_range(DailyActivityRollup.day, *month_range(year, month)))
+        .group_by(DailyActivityRollup.module, DailyActivityRollup.status, DailyActivityRollup.kind)
+        .order_by(DailyActivityRollup.module, DailyActivityRollup.status, DailyActivityRollup.kind)
+        .all()
+    )
+    for row in buckets:
+        h.update(repr(tuple(row)).encode())
+    for model, date_col in (
+        (DocumentRequest, DocumentRequest.requested_at),
+        (Ticket, Ticket.created_at),
+        (Appointment, Appointment.preferred_date),
+    ):
+        latest = db.session.query(func.max(model.updated_at)).filter(in_month(date_col, year, month)).scalar()
+        h.update(f"|{model.__tablename__}:{latest}".encode())
+    return h.hexdigest()[:20]
+
+
+def _report_dir(report) -> Path:
+    return cache_root() / str(report.id)
+
+
+def artifact_path(report, fmt: str, fp: str) -> Path:
+    ext = FORMATS[fmt][0]
+    return _report_dir(report) / f"{fmt}-{fp}.{ext}"
+
+
+def cached_artifact(report, fmt: str, fp: str = None) -> Path | None:
+    """Path of an up-to-date cached file, or None. Marks the file as recently used."""
+    path = artifact_path(report, fmt, fp or fingerprint(report))
+    try:
+        os.utime(path)  # mtime doubles as last-access time for LRU eviction
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def _remember(report) -> None:
+    rel = f"{REPORTS_SUBDIR}/{report.id}"
+    if report.file_path != rel:
+        report.file_path = rel
+        db.session.commit()
+
+
+def _remove_stale(report, fmt: str, keep: Path) -> None:
+    for old in _report_dir(report).glob(f"{fmt}-*"):
+        if old != keep and not old.name.endswith(".tmp"):
+            try:
+                old.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _publish(report, fmt: str, tmp_path: str, final: Path) -> None:
+    os.replace(tmp_path, final)  # atomic: other workers see the whole file or none
+    _remove_stale(report, fmt, final)
+    _remember(report)
+    enforce_size_limit()
+
+
+def _tmp_file(report, fmt: str):
+    directory = _report_dir(report)
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{fmt}-", suffix=".tmp", dir=directory)
+    return os.fdopen(fd, "wb"), tmp_path
+
+
+def build_artifact(report, fmt: str, fp: str = None, progress=None) -> Path:
+    """Render the report in ``fmt`` to the cache (if not already there) and return its path.
+
+    ``progress(rows_done)`` is called periodically while rows are written.
+    """
+    fp = fp or fingerprint(report)
+    final = artifact_path(report, fmt, fp)
+    if cached_artifact(report, fmt, fp):
+        return final
+    writer = FORMATS[fmt][2]
+    out, tmp_path = _tmp_file(report, fmt)
+    try:
+        with out:
+            writer(report, out, progress=progress)
+        _publish(report, fmt, tmp_path, final)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return final
+
+
+def tee_to_cache(report, fmt: str, chunks, fp: str = None):
+    """Yield ``chunks`` (bytes) to the caller while saving them as the cached artifact.
+
+    The file is only published if every chunk was written, so an aborted
+    download never leaves a truncated artifact behind.
+    """
+    final = artifact_path(report, fmt, fp or fingerprint(report))
+    out, tmp_path = _tmp_file(report, fmt)
+    completed = False
+    try:
+        with out:
+            for chunk in chunks:
+                out.write(chunk)
+                yield chunk
+        completed = True
+    finally:
+        if completed:
+            _publish(report, fmt, tmp_path, final)
+        elif os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def enforce_size_limit(max_bytes: int = None) -> int:
+    """Evict least recently used artifacts until the cache fits. Returns bytes freed."""
+    max_bytes = max_bytes if max_bytes is not None else current_app.config["REPORT_CACHE_MAX_BYTES"]
+    root = cache_root()
+    if not root.exists():
+        return 0
+    files = []
+    stale_tmp_before = time.time() - TMP_MAX_AGE_SECONDS
+    for path in root.glob("*/*"):
+        try:
+            st = path.stat()
+            if path.name.endswith(".tmp"):
+                if st.st_mtime < stale_tmp_before:
+                    path.unlink()  # left behind by a crashed writer
+                continue
+        except FileNotFoundError:
+            continue
+        files.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in files)
+    freed = 0
+    for _mtime, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
+        freed += size
+    return freed
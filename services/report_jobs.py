@@ -0,0 +1,57 @@
+"""Background jobs for monthly reports (summary generation and file rendering)."""
+import json
+
+from extensions import db
+from models import MonthlyReport
+from services import monthly_report, report_artifacts
+from services.jobs import enqueue, job_handler, report_progress
+
+
+@job_handler("report_generate")
+def generate_report(job, year: int, month: int):
+    report_progress(job, 10, f"Counting transactions for {year}-{month:02d}")
+    summary = monthly_report.build_summary(year, month)
+    report = MonthlyReport(
+        report_month=month,
+        report_year=year,
+        report_type="all_transactions",
+        summary_data=json.dumps(summary),
+    )
+    db.session.add(report)
+    db.session.commit()
+    return {"report_id": report.id, "total": summary["total"]}
+
+
+@job_handler("report_render")
+def render_report(job, report_id: int, fmt: str):
+    report = db.session.get(MonthlyReport, report_id)
+    if not report:
+        raise ValueError("Report not found")
+    total = max(1, monthly_report.build_summary(report.report_year, report.report_month)["total"])
+    report_progress(job, 1, f"Rendering {fmt.upper()}")
+
+    def progress(rows_done):
+        report_progress(job, min(95, rows_done * 95 // total), f"{rows_done} of ~{total} rows written")
+
+    report_artifacts.build_artifact(report, fmt, progress=progress)
+    return {"report_id": report.id, "format": fmt}
+
+
+def queue_generate(year: int, month: int, user: str = None):
+    """Queue summary generation for a month (one active job per month)."""
+    return enqueue(
+        "report_generate",
+        {"year": year, "month": month},
+        dedupe_key=f"report:{year}-{month:02d}:summary",
+        created_by=user,
+    )
+
+
+def queue_render(report, fmt: str, user: str = None):
+    """Queue rendering of a report file (one active job per year, month and format)."""
+    return enqueue(
+        "report_render",
+        {"report_id": report.id, "fmt": fmt},
+        dedupe_key=f"report:{report.report_year}-{report.report_month:02d}:{fmt}",
+        created_by=user,
+    )
@@ -0,0 +1,252 @@
+"""Multi-page monthly report PDF (reportlab platypus), rendered in a separate process.
+
+``render_pdf`` takes plain data (dicts, lists, tuples of str/int) and returns
+the PDF bytes, so it can run in a spawned worker process: layout is CPU-bound
+and would otherwise hold the GIL of the web worker that runs the job. This
+module only imports reportlab and the standard library, which keeps the
+child process start-up cheap. The process is started on first use, renders
+one report at a time and is kept for the next one; it is terminated when a
+render times out and replaced when it dies (e.g. out of memory).
+
+Detail tables are split into chunks of ``TABLE_CHUNK_ROWS`` rows, each a
+``LongTable`` with a repeated header row; splitting one huge table across
+pages gets slower the longer it is, chunks keep page layout time linear.
+"""
+import multiprocessing
+import threading
+import time
+from io import BytesIO
+
+TABLE_CHUNK_ROWS = 500
+RENDER_TIMEOUT_SECONDS = 600
+HEARTBEAT_SECONDS = 5  # how often the waiting job is told we're still alive
+
+MODULE_LABELS = {
+    "document_requests": "Document Requests",
+    "tickets": "Tickets",
+    "logbook": "Logbook",
+    "appointments": "Appointments",
+}
+CHART_COLORS = ("#2563eb", "#16a34a", "#d97706", "#9333ea")
+
+_worker = None  # (process, parent end of its pipe)
+_worker_lock = threading.Lock()  # one render at a time in the one process
+
+
+def _styles():
+    from reportlab.lib.styles import getSampleStyleSheet
+    return getSampleStyleSheet()
+
+
+def _table(rows, col_widths=None, repeat_header=True):
+    from reportlab.lib import colors
+    from reportlab.platypus import LongTable, TableStyle
+    t = LongTable(rows, colWidths=col_widths, repeatRows=1 if repeat_header else 0)
+    t.setStyle(TableStyle([
+        ("FONT", (0, 0), (-1, 0), "Helvetica-Bold", 8),
+        ("FONT", (0, 1), (-1, -1), "Helvetica", 8),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#e5e7eb")),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#9ca3af")),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f9fafb")]),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ]))
+    return t
+
+
+def _counts_table(title, counts: dict):
+    rows = [[title, "Count"]] + [[k, str(v)] for k, v in sorted(counts.items(), key=lambda kv: -kv[1])]
+    return _table(rows, col_widths=[200, 60])
+
+
+def _daily_chart(days: list, series: dict):
+    """Line chart of records per day, one line per module."""
+    from reportlab.graphics.charts.legends import Legend
+    from reportlab.graphics.charts.linecharts import HorizontalLineChart
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.lib import colors
+
+    drawing = Drawing(500, 220)
+    chart = HorizontalLineChart()
+    chart.x, chart.y, chart.width, chart.height = 40, 50, 440, 150
+    modules = [m for m in MODULE_LABELS if m in series]
+    chart.data = [[series[m].get(d, 0) for d in days] for m in modules]
+    chart.categoryAxis.categoryNames = [str(int(d[-2:])) for d in days]
+    chart.categoryAxis.labels.fontSize = 6
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 7
+    for i, _m in enumerate(modules):
+        chart.lines[i].strokeColor = colors.HexColor(CHART_COLORS[i % len(CHART_COLORS)])
+        chart.lines[i].strokeWidth = 1.2
+    drawing.add(chart)
+    legend = Legend()
+    legend.x, legend.y = 40, 25
+    legend.fontSize = 7
+    legend.columnMaximum = 1
+    legend.alignment = "right"
+    legend.colorNamePairs = [
+        (colors.HexColor(CHART_COLORS[i % len(CHART_COLORS)]), MODULE_LABELS[m]) for i, m in enumerate(modules)
+    ]
+    drawing.add(legend)
+    return drawing
+
+
+def _status_chart(by_status: dict):
+    """Horizontal bar chart of one module's status counts."""
+    from reportlab.graphics.charts.barcharts import HorizontalBarChart
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.lib import colors
+
+    items = sorted(by_status.items(), key=lambda kv: -kv[1])[:10]
+    height = 30 + 16 * len(items)
+    drawing = Drawing(400, height)
+    chart = HorizontalBarChart()
+    chart.x, chart.y, chart.width, chart.height = 110, 15, 270, height - 25
+    chart.data = [[v for _k, v in items]]
+    chart.categoryAxis.categoryNames = [k[:20] for k, _v in items]
+    chart.categoryAxis.labels.fontSize = 7
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 7
+    chart.bars[0].fillColor = colors.HexColor(CHART_COLORS[0])
+    drawing.add(chart)
+    return drawing
+
+
+def render_pdf(data: dict) -> bytes:
+    """Build the report PDF from plain data (see ``monthly_report.pdf_data``)."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer
+
+    styles = _styles()
+    buf = BytesIO()
+    title = data["title"]
+
+    def footer(canvas, doc):
+        canvas.saveState()
+        canvas.setFont("Helvetica", 7)
+        canvas.drawString(doc.leftMargin, 1 * cm, title)
+        canvas.drawRightString(doc.pagesize[0] - doc.rightMargin, 1 * cm, f"Page {doc.page}")
+        canvas.restoreState()
+
+    doc = SimpleDocTemplate(
+        buf, pagesize=A4, title=title,
+        leftMargin=1.5 * cm, rightMargin=1.5 * cm, topMargin=1.5 * cm, bottomMargin=1.8 * cm,
+    )
+    story = [
+        Paragraph(title, styles["Title"]),
+        Paragraph(f"Generated: {data['generated_at']}", styles["Normal"]),
+        Spacer(1, 12),
+        Paragraph("Summary", styles["Heading2"]),
+        _table(
+            [["Module", "Records"]]
+            + [[MODULE_LABELS[m], str(data["totals"].get(m, 0))] for m in MODULE_LABELS]
+            + [["Total", str(sum(data["totals"].values()))]],
+            col_widths=[200, 60],
+        ),
+        Spacer(1, 12),
+        Paragraph("Daily activity", styles["Heading2"]),
+        _daily_chart(data["days"], data["daily"]),
+    ]
+
+    for module in data["modules"]:
+        name = module["name"]
+        story += [PageBreak(), Paragraph(MODULE_LABELS[name], styles["Heading1"])]
+        if module["by_status"]:
+            story += [
+                Paragraph("By status", styles["Heading3"]),
+                _status_chart(module["by_status"]),
+                _counts_table("Status", module["by_status"]),
+                Spacer(1, 8),
+            ]
+        if module["by_kind"]:
+            story += [_counts_table("Type", module["by_kind"]), Spacer(1, 8)]
+
+        rows = module["rows"]
+        story.append(Paragraph(f"Records ({module['total']})", styles["Heading3"]))
+        if module["total"] > len(rows):
+            story.append(Paragraph(
+                f"Showing the first {len(rows)} of {module['total']} records; "
+                "download the CSV or Excel report for the full list.",
+                styles["Italic"],
+            ))
+        if not rows:
+            story.append(Paragraph("No records this month.", styles["Normal"]))
+        header = data["columns"]
+        widths = [95, 150, 210, 75]
+        for i in range(0, len(rows), TABLE_CHUNK_ROWS):
+            story.append(_table([header] + rows[i:i + TABLE_CHUNK_ROWS], col_widths=widths))
+
+    doc.build(story, onFirstPage=footer, onLaterPages=footer)
+    return buf.getvalue()
+
+
+def _serve(conn) -> None:
+    """Render process: answer each data dict received with ("ok", pdf bytes) or ("error", exception)."""
+    while True:
+        try:
+            data = conn.recv()
+        except EOFError:  # the web worker closed the pipe
+            return
+        try:
+            conn.send(("ok", render_pdf(data)))
+        except Exception as e:
+            conn.send(("error", RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+def _start_worker() -> tuple:
+    global _worker
+    if _worker is None or not _worker[0].is_alive():
+        _stop_worker()
+        # spawn: a forked child would inherit the parent's DB connections and threads
+        ctx = multiprocessing.get_context("spawn")
+        parent, child = ctx.Pipe()
+        proc = ctx.Process(target=_serve, args=(child,), name="gco-report-pdf", daemon=True)
+        proc.start()
+        child.close()
+        _worker = (proc, parent)
+    return _worker
+
+
+def _stop_worker() -> None:
+    """Terminate the render process (stuck or dead); the next render starts a fresh one."""
+    global _worker
+    if _worker is None:
+        return
+    proc, conn = _worker
+    _worker = None
+    conn.close()
+    if proc.is_alive():
+        proc.terminate()
+    proc.join(timeout=5)
+
+
+def _wait(ready, deadline: float, heartbeat) -> None:
+    """Call ``ready(timeout)`` until it returns True, calling ``heartbeat()`` in between."""
+    while not ready(HEARTBEAT_SECONDS):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"PDF rendering took longer than {RENDER_TIMEOUT_SECONDS}s")
+        if heartbeat:
+            heartbeat()
+
+
+def render_in_worker(data: dict, heartbeat=None) -> bytes:
+    """Run ``render_pdf`` in the worker process, calling ``heartbeat()`` while waiting."""
+    deadline = time.monotonic() + RENDER_TIMEOUT_SECONDS
+    _wait(lambda timeout: _worker_lock.acquire(timeout=timeout), deadline, heartbeat)  # another job's render
+    try:
+        proc, conn = _start_worker()
+        try:
+            conn.send(data)
+            _wait(conn.poll, deadline, heartbeat)  # poll() is also true once the child is gone
+            status, value = conn.recv()
+        except TimeoutError:
+            _stop_worker()
+            raise
+        except (EOFError, OSError):
+            _stop_worker()  # the child died (e.g. out of memory); start a fresh one next time
+            raise RuntimeError(f"PDF worker process stopped (exit code {proc.exitcode})")
+    finally:
+        _worker_lock.release()
+    if status == "error":
+        raise value
+    return value
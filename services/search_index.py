@@ -0,0 +1,299 @@
+"""Full-text search over document requests, tickets, appointments and logbook visitors.
+
+One index row per record, with a ``title`` (numbers and names, ranked higher)
+and a ``body`` (types, subjects, descriptions, purposes):
+
+* SQLite: FTS5 virtual table ``search_fts`` (prefix indexes for 2-3 chars).
+* PostgreSQL: table ``search_index`` with a generated ``tsvector`` column and a
+  GIN index.
+* Anything else: LIKE over the source tables (no index; small installs only).
+
+Rows are keyed by ``ref_id * 8 + module code`` so a record is replaced with a
+primary-key lookup. Write paths call ``index(...)`` after flushing new records,
+in the same transaction; ``rebuild()`` recreates everything from the tables.
+"""
+import re
+from collections import namedtuple
+from html import escape
+
+from markupsafe import Markup
+from sqlalchemy import and_, or_, select, text
+from sqlalchemy.exc import OperationalError
+
+from extensions import db
+from models import Appointment, DocumentRequest, LogbookEntry, Ticket
+from utils.db_helpers import dialect_name, stream_select
+
+MODULE_CODES = {"document_requests": 1, "tickets": 2, "appointments": 3, "logbook": 4}
+MODULE_LABELS = {
+    "document_requests": "Document Request",
+    "tickets": "Ticket",
+    "appointments": "Appointment",
+    "logbook": "Visitor",
+}
+MAX_TERMS = 8
+BATCH_SIZE = 1000
+HIGHLIGHT_START, HIGHLIGHT_END = "\x01", "\x02"
+
+_backend_by_url = {}
+Hit = namedtuple("Hit", "module ref_id title snippet")
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+    "title, body, module UNINDEXED, ref_id UNINDEXED, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+POSTGRES_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS search_index (
+        doc_key BIGINT PRIMARY KEY,
+        module VARCHAR(30) NOT NULL,
+        ref_id INTEGER NOT NULL,
+        title TEXT NOT NULL DEFAULT '',
+        body TEXT NOT NULL DEFAULT '',
+        tsv tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B')
+        ) STORED
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_search_index_tsv ON search_index USING GIN (tsv)",
+)
+
+
+def _join(*parts) -> str:
+    return " ".join(str(p) for p in parts if p)
+
+
+# model -> (module, columns loaded by rebuild, fn(record) -> (title, body))
+SOURCES = {
+    DocumentRequest: (
+        "document_requests",
+        (DocumentRequest.id, DocumentRequest.tracking_number, DocumentRequest.requester_name,
+         DocumentRequest.document_type, DocumentRequest.purpose),
+        lambda r: (_join(r.tracking_number, r.requester_name), _join(r.document_type, r.purpose)),
+    ),
+    Ticket: (
+        "tickets",
+        (Ticket.id, Ticket.ticket_number, Ticket.subject, Ticket.description),
+        lambda r: (_join(r.ticket_number, r.subject), _join(r.description)),
+    ),
+    Appointment: (
+        "appointments",
+        (Appointment.id, Appointment.requester_name, Appointment.purpose),
+        lambda r: (_join(r.requester_name), _join(r.purpose)),
+    ),
+    LogbookEntry: (
+        "logbook",
+        (LogbookEntry.id, LogbookEntry.visitor_name),
+        lambda r: (_join(r.visitor_name), ""),
+    ),
+}
+
+
+def backend() -> str | None:
+    """'fts5', 'postgresql' or None (LIKE fallback) for the current database."""
+    url = str(db.engine.url)
+    if url not in _backend_by_url:
+        dialect = dialect_name()
+        found = None
+        if dialect == "postgresql":
+            found = "postgresql"
+        elif dialect == "sqlite":
+            try:
+                with db.engine.connect() as conn:
+                    conn.execute(text("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)"))
+                    conn.execute(text("DROP TABLE temp.fts5_probe"))
+                found = "fts5"
+            except OperationalError:
+                found = None  # SQLite built without FTS5
+        _backend_by_url[url] = found
+    return _backend_by_url[url]
+
+
+def ensure_schema() -> None:
+    """Create the index table for this database if needed (called from init_db)."""
+    kind = backend()
+    if kind == "fts5":
+        db.session.execute(text(SQLITE_DDL))
+    elif kind == "postgresql":
+        for ddl in POSTGRES_DDL:
+            db.session.execute(text(ddl))
+    db.session.commit()
+
+
+def _row(module: str, ref_id: int, title: str, body: str) -> dict:
+    return {
+        "doc_key": ref_id * 8 + MODULE_CODES[module],
+        "module": module,
+        "ref_id": ref_id,
+        "title": title or "",
+        "body": body or "",
+    }
+
+
+def _write(rows: list) -> None:
+    if not rows:
+        return
+    kind = backend()
+    if kind == "fts5":
+        db.session.execute(text("DELETE FROM search_fts WHERE rowid = :doc_key"), rows)
+        db.session.execute(
+            text(
+                "INSERT INTO search_fts (rowid, title, body, module, ref_id) "
+                "VALUES (:doc_key, :title, :body, :module, :ref_id)"
+            ),
+            rows,
+        )
+    elif kind == "postgresql":
+        db.session.execute(
+            text(
+                "INSERT INTO search_index (doc_key, module, ref_id, title, body) "
+                "VALUES (:doc_key, :module, :ref_id, :title, :body) "
+                "ON CONFLICT (doc_key) DO UPDATE SET title = EXCLUDED.title, body = EXCLUDED.body"
+            ),
+            rows,
+        )
+
+
+def index(*records) -> None:
+    """Add or refresh records in the index. Records need their id (flush first); the caller commits."""
+    if backend() is None:
+        return
+    rows = []
+    for record in records:
+        module, _cols, describe = SOURCES[type(record)]
+        rows.append(_row(module, record.id, *describe(record)))
+    for i in range(0, len(rows), BATCH_SIZE):
+        _write(rows[i:i + BATCH_SIZE])
+
+
+def index_rows(model, rows) -> None:
+    """Like ``index`` for plain rows that have the model's rebuild columns as attributes (e.g. RETURNING rows)."""
+    if backend() is None:
+        return
+    module, _cols, describe = SOURCES[model]
+    batch = [_row(module, r.id, *describe(r)) for r in rows]
+    for i in range(0, len(batch), BATCH_SIZE):
+        _write(batch[i:i + BATCH_SIZE])
+
+
+def remove(model, ids) -> None:
+    """Drop records of ``model`` from the index (e.g. before deleting them); the caller commits."""
+    kind = backend()
+    if kind is None or not ids:
+        return
+    code = MODULE_CODES[SOURCES[model][0]]
+    keys = [{"doc_key": i * 8 + code} for i in ids]
+    if kind == "fts5":
+        db.session.execute(text("DELETE FROM search_fts WHERE rowid = :doc_key"), keys)
+    else:
+        db.session.execute(text("DELETE FROM search_index WHERE doc_key = :doc_key"), keys)
+
+
+def rebuild() -> int:
+    """Recreate the whole index from the source tables. Returns the number of records indexed."""
+    kind = backend()
+    if kind is None:
+        return 0
+    db.session.execute(text("DELETE FROM search_fts" if kind == "fts5" else "TRUNCATE search_index"))
+    total = 0
+    for model, (module, cols, describe) in SOURCES.items():
+        batch = []
+        for r in stream_select(select(*cols)):
+            batch.append(_row(module, r.id, *describe(r)))
+            if len(batch) == BATCH_SIZE:
+                _write(batch)
+                total += len(batch)
+                batch = []
+        _write(batch)
+        total += len(batch)
+    if kind == "fts5":
+        db.session.execute(text("INSERT INTO search_fts (search_fts) VALUES ('optimize')"))
+    db.session.commit()
+    return total
+
+
+def ensure_backfilled() -> None:
+    """Build the index once for databases that had records before search existed."""
+    kind = backend()
+    if kind is None:
+        return
+    table = "search_fts" if kind == "fts5" else "search_index"
+    if db.session.execute(text(f"SELECT 1 FROM {table} LIMIT 1")).first():
+        return
+    if any(db.session.query(model.id).first() for model in SOURCES):
+        rebuild()
+
+
+def terms(query: str) -> list[str]:
+    """Lower-cased word tokens of a query (punctuation such as '-' in tracking numbers splits words)."""
+    return re.findall(r"\w+", (query or "").lower())[:MAX_TERMS]
+
+
+def _highlight(snippet: str) -> Markup:
+    return Markup(
+        escape(snippet or "").replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_END, "</mark>")
+    )
+
+
+def search(query: str, module: str = None, limit: int = 50) -> list[dict]:
+    """Ranked matches for all words of ``query``, each word also matching as a prefix.
+
+    Returns dicts with module, label, ref_id, title and an HTML-safe snippet.
+    """
+    words = terms(query)
+    if not words:
+        return []
+    if module not in MODULE_CODES:
+        module = None
+    kind = backend()
+    if kind == "fts5":
+        rows = db.session.execute(
+            text(
+                "SELECT module, ref_id, title, "
+                f"snippet(search_fts, 1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 16) AS snippet "
+                "FROM search_fts WHERE search_fts MATCH :q"
+                + (" AND module = :module" if module else "")
+                + " ORDER BY bm25(search_fts, 10.0, 1.0) LIMIT :limit"
+            ),
+            {"q": " ".join(f'"{w}"*' for w in words), "module": module, "limit": limit},
+        ).all()
+    elif kind == "postgresql":
+        rows = db.session.execute(
+            text(
+                "SELECT m.module, m.ref_id, m.title, "
+                "ts_headline('simple', m.body, to_tsquery('simple', :q), "
+                f"'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords=20, MinWords=8') AS snippet "
+                "FROM (SELECT module, ref_id, title, body, ts_rank_cd(tsv, to_tsquery('simple', :q)) AS rank "
+                "FROM search_index WHERE tsv @@ to_tsquery('simple', :q)"
+                + (" AND module = :module" if module else "")
+                + " ORDER BY rank DESC LIMIT :limit) m ORDER BY m.rank DESC"
+            ),
+            {"q": " & ".join(f"{w}:*" for w in words), "module": module, "limit": limit},
+        ).all()
+    else:
+        rows = _search_like(words, module, limit)
+    return [
+        {
+            "module": r.module,
+            "label": MODULE_LABELS[r.module],
+            "ref_id": r.ref_id,
+            "title": r.title,
+            "snippet": _highlight(r.snippet),
+        }
+        for r in rows
+    ]
+
+
+def _search_like(words: list, module: str, limit: int) -> list:
+    """Fallback for databases without a full-text backend: LIKE over the indexed columns."""
+    hits = []
+    for model, (mod, cols, describe) in SOURCES.items():
+        if module and mod != module:
+            continue
+        text_cols = [c for c in cols if c.key != "id"]
+        match_all = and_(*[or_(*[c.ilike(f"%{w}%") for c in text_cols]) for w in words])
+        for r in db.session.execute(select(*cols).where(match_all).limit(limit)):
+            title, body = describe(r)
+            hits.append(Hit(mod, r.id, title, body[:160]))
+    return hits[:limit]
@@ -0,0 +1,55 @@
+"""Atomic number allocation backed by the ``number_sequences`` table.
+
+``allocate`` bumps a sequence row with a single UPDATE (RETURNING where the
+database supports it), so concurrent workers never get the same number and a
+bulk import can reserve a whole block in one call. On PostgreSQL/MySQL the
+bump runs on its own short transaction, so the row lock is released at once
+instead of being held until the caller commits; numbers from a rolled-back
+request are skipped, as with a native sequence. SQLite allows one writer at a
+time, so there it runs in the caller's transaction.
+"""
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import NumberSequence
+from utils.db_helpers import dialect_name
+
+_table = NumberSequence.__table__
+
+
+def _bump(conn, name: str, count: int) -> int | None:
+    stmt = update(_table).where(_table.c.name == name).values(value=_table.c.value + count)
+    if conn.dialect.update_returning:
+        row = conn.execute(stmt.returning(_table.c.value)).first()
+        return row[0] if row else None
+    if not conn.execute(stmt).rowcount:
+        return None
+    return conn.execute(select(_table.c.value).where(_table.c.name == name)).scalar()
+
+
+def _allocate(conn, name: str, count: int, seed) -> int:
+    last = _bump(conn, name, count)
+    if last is None:
+        start = int(seed()) if seed else 0
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(_table).values(name=name, value=start))
+        except IntegrityError:
+            pass  # created by another worker in the meantime
+        last = _bump(conn, name, count)
+    return last - count + 1
+
+
+def allocate(name: str, count: int = 1, seed=None) -> int:
+    """Reserve ``count`` consecutive numbers from sequence ``name`` and return the first.
+
+    ``seed()`` is called once, when the sequence does not exist yet, and should
+    return the highest number already in use (e.g. from existing records).
+    """
+    if count < 1:
+        raise ValueError("count must be at least 1")
+    if dialect_name() == "sqlite":
+        return _allocate(db.session.connection(), name, count, seed)
+    with db.engine.begin() as conn:
+        return _allocate(conn, name, count, seed)
@@ -0,0 +1,204 @@
+"""Appointment slot capacity: conflict-free booking and availability.
+
+Every booking in a holding status occupies its (day, slot) twice in the
+``appointment_slot_loads`` ledger: once under its type and once under ''
+(all types combined). A claim is a conditional ``UPDATE ... SET booked =
+booked + 1 WHERE booked < capacity``; the database serializes concurrent
+claims on the row (SQLite write lock, PostgreSQL row lock with re-check), so
+two requests cannot both take the last place. Claims run in the caller's
+transaction and are undone by its rollback.
+
+Capacities come from ``appointment_slot_capacities`` (most specific row
+wins; combined capacity defaults to ``DEFAULT_CAPACITY``, per-type capacity
+to unlimited). ``availability()`` turns the ledger, capacities and blackouts
+of a date range into one bitmap of closed slots per day.
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Appointment, AppointmentBlackout, AppointmentSlotCapacity, AppointmentSlotLoad
+from utils.date_ranges import in_range
+from utils.db_helpers import increment
+
+TIME_SLOTS = [
+    "08:00", "08:30", "09:00", "09:30", "10:00", "10:30", "11:00", "11:30",
+    "13:00", "13:30", "14:00", "14:30", "15:00", "15:30", "16:00", "16:30",
+]
+SLOT_INDEX = {s: i for i, s in enumerate(TIME_SLOTS)}
+ALL_SLOTS_MASK = (1 << len(TIME_SLOTS)) - 1
+HOLDING_STATUSES = ("Pending", "Approved", "Completed")  # statuses that occupy their slot
+DEFAULT_CAPACITY = 1  # bookings per slot across all types when no capacity row applies
+ALL = ""
+MAX_RANGE_DAYS = 62
+
+
+def hold_for(apt: Appointment):
+    """(day, slot, type) the appointment occupies, or None."""
+    if apt.status in HOLDING_STATUSES and apt.preferred_time in SLOT_INDEX and apt.preferred_date:
+        return (apt.preferred_date, apt.preferred_time, apt.appointment_type or ALL)
+    return None
+
+
+def _capacities() -> dict:
+    """{(type, slot): capacity} with '' wildcards."""
+    return {
+        (t, s): c for t, s, c in db.session.execute(
+            select(AppointmentSlotCapacity.appointment_type, AppointmentSlotCapacity.slot, AppointmentSlotCapacity.capacity)
+        )
+    }
+
+
+def capacity(caps: dict, apt_type: str, slot: str):
+    """Capacity of ``slot`` for one type (None = unlimited), or for all types combined when apt_type is ''."""
+    for key in ((apt_type, slot), (apt_type, ALL)):
+        if key in caps:
+            return caps[key]
+    return DEFAULT_CAPACITY if apt_type == ALL else None
+
+
+def _blackout(day: date, slot: str, apt_type: str):
+    return db.session.execute(
+        select(AppointmentBlackout.reason).where(
+            AppointmentBlackout.day == day,
+            AppointmentBlackout.slot.in_([ALL, slot]),
+            AppointmentBlackout.appointment_type.in_([ALL, apt_type]),
+        ).limit(1)
+    ).first()
+
+
+def _take(day: date, slot: str, apt_type: str, cap) -> bool:
+    """Add one booking to a ledger row if it stays within ``cap`` (None = no limit)."""
+    keys = {"day": day, "slot": slot, "appointment_type": apt_type}
+    if cap is None:
+        increment(AppointmentSlotLoad, keys, {"booked": 1})
+        return True
+    where = [getattr(AppointmentSlotLoad, k) == v for k, v in keys.items()]
+    for _attempt in range(2):
+        result = db.session.execute(
+            update(AppointmentSlotLoad)
+            .where(*where, AppointmentSlotLoad.booked < cap)
+            .values(booked=AppointmentSlotLoad.booked + 1)
+        )
+        if result.rowcount == 1:
+            return True
+        if db.session.execute(select(AppointmentSlotLoad.id).where(*where)).first():
+            return False  # row exists and is full
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(AppointmentSlotLoad).values(**keys, booked=0))
+        except IntegrityError:
+            pass  # created concurrently; retry the update
+    return False
+
+
+def claim(day: date, slot: str, apt_type: str) -> str | None:
+    """Reserve a place for a booking in the current transaction. Returns an error message, or None.
+
+    On error the caller must roll back (a combined place may already be taken).
+    """
+    if slot not in SLOT_INDEX:
+        return "Please choose one of the listed time slots."
+    blackout = _blackout(day, slot, apt_type)
+    if blackout:
+        return f"No appointments on {day.isoformat()} at {slot}" + (f": {blackout.reason}." if blackout.reason else ".")
+    caps = _capacities()
+    for t in dict.fromkeys((ALL, apt_type)):
+        if not _take(day, slot, t, capacity(caps, t, slot)):
+            return f"The {slot} slot on {day.isoformat()} is fully booked. Please choose another time."
+    return None
+
+
+def release(hold) -> None:
+    """Give back the places of a hold from ``hold_for``."""
+    if hold is None:
+        return
+    day, slot, apt_type = hold
+    for t in dict.fromkeys((ALL, apt_type)):
+        increment(AppointmentSlotLoad, {"day": day, "slot": slot, "appointment_type": t}, {"booked": -1})
+
+
+def moved(old_hold, apt: Appointment) -> str | None:
+    """Update the ledger after an appointment's date, time, type or status changed. Returns an error or None."""
+    new_hold = hold_for(apt)
+    if new_hold == old_hold:
+        return None
+    release(old_hold)
+    if new_hold is None:
+        return None
+    return claim(*new_hold)
+
+
+def availability(start: date, end: date, apt_type: str = ALL) -> list[dict]:
+    """Per day in [start, end): open slots and the bitmap of closed ones (bit i = TIME_SLOTS[i])."""
+    end = min(end, start + timedelta(days=MAX_RANGE_DAYS))
+    caps = _capacities()
+    types = [ALL] + ([apt_type] if apt_type else [])
+    limits = {t: [capacity(caps, t, s) for s in TIME_SLOTS] for t in types}
+    always_closed = 0
+    for t in types:
+        for i, cap in enumerate(limits[t]):
+            if cap is not None and cap <= 0:
+                always_closed |= 1 << i
+    closed = {}
+    loads = db.session.execute(
+        select(AppointmentSlotLoad.day, AppointmentSlotLoad.slot, AppointmentSlotLoad.appointment_type, AppointmentSlotLoad.booked)
+        .where(in_range(AppointmentSlotLoad.day, start, end), AppointmentSlotLoad.appointment_type.in_(types))
+    )
+    for day, slot, t, booked in loads:
+        i = SLOT_INDEX.get(slot)
+        cap = limits[t][i] if i is not None else None
+        if cap is not None and booked >= cap:
+            closed[day] = closed.get(day, 0) | (1 << i)
+    reasons = {}
+    blackouts = db.session.execute(
+        select(AppointmentBlackout.day, AppointmentBlackout.slot, AppointmentBlackout.reason)
+        .where(in_range(AppointmentBlackout.day, start, end), AppointmentBlackout.appointment_type.in_(types))
+    )
+    for day, slot, reason in blackouts:
+        bits = ALL_SLOTS_MASK if slot == ALL else (1 << SLOT_INDEX[slot]) if slot in SLOT_INDEX else 0
+        closed[day] = closed.get(day, 0) | bits
+        if slot == ALL:
+            reasons[day] = reason or "Closed"
+    days = []
+    for n in range((end - start).days):
+        day = start + timedelta(days=n)
+        mask = closed.get(day, 0) | always_closed
+        days.append({
+            "date": day.isoformat(),
+            "open": [s for i, s in enumerate(TIME_SLOTS) if not mask >> i & 1],
+            "closed_mask": mask,
+            "closed_reason": reasons.get(day),
+        })
+    return days
+
+
+def rebuild() -> int:
+    """Recompute the ledger from appointments in holding statuses. Returns the number of rows."""
+    counts = {}
+    rows = db.session.execute(
+        select(Appointment.preferred_date, Appointment.preferred_time, Appointment.appointment_type, func.count())
+        .where(Appointment.status.in_(HOLDING_STATUSES), Appointment.preferred_time.in_(TIME_SLOTS))
+        .group_by(Appointment.preferred_date, Appointment.preferred_time, Appointment.appointment_type)
+    )
+    for day, slot, apt_type, n in rows:
+        for key in dict.fromkeys(((day, slot, ALL), (day, slot, apt_type or ALL))):
+            counts[key] = counts.get(key, 0) + n
+    db.session.query(AppointmentSlotLoad).delete()
+    if counts:
+        db.session.execute(
+            insert(AppointmentSlotLoad),
+            [{"day": d, "slot": s, "appointment_type": t, "booked": n} for (d, s, t), n in counts.items()],
+        )
+    db.session.commit()
+    return len(counts)
+
+
+def ensure_backfilled() -> None:
+    """Build the ledger once for databases that had appointments before it existed."""
+    if db.session.query(AppointmentSlotLoad.id).first() is not None:
+        return
+    if db.session.query(Appointment.id).filter(Appointment.status.in_(HOLDING_STATUSES)).first() is not None:
+        rebuild()
@@ -0,0 +1,216 @@
+"""Survey analytics: per-question distributions, percentiles, trends, text terms and cross-tabs.
+
+One column-projected query loads a survey's answers; every figure is computed
+with NumPy/pandas over those columns. Results are cached in a local SQLite
+file keyed by the survey's answer count and highest answer id, so they are
+reused until new responses arrive (or answers are deleted).
+"""
+import math
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import String, func, select, type_coerce
+
+from extensions import db
+from models import SurveyQuestion, SurveyResponse
+from utils.local_cache import MISS, LocalCache
+
+analytics_cache = LocalCache("survey_analytics", max_entries=500)
+CACHE_TTL = 6 * 3600  # the key changes with every new answer; this only ages out unused entries
+TOP_TERMS = 15
+MAX_DISCRETE_VALUES = 20  # more distinct ratings than this are binned
+HISTOGRAM_BINS = 10
+MAX_CROSSTAB_CATEGORIES = 12  # per axis; the rest are grouped under OTHER
+OTHER = ""  # cross-tab label of the grouped answers; answer labels are never empty, so it can't collide
+DAILY_TREND_MAX_DAYS = 120  # longer spans are bucketed by month
+TERM_PATTERN = r"[a-z][a-z'\-]{2,}"
+STOP_WORDS = frozenset(
+    "the and for are but not you all any can had her was one our out has him his how its may new now old see "
+    "two way who did get let put say she too use that with have this will your from they been more when were "
+    "what which their there than them then very also just into only some such much many most other over well "
+    "would could should about because really".split()
+)
+
+
+def version(survey_id: int) -> tuple:
+    """(answer count, highest answer id): changes whenever answers are added or removed."""
+    count, max_id = db.session.execute(
+        select(func.count(), func.max(SurveyResponse.id)).where(SurveyResponse.survey_id == survey_id)
+    ).one()
+    return count, max_id or 0
+
+
+def _frame(survey_id: int) -> pd.DataFrame:
+    stmt = select(
+        SurveyResponse.question_id,
+        SurveyResponse.response_value,
+        SurveyResponse.response_text,
+        SurveyResponse.respondent_id,
+        type_coerce(SurveyResponse.created_at, String).label("created_at"),
+    ).where(SurveyResponse.survey_id == survey_id)
+    # Core execution: plain tuples, no ORM row processing
+    result = db.session.connection().execute(stmt)
+    df = pd.DataFrame.from_records(result.fetchall(), columns=list(result.keys()))
+    df["response_value"] = df["response_value"].astype(float)
+    df["created_at"] = pd.to_datetime(df["created_at"], format="ISO8601")
+    return df
+
+
+def _label(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else f"{value:g}"
+
+
+def _histogram(values: np.ndarray) -> list:
+    distinct, counts = np.unique(values, return_counts=True)
+    if distinct.size <= MAX_DISCRETE_VALUES and np.all(distinct == np.round(distinct)):
+        return [{"label": _label(v), "count": int(n)} for v, n in zip(distinct, counts)]
+    counts, edges = np.histogram(values, bins=HISTOGRAM_BINS)
+    return [{"label": f"{lo:g}-{hi:g}", "count": int(n)} for lo, hi, n in zip(edges, edges[1:], counts)]
+
+
+def _numeric(values: np.ndarray) -> dict | None:
+    if not values.size:
+        return None
+    p25, p50, p75 = np.percentile(values, [25, 50, 75])
+    return {
+        "count": int(values.size),
+        "mean": round(float(values.mean()), 2),
+        "std": round(float(values.std(ddof=1)), 2) if values.size > 1 else 0.0,
+        "min": float(values.min()),
+        "p25": round(float(p25), 2),
+        "median": round(float(p50), 2),
+        "p75": round(float(p75), 2),
+        "max": float(values.max()),
+    }
+
+
+def _terms(texts: pd.Series) -> list:
+    words = texts.str.lower().str.findall(TERM_PATTERN).explode().dropna()
+    words = words[~words.isin(STOP_WORDS)]
+    return [{"term": t, "count": int(n)} for t, n in words.value_counts().head(TOP_TERMS).items()]
+
+
+def _over_time(created: pd.Series) -> dict:
+    if created.empty:
+        return {"bucket": "day", "points": []}
+    span = (created.max() - created.min()).days
+    bucket = "day" if span <= DAILY_TREND_MAX_DAYS else "month"
+    periods = created.dt.strftime("%Y-%m-%d" if bucket == "day" else "%Y-%m")
+    counts = periods.value_counts().sort_index()
+    return {"bucket": bucket, "points": [{"period": p, "answers": int(n)} for p, n in counts.items()]}
+
+
+def _questions(survey_id: int) -> list:
+    return db.session.execute(
+        select(SurveyQuestion.id, SurveyQuestion.question_text, SurveyQuestion.question_type)
+        .where(SurveyQuestion.survey_id == survey_id)
+        .order_by(SurveyQuestion.order_index, SurveyQuestion.id)
+    ).all()
+
+
+def compute(survey_id: int) -> dict:
+    df = _frame(survey_id)
+    qids = df["question_id"].to_numpy()
+    values = df["response_value"].to_numpy()
+    has_value = ~np.isnan(values)
+    has_text = df["response_text"].notna().to_numpy()
+    questions = []
+    for qid, text, qtype in _questions(survey_id):
+        mine = qids == qid
+        numbers = values[mine & has_value]
+        texts = df["response_text"][mine & has_text]
+        questions.append({
+            "id": qid,
+            "text": text,
+            "type": qtype,
+            "answers": int(mine.sum()),
+            "numeric": _numeric(numbers),
+            "histogram": _histogram(numbers) if numbers.size else [],
+            "text_answers": int(texts.size),
+            "terms": _terms(texts) if texts.size else [],
+        })
+    return {
+        "survey_id": survey_id,
+        "generated_at": datetime.utcnow().isoformat(),
+        "answers": int(len(df)),
+        "respondents": int(df["respondent_id"].nunique()),
+        "over_time": _over_time(df["created_at"].dropna()),
+        "questions": questions,
+    }
+
+
+def analyze(survey_id: int) -> dict:
+    """Cached ``compute(survey_id)``."""
+    count, max_id = version(survey_id)
+    key = f"{survey_id}|{count}|{max_id}"
+    result = analytics_cache.get(key)
+    if result is MISS:
+        result = compute(survey_id)
+        analytics_cache.set(key, result, CACHE_TTL)
+    return result
+
+
+def _answer_labels(df: pd.DataFrame, qid: int) -> pd.Series:
+    """One label per respondent for question ``qid`` (their first answer)."""
+    rows = df[df["question_id"] == qid].drop_duplicates("respondent_id").set_index("respondent_id")
+    numeric = rows["response_value"].dropna()
+    labels = pd.concat([
+        numeric.map(_label),
+        rows["response_text"][rows["response_value"].isna()].fillna("").str.strip().str[:60],
+    ])
+    labels = labels[labels != ""]
+    top = labels.value_counts().index[:MAX_CROSSTAB_CATEGORIES]
+    return labels.where(labels.isin(top), OTHER)
+
+
+def _sort_key(label: str):
+    """Numbers in numeric order, then text, then OTHER. "nan"/"inf" answers are text."""
+    if label == OTHER:
+        return (2, 0.0, label)
+    try:
+        value = float(label)
+    except ValueError:
+        value = None
+    if value is not None and math.isfinite(value):
+        return (0, value, label)
+    return (1, 0.0, label)
+
+
+def crosstab(survey_id: int, q1: int, q2: int) -> dict:
+    """Counts of respondents by their answers to q1 (rows) and q2 (columns). Cached like ``analyze``.
+
+    Past MAX_CROSSTAB_CATEGORIES answers per axis, the rest are counted under the label OTHER ('').
+    """
+    count, max_id = version(survey_id)
+    key = f"{survey_id}|{count}|{max_id}|x2|{q1}|{q2}"  # x2: grouped answers labelled OTHER
+    result = analytics_cache.get(key)
+    if result is not MISS:
+        return result
+    stmt = select(
+        SurveyResponse.question_id, SurveyResponse.respondent_id,
+        SurveyResponse.response_value, SurveyResponse.response_text,
+    ).where(
+        SurveyResponse.survey_id == survey_id,
+        SurveyResponse.question_id.in_([q1, q2]),
+        SurveyResponse.respondent_id.isnot(None),
+    ).order_by(SurveyResponse.id)
+    rows_result = db.session.connection().execute(stmt)
+    df = pd.DataFrame.from_records(rows_result.fetchall(), columns=list(rows_result.keys()))
+    df["response_value"] = df["response_value"].astype(float)
+    a, b = _answer_labels(df, q1), _answer_labels(df, q2)
+    pairs = pd.DataFrame({"row": a, "col": b}).dropna()
+    table = Counter(zip(pairs["row"], pairs["col"]))
+    rows = sorted(set(pairs["row"]), key=_sort_key)
+    cols = sorted(set(pairs["col"]), key=_sort_key)
+    result = {
+        "q1": q1,
+        "q2": q2,
+        "respondents": int(len(pairs)),
+        "rows": rows,
+        "columns": cols,
+        "counts": [[table.get((r, c), 0) for c in cols] for r in rows],
+    }
+    analytics_cache.set(key, result, CACHE_TTL)
+    return result
@@ -0,0 +1,145 @@
+"""Incremental per-question survey aggregates (``survey_question_stats``).
+
+Each answer adds to one row keyed by (survey, question, rating): answer count,
+and count/sum/sum of squares of numeric values. Writers update the rows in the
+same transaction as the answers (``record`` for a web submission,
+``record_frame`` for an import), so averages, variances and rating
+distributions are read from a handful of rows per question instead of
+aggregating ``survey_responses``. ``flask rebuild-survey-stats`` recomputes
+the table after bulk SQL changes.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, insert, select
+
+from extensions import db
+from models import SurveyQuestionStat, SurveyResponse
+from utils.db_helpers import increment
+
+MAX_RATING = 100  # whole values in [0, MAX_RATING] get their own histogram row
+OTHER = ""  # text answers and values that are not whole ratings
+
+
+def rating_label(value) -> str:
+    if value is None or not float(value).is_integer() or not 0 <= value <= MAX_RATING:
+        return OTHER
+    return str(int(value))
+
+
+def _apply(survey_id: int, deltas: dict) -> None:
+    for (question_id, rating), (answers, count, total, total_sq) in deltas.items():
+        increment(
+            SurveyQuestionStat,
+            {"survey_id": survey_id, "question_id": question_id, "rating": rating},
+            {"answers": answers, "value_count": count, "value_sum": total, "value_sum_sq": total_sq},
+        )
+
+
+def record(survey_id: int, answers: list) -> None:
+    """Add answers [(question_id, numeric value or None)] of one survey. Caller commits."""
+    deltas = {}
+    for question_id, value in answers:
+        d = deltas.setdefault((question_id, rating_label(value)), [0, 0, 0.0, 0.0])
+        d[0] += 1
+        if value is not None:
+            d[1] += 1
+            d[2] += value
+            d[3] += value * value
+    _apply(survey_id, deltas)
+
+
+def record_frame(survey_id: int, answers: pd.DataFrame) -> None:
+    """Add imported answers (columns question_id, response_value). Caller commits."""
+    values = answers["response_value"]
+    whole = values.notna() & (values == values.round()) & values.between(0, MAX_RATING)
+    ratings = np.where(whole, values.where(whole, 0).astype("int64").astype(str), OTHER)
+    grouped = (
+        pd.DataFrame({
+            "question_id": answers["question_id"].astype(int),
+            "rating": ratings,
+            "value": values,
+            "square": values * values,
+        })
+        .groupby(["question_id", "rating"])
+        .agg(answers=("value", "size"), value_count=("value", "count"), value_sum=("value", "sum"), value_sum_sq=("square", "sum"))
+    )
+    _apply(survey_id, {
+        (int(qid), rating): (int(answers), int(count), float(total), float(total_sq))
+        for (qid, rating), answers, count, total, total_sq in grouped.itertuples(name=None)
+    })
+
+
+def _std(count: int, total: float, total_sq: float) -> float:
+    if count < 2:
+        return 0.0
+    return math.sqrt(max(0.0, (total_sq - total * total / count) / (count - 1)))
+
+
+def summary(survey_id: int) -> dict:
+    """{question_id: {"answers", "count", "mean", "std", "histogram": [{"label", "count"}]}}."""
+    out = {}
+    rows = db.session.execute(
+        select(
+            SurveyQuestionStat.question_id, SurveyQuestionStat.rating, SurveyQuestionStat.answers,
+            SurveyQuestionStat.value_count, SurveyQuestionStat.value_sum, SurveyQuestionStat.value_sum_sq,
+        ).where(SurveyQuestionStat.survey_id == survey_id)
+    )
+    for question_id, rating, answers, count, total, total_sq in rows:
+        q = out.setdefault(question_id, {"answers": 0, "count": 0, "sum": 0.0, "sum_sq": 0.0, "histogram": []})
+        q["answers"] += answers
+        q["count"] += count
+        q["sum"] += total
+        q["sum_sq"] += total_sq
+        if rating != OTHER and count:
+            q["histogram"].append({"label": rating, "count": count})
+    for q in out.values():
+        q["histogram"].sort(key=lambda b: int(b["label"]))
+        n = q["count"]
+        q["mean"] = round(q["sum"] / n, 2) if n else None
+        q["std"] = round(_std(n, q.pop("sum"), q.pop("sum_sq")), 2)
+    return out
+
+
+def overall_average() -> float | None:
+    """Mean of all numeric answers of all surveys, weighted by answer count."""
+    total, count = db.session.execute(
+        select(func.sum(SurveyQuestionStat.value_sum), func.sum(SurveyQuestionStat.value_count))
+    ).one()
+    return total / count if count else None
+
+
+def rebuild() -> int:
+    """Recompute the table from ``survey_responses``. Returns the number of rows."""
+    deltas = {}
+    rows = db.session.execute(
+        select(SurveyResponse.survey_id, SurveyResponse.question_id, SurveyResponse.response_value, func.count())
+        .group_by(SurveyResponse.survey_id, SurveyResponse.question_id, SurveyResponse.response_value)
+    )
+    for survey_id, question_id, value, n in rows:
+        d = deltas.setdefault((survey_id, question_id, rating_label(value)), [0, 0, 0.0, 0.0])
+        d[0] += n
+        if value is not None:
+            d[1] += n
+            d[2] += value * n
+            d[3] += value * value * n
+    db.session.query(SurveyQuestionStat).delete()
+    if deltas:
+        db.session.execute(insert(SurveyQuestionStat), [
+            {
+                "survey_id": s, "question_id": q, "rating": r,
+                "answers": a, "value_count": c, "value_sum": t, "value_sum_sq": sq,
+            }
+            for (s, q, r), (a, c, t, sq) in deltas.items()
+        ])
+    db.session.commit()
+    return len(deltas)
+
+
+def ensure_backfilled() -> None:
+    """Build the table once for databases that had responses before it existed."""
+    if db.session.query(SurveyQuestionStat.id).first() is not None:
+        return
+    if db.session.query(SurveyResponse.id).first() is not None:
+        rebuild()
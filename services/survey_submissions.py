@@ -0,0 +1,353 @@
+"""Fast public survey submissions (QR code links at events).
+
+Survey definitions are cached per worker for ``DEFINITION_TTL`` seconds, so a
+submission runs no survey or question queries. Answers are validated against
+the cached definition and written with one executemany INSERT plus the
+``survey_question_stats`` update, in one transaction.
+
+With ``SURVEY_WRITE_BEHIND`` on, submissions are appended to a durable SQLite
+buffer in ``CACHE_DIR`` (WAL, synchronous=FULL) and the request returns
+without touching the database. A background thread per worker moves them into
+the database in batches of up to ``FLUSH_BATCH``. Workers share the buffer; a
+flush holds the buffer's write lock, so each submission is moved once, and
+respondent ids already in the database are skipped, so a crash between the
+database commit and the buffer delete does not duplicate answers. When a batch
+fails, its submissions are written one by one so the others still go through;
+a submission that keeps failing (e.g. its question was deleted) is moved to
+the buffer's ``dead_letter`` table after ``MAX_FLUSH_ATTEMPTS`` flushes. A
+database that is unreachable fails the whole flush and counts no attempts.
+With more than ``SURVEY_BUFFER_MAX_PENDING`` submissions waiting (or the
+buffer unavailable), submissions are written directly: submitters slow down
+instead of the buffer growing without bound. Pending submissions are flushed
+when a worker exits, at startup and by ``flask flush-survey-buffer``.
+"""
+import atexit
+import json
+import math
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from flask import current_app
+from sqlalchemy import insert, select
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from extensions import db
+from models import Survey, SurveyQuestion, SurveyResponse
+from services import survey_stats
+from utils.local_cache import local_db
+
+DEFINITION_TTL = 60  # seconds a worker reuses a survey definition
+MAX_TEXT_LENGTH = 2000
+FLUSH_BATCH = 500  # submissions per database transaction
+FLUSH_INTERVAL = 2.0  # seconds between flushes while submissions are buffered
+LOOKUP_CHUNK = 500
+MAX_FLUSH_ATTEMPTS = 5  # failed flushes before a submission is moved to dead_letter
+BUFFER_NAME = "survey_buffer"
+DATABASE_UNAVAILABLE = (OperationalError, InterfaceError)  # retried as a whole; no attempts counted
+
+_definitions = {}  # survey id -> (expires, definition or None)
+_flusher = None
+_flusher_lock = threading.Lock()
+_wake = threading.Event()
+
+
+def definition(survey_id: int) -> dict | None:
+    """Cached {"id", "title", "description", "is_active", "questions": [{"id", "question_text", "question_type"}]}."""
+    now = time.monotonic()
+    cached = _definitions.get(survey_id)
+    if cached and cached[0] > now:
+        return cached[1]
+    survey = db.session.get(Survey, survey_id)
+    value = None
+    if survey:
+        questions = db.session.execute(
+            select(SurveyQuestion.id, SurveyQuestion.question_text, SurveyQuestion.question_type)
+            .where(SurveyQuestion.survey_id == survey_id)
+            .order_by(SurveyQuestion.order_index, SurveyQuestion.id)
+        )
+        value = {
+            "id": survey.id,
+            "title": survey.title,
+            "description": survey.description,
+            "is_active": bool(survey.is_active),
+            "questions": [{"id": i, "question_text": t, "question_type": k} for i, t, k in questions],
+        }
+    _definitions[survey_id] = (now + DEFINITION_TTL, value)
+    return value
+
+
+def parse(survey: dict, data) -> list:
+    """[(question_id, numeric value or None, text or None)] from form fields or JSON.
+
+    Accepts ``q<id>`` keys, or JSON ``{"answers": {"<id>": value}}``. Unknown
+    questions are ignored; raises ValueError when nothing was answered.
+    """
+    if isinstance(data, dict) and isinstance(data.get("answers"), dict):
+        data = {f"q{k}": v for k, v in data["answers"].items()}
+    if not hasattr(data, "get"):
+        raise ValueError("Expected form fields or a JSON object.")
+    answers = []
+    for q in survey["questions"]:
+        raw = data.get(f"q{q['id']}")
+        if raw is None:
+            continue
+        text = str(raw).strip()[:MAX_TEXT_LENGTH]
+        if not text:
+            continue
+        try:
+            value = float(text)
+        except ValueError:
+            value = None
+        if value is not None and math.isfinite(value):
+            answers.append((q["id"], value, None))
+        else:
+            answers.append((q["id"], None, text))
+    if not answers:
+        raise ValueError("Please answer at least one question.")
+    return answers
+
+
+def _write(submissions: list) -> None:
+    """Insert [(survey_id, respondent_id, answers, created_at)] with their stats. Caller commits."""
+    rows, per_survey = [], {}
+    for survey_id, respondent_id, answers, created_at in submissions:
+        for question_id, value, text in answers:
+            rows.append({
+                "survey_id": survey_id,
+                "question_id": question_id,
+                "response_value": value,
+                "response_text": text,
+                "respondent_id": respondent_id,
+                "created_at": created_at,
+            })
+            per_survey.setdefault(survey_id, []).append((question_id, value))
+    if rows:
+        db.session.connection().execute(insert(SurveyResponse.__table__), rows)
+    for survey_id, values in per_survey.items():
+        survey_stats.record(survey_id, values)
+
+
+def submit(survey: dict, answers: list) -> str:
+    """Store one submission (buffered when write-behind is on). Returns its respondent id."""
+    respondent_id = uuid.uuid4().hex
+    now = datetime.utcnow()
+    if current_app.config.get("SURVEY_WRITE_BEHIND") and _enqueue(survey["id"], respondent_id, answers, now):
+        return respondent_id
+    _write([(survey["id"], respondent_id, answers, now)])
+    db.session.commit()
+    return respondent_id
+
+
+def _buffer() -> sqlite3.Connection:
+    return local_db(
+        BUFFER_NAME,
+        "PRAGMA synchronous=FULL",  # an accepted submission survives a power loss, not just a crash
+        "CREATE TABLE IF NOT EXISTS pending ("
+        "id INTEGER PRIMARY KEY, survey_id INTEGER NOT NULL, respondent_id TEXT NOT NULL, "
+        "answers TEXT NOT NULL, created_at TEXT NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS failures (pending_id INTEGER PRIMARY KEY, attempts INTEGER NOT NULL, error TEXT)",
+        "CREATE TABLE IF NOT EXISTS dead_letter ("
+        "id INTEGER PRIMARY KEY, survey_id INTEGER NOT NULL, respondent_id TEXT NOT NULL, "
+        "answers TEXT NOT NULL, created_at TEXT NOT NULL, attempts INTEGER NOT NULL, error TEXT, failed_at TEXT NOT NULL)",
+    )
+
+
+def _buffer_exists() -> bool:
+    return (Path(current_app.config["CACHE_DIR"]) / f"{BUFFER_NAME}.db").exists()
+
+
+def _enqueue(survey_id: int, respondent_id: str, answers: list, created_at: datetime) -> bool:
+    """Append to the buffer; False when it is full or unavailable (the caller writes directly)."""
+    try:
+        conn = _buffer()
+        (waiting,) = conn.execute("SELECT count(*) FROM pending").fetchone()
+        if waiting >= current_app.config.get("SURVEY_BUFFER_MAX_PENDING", 20000):
+            _wake.set()
+            return False
+        conn.execute(
+            "INSERT INTO pending (survey_id, respondent_id, answers, created_at) VALUES (?, ?, ?, ?)",
+            (survey_id, respondent_id, json.dumps(answers), created_at.isoformat()),
+        )
+    except sqlite3.Error as e:
+        current_app.logger.warning("Survey buffer: enqueue failed, writing directly: %s", e)
+        return False
+    _start_flusher()
+    if waiting + 1 >= FLUSH_BATCH:
+        _wake.set()
+    return True
+
+
+def _existing_respondents(ids: list) -> set:
+    found = set()
+    for i in range(0, len(ids), LOOKUP_CHUNK):
+        found.update(
+            r for (r,) in db.session.execute(
+                select(SurveyResponse.respondent_id).where(SurveyResponse.respondent_id.in_(ids[i:i + LOOKUP_CHUNK])).distinct()
+            )
+        )
+    return found
+
+
+def _decode(row) -> tuple:
+    _id, survey_id, respondent_id, answers, created_at = row
+    return survey_id, respondent_id, [tuple(a) for a in json.loads(answers)], datetime.fromisoformat(created_at)
+
+
+def _failed(conn: sqlite3.Connection, row, error: Exception) -> bool:
+    """Count a failed attempt at one buffered submission; True when it was moved to dead_letter."""
+    message = f"{type(error).__name__}: {error}"[:500]
+    conn.execute(
+        "INSERT INTO failures (pending_id, attempts, error) VALUES (?, 1, ?) "
+        "ON CONFLICT (pending_id) DO UPDATE SET attempts = attempts + 1, error = excluded.error",
+        (row[0], message),
+    )
+    (attempts,) = conn.execute("SELECT attempts FROM failures WHERE pending_id = ?", (row[0],)).fetchone()
+    if attempts < MAX_FLUSH_ATTEMPTS:
+        return False
+    conn.execute(
+        "INSERT INTO dead_letter (survey_id, respondent_id, answers, created_at, attempts, error, failed_at) "
+        "SELECT survey_id, respondent_id, answers, created_at, ?, ?, ? FROM pending WHERE id = ?",
+        (attempts, message, datetime.utcnow().isoformat(), row[0]),
+    )
+    current_app.logger.error("Survey buffer: submission %s moved to dead_letter after %s attempts: %s", row[2], attempts, message)
+    return True
+
+
+def _write_each(conn: sqlite3.Connection, rows: list) -> list:
+    """Write submissions one transaction each. Returns the buffer ids that are done (written or dead-lettered)."""
+    done = []
+    for row in rows:
+        try:
+            _write([_decode(row)])
+            db.session.commit()
+        except DATABASE_UNAVAILABLE:
+            raise
+        except Exception as e:
+            db.session.rollback()
+            if not _failed(conn, row, e):
+                continue
+        done.append(row[0])
+    return done
+
+
+def _forget(conn: sqlite3.Connection, ids: list) -> None:
+    for i in range(0, len(ids), LOOKUP_CHUNK):
+        chunk = ids[i:i + LOOKUP_CHUNK]
+        marks = ",".join("?" * len(chunk))
+        conn.execute(f"DELETE FROM pending WHERE id IN ({marks})", chunk)
+        conn.execute(f"DELETE FROM failures WHERE pending_id IN ({marks})", chunk)
+
+
+def flush(max_batches: int = None) -> int:
+    """Move buffered submissions into the database. Returns how many were moved (or dead-lettered).
+
+    Each call passes over every buffered submission at most once, so one that
+    fails is retried by the next flush, not immediately.
+    """
+    if not _buffer_exists():
+        return 0
+    conn = _buffer()
+    moved = batches = 0
+    after = 0
+    while max_batches is None or batches < max_batches:
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError:
+            return moved  # another worker is flushing
+        try:
+            rows = conn.execute(
+                "SELECT id, survey_id, respondent_id, answers, created_at FROM pending WHERE id > ? ORDER BY id LIMIT ?",
+                (after, FLUSH_BATCH),
+            ).fetchall()
+            if not rows:
+                conn.execute("COMMIT")
+                return moved
+            written = _existing_respondents([r[2] for r in rows])
+            todo = [r for r in rows if r[2] not in written]
+            try:
+                _write([_decode(r) for r in todo])
+                db.session.commit()
+                done = [r[0] for r in rows]
+            except DATABASE_UNAVAILABLE:
+                raise
+            except Exception:
+                db.session.rollback()
+                done = [r[0] for r in rows if r[2] in written] + _write_each(conn, todo)
+            _forget(conn, done)
+            conn.execute("COMMIT")
+        except Exception:
+            db.session.rollback()
+            conn.execute("ROLLBACK")
+            raise
+        moved += len(done)
+        batches += 1
+        after = rows[-1][0]
+    return moved
+
+
+def pending() -> int:
+    """Submissions waiting in the buffer."""
+    if not _buffer_exists():
+        return 0
+    (waiting,) = _buffer().execute("SELECT count(*) FROM pending").fetchone()
+    return waiting
+
+
+def dead_letters() -> int:
+    """Submissions set aside after failing MAX_FLUSH_ATTEMPTS flushes."""
+    if not _buffer_exists():
+        return 0
+    (failed,) = _buffer().execute("SELECT count(*) FROM dead_letter").fetchone()
+    return failed
+
+
+def retry_dead_letters() -> int:
+    """Put dead-lettered submissions back in the buffer (e.g. after fixing their cause). Returns how many."""
+    if not _buffer_exists():
+        return 0
+    conn = _buffer()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        n = conn.execute(
+            "INSERT INTO pending (survey_id, respondent_id, answers, created_at) "
+            "SELECT survey_id, respondent_id, answers, created_at FROM dead_letter ORDER BY id"
+        ).rowcount
+        conn.execute("DELETE FROM dead_letter")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return n
+
+
+def _flush_in(app, where: str) -> None:
+    with app.app_context():
+        try:
+            flush()
+        except Exception:
+            app.logger.exception("Survey buffer: flush %s failed; submissions stay buffered", where)
+        finally:
+            db.session.remove()
+
+
+def _run_flusher(app) -> None:
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        _flush_in(app, "in background")
+
+
+def _start_flusher() -> None:
+    global _flusher
+    if _flusher is not None:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            app = current_app._get_current_object()
+            _flusher = threading.Thread(target=_run_flusher, args=(app,), name="gco-survey-flush", daemon=True)
+            _flusher.start()
+            atexit.register(_flush_in, app, "at exit")
@@ -0,0 +1,35 @@
+"""Help desk ticket business logic."""
+import re
+from datetime import datetime
+from sqlalchemy import func
+from extensions import db
+from models import Ticket
+from services import sequences
+
+TICKET_SEQUENCE = "TKT"
+
+
+def _highest_ticket_seq() -> int:
+    """Highest number used so far (seeds the sequence once). Older numbers were derived from ids."""
+    highest = db.session.query(func.max(Ticket.id)).scalar() or 0
+    rows = (
+        db.session.query(Ticket.ticket_number)
+        .order_by(func.length(Ticket.ticket_number).desc(), Ticket.ticket_number.desc())
+        .limit(20)
+    )
+    for (tn,) in rows:
+        m = re.fullmatch(r"TKT-\d{8}-(\d+)", tn)
+        if m:
+            highest = max(highest, int(m.group(1)))
+    return highest
+
+
+def reserve_ticket_numbers(count: int) -> list[str]:
+    """Reserve ``count`` ticket numbers (e.g. TKT-20250301-0042) in one allocation."""
+    first = sequences.allocate(TICKET_SEQUENCE, count, seed=_highest_ticket_seq)
+    day = datetime.utcnow().strftime("%Y%m%d")
+    return [f"TKT-{day}-{n:04d}" for n in range(first, first + count)]
+
+
+def generate_ticket_number() -> str:
+    return reserve_ticket_numbers(1)[0]
@@ -0,0 +1,136 @@
+"""In-memory visitor-name autocomplete for logbook check-in.
+
+Each worker keeps the distinct visitor names (normalized: accents stripped,
+case-folded, spaces collapsed) with their visit count, last purpose and last
+visit, plus a sorted array of search keys: the full name and every word-start
+suffix ("ana maria cruz", "maria cruz", "cruz"). A prefix lookup is a
+bisect plus a scan of the matching slice. The index is built on first use
+and then topped up with entries whose id is above the last one seen, at most
+every ``REFRESH_SECONDS``, so check-ins and imports made by other workers
+show up without a rebuild. Each top-up re-reads the last ``RESCAN_IDS`` ids
+and skips the ones already folded in, so rows committed out of id order
+(another worker's transaction finishing after a later one, or this worker's
+own check-ins added through ``record``) are not missed or counted twice.
+"""
+import heapq
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from sqlalchemy import select
+
+from models import LogbookEntry
+from utils.db_helpers import stream_select
+
+REFRESH_SECONDS = 5
+MAX_SUGGESTIONS = 10
+MAX_CANDIDATES = 1000  # names ranked per lookup; keeps one-letter queries cheap
+RESCAN_IDS = 500  # ids below the highest seen that every top-up reads again
+
+
+def normalize(name: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+class VisitorIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._visitors = {}  # normalized name -> {"name", "visits", "last_purpose", "last_seen"}
+        self._keys = []  # sorted (search key, normalized name)
+        self._last_id = 0
+        self._seen = set()  # ids above _last_id - RESCAN_IDS already folded in
+        self._checked_at = 0.0
+        self._built = False
+
+    def _add(self, name, purpose, time_in, keep_sorted: bool = True) -> None:
+        key = normalize(name)
+        if not key:
+            return
+        v = self._visitors.get(key)
+        if v is None:
+            v = self._visitors[key] = {"name": name.strip(), "visits": 0, "last_purpose": None, "last_seen": None}
+            words = key.split(" ")
+            for i in range(len(words)):
+                if keep_sorted:
+                    insort(self._keys, (" ".join(words[i:]), key))
+                else:
+                    self._keys.append((" ".join(words[i:]), key))
+        v["visits"] += 1
+        if time_in and (v["last_seen"] is None or time_in >= v["last_seen"]):
+            v["name"] = name.strip()  # keep the most recent spelling/casing
+            v["last_seen"] = time_in
+            if purpose:
+                v["last_purpose"] = purpose
+
+    def _load_since(self, last_id: int, keep_sorted: bool = True) -> None:
+        stmt = (
+            select(LogbookEntry.id, LogbookEntry.visitor_name, LogbookEntry.purpose, LogbookEntry.time_in)
+            .where(LogbookEntry.id > last_id)
+            .order_by(LogbookEntry.id)
+        )
+        for entry_id, name, purpose, time_in in stream_select(stmt):
+            if entry_id in self._seen:
+                continue
+            self._add(name, purpose, time_in, keep_sorted=keep_sorted)
+            self._seen.add(entry_id)
+            self._last_id = max(self._last_id, entry_id)
+        floor = self._last_id - RESCAN_IDS
+        self._seen = {i for i in self._seen if i > floor}
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if self._built and now - self._checked_at < REFRESH_SECONDS:
+            return
+        with self._lock:
+            if not self._built:
+                self._load_since(0, keep_sorted=False)
+                self._keys.sort()
+                self._built = True
+            elif now - self._checked_at >= REFRESH_SECONDS:
+                self._load_since(max(0, self._last_id - RESCAN_IDS))
+            self._checked_at = now
+
+    def record(self, entry: LogbookEntry) -> None:
+        """Fold in a check-in made by this worker (call after commit)."""
+        if not self._built:
+            return
+        with self._lock:
+            # _last_id is left alone: other workers' entries below this id may not be loaded yet.
+            # Below the re-read window the entry may already have been loaded, so it is not added again.
+            if entry.id > self._last_id - RESCAN_IDS and entry.id not in self._seen:
+                self._add(entry.visitor_name, entry.purpose, entry.time_in)
+                self._seen.add(entry.id)
+
+    def suggest(self, query: str, limit: int = MAX_SUGGESTIONS) -> list[dict]:
+        """Visitors whose name or any later word starts with ``query``, most frequent first."""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        self._refresh()
+        keys = self._keys
+        i = bisect_left(keys, (prefix, ""))
+        matches = set()
+        while i < len(keys) and keys[i][0].startswith(prefix) and len(matches) < MAX_CANDIDATES:
+            matches.add(keys[i][1])
+            i += 1
+        ranked = heapq.nlargest(
+            limit,
+            (self._visitors[k] for k in matches),
+            key=lambda v: (v["visits"], v["last_seen"] or datetime.min),
+        )
+        return [
+            {
+                "name": v["name"],
+                "visits": v["visits"],
+                "last_purpose": v["last_purpose"],
+                "last_seen": v["last_seen"].date().isoformat() if v["last_seen"] else None,
+            }
+            for v in ranked
+        ]
+
+
+visitor_index = VisitorIndex()
@@ -0,0 +1,66 @@
+"""Shared fixtures: the app on a throwaway SQLite database, cache, archive and upload directory."""
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_tmp = Path(tempfile.mkdtemp(prefix="gco-tests-"))
+os.environ["DATABASE_URL"] = "sqlite:///" + (_tmp / "app.db").as_posix()
+os.environ["CACHE_DIR"] = str(_tmp / "cache")
+os.environ["ARCHIVE_DIR"] = str(_tmp / "archive")
+
+from app import app as flask_app  # noqa: E402  (reads the environment above)
+from extensions import db  # noqa: E402
+from models import User  # noqa: E402
+
+flask_app.config.update(TESTING=True, UPLOAD_FOLDER=str(_tmp / "uploads"))
+
+
+@pytest.fixture
+def app():
+    """App context; every table is emptied after the test."""
+    with flask_app.app_context():
+        yield flask_app
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+        db.session.remove()
+        shutil.rmtree(flask_app.config["UPLOAD_FOLDER"], ignore_errors=True)
+        shutil.rmtree(flask_app.config["ARCHIVE_DIR"], ignore_errors=True)
+
+
+@pytest.fixture
+def client(app):
+    """Test client with CSRF protection on, as in production."""
+    return app.test_client()
+
+
+@pytest.fixture
+def staff(app):
+    user = User(username="staff", email="staff@example.com", role="Staff", full_name="Front Desk", email_verified=True)
+    user.set_password("secret")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def staff_client(client, staff):
+    """Test client logged in as ``staff``."""
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(staff.id)
+        sess["_fresh"] = True
+    return client
+
+
+@pytest.fixture
+def csrf_token():
+    """``csrf_token(client, path)``: the CSRF token a page renders for the client's session."""
+    def fetch(client, path: str) -> str:
+        page = client.get(path).get_data(as_text=True)
+        return re.search(r'name="csrf[-_]token" (?:value|content)="([^"]+)"', page).group(1)
+    return fetch
@@ -0,0 +1,56 @@
+"""Job runner: jobs orphaned by a restarted worker are picked up again by ``enqueue``."""
+import time
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Job
+from services import jobs
+
+KEY = "test:orphan"
+
+
+@jobs.job_handler("test_echo")
+def _echo(job, **params):
+    return params
+
+
+def _running(minutes_since_heartbeat, attempts=1):
+    job = Job(
+        kind="test_echo", params='{"n": 1}', dedupe_key=KEY, status="running", attempts=attempts,
+        worker="gone:1", heartbeat_at=datetime.utcnow() - timedelta(minutes=minutes_since_heartbeat),
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def _finished(job_id):
+    deadline = datetime.utcnow() + timedelta(seconds=30)
+    while True:
+        db.session.expire_all()
+        job = db.session.get(Job, job_id)
+        if job.status in ("done", "failed") or datetime.utcnow() > deadline:
+            return job
+        time.sleep(0.01)
+
+
+def test_enqueue_returns_a_job_that_is_still_running(app):
+    job_id = _running(minutes_since_heartbeat=1)
+    job = jobs.enqueue("test_echo", {"n": 1}, dedupe_key=KEY)
+    assert (job.id, job.status) == (job_id, "running")
+
+
+def test_enqueue_requeues_a_job_whose_worker_died(app):
+    job_id = _running(minutes_since_heartbeat=10)
+    job = jobs.enqueue("test_echo", {"n": 1}, dedupe_key=KEY)
+    assert job.id == job_id
+    job = _finished(job_id)
+    assert (job.status, job.result, job.dedupe_key) == ("done", '{"n": 1}', None)
+
+
+def test_enqueue_replaces_a_job_that_died_too_often(app):
+    job_id = _running(minutes_since_heartbeat=10, attempts=jobs.MAX_ATTEMPTS)
+    job = jobs.enqueue("test_echo", {"n": 1}, dedupe_key=KEY)
+    assert job.id != job_id
+    assert db.session.get(Job, job_id).status == "failed"
+    assert _finished(job.id).status == "done"
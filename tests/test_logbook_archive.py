@@ -0,0 +1,69 @@
+"""Archiving logbook months: later entries and interrupted runs lose or duplicate nothing."""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import LogbookEntry
+from services import logbook_archive, monthly_report
+
+
+def _visit(name, day, hour=9):
+    entry = LogbookEntry(visitor_name=name, time_in=datetime.combine(day, datetime.min.time()) + timedelta(hours=hour), date=day)
+    db.session.add(entry)
+    db.session.commit()
+    return entry
+
+
+def _visible(year, month) -> list:
+    """Visitor names of the month as the reports see them (archive file merged with live rows)."""
+    return sorted(r[2] for r in monthly_report.iter_transactions(year, month) if r[0] == "Logbook")
+
+
+def _archived(year, month) -> list:
+    return sorted(e.visitor_name for e in logbook_archive.entries_between(date(year, month, 1), date(year, month, 28)))
+
+
+def test_entry_reusing_an_archived_id_is_archived_not_deleted(app):
+    for i, name in enumerate(["Ana", "Ben", "Carla"]):
+        _visit(name, date(2020, 3, 2 + i))
+    assert [label for label, _n in logbook_archive.archive()] == ["2020-03"]
+    assert db.session.query(LogbookEntry).count() == 0
+
+    late = _visit("Dario", date(2020, 3, 10))  # SQLite hands out a deleted row's id again
+    assert late.id in {1, 2, 3}
+    assert _visible(2020, 3) == ["Ana", "Ben", "Carla", "Dario"]
+
+    assert logbook_archive.archive() == [("2020-03", 1)]
+    assert db.session.query(LogbookEntry).count() == 0
+    assert _archived(2020, 3) == ["Ana", "Ben", "Carla", "Dario"]
+    assert _visible(2020, 3) == ["Ana", "Ben", "Carla", "Dario"]
+
+
+def test_interrupted_run_neither_duplicates_nor_loses(app, monkeypatch):
+    for i, name in enumerate(["Ana", "Ben"]):
+        _visit(name, date(2020, 4, 2 + i))
+
+    def crash(*_args):
+        raise RuntimeError("worker killed")
+
+    monkeypatch.setattr(logbook_archive, "_delete_archived", crash)
+    with pytest.raises(RuntimeError):
+        logbook_archive.archive()
+    db.session.rollback()
+    assert db.session.query(LogbookEntry).count() == 2  # still in the table, and in the file
+    assert _visible(2020, 4) == ["Ana", "Ben"]
+
+    monkeypatch.undo()
+    _visit("Carla", date(2020, 4, 9))
+    ben = db.session.query(LogbookEntry).filter_by(visitor_name="Ben").one()
+    left = ben.time_in + timedelta(hours=1)
+    ben.time_out, ben.remarks = left, "Left his ID"  # edited before the rerun
+    db.session.commit()
+    assert logbook_archive.archive() == [("2020-04", 1)]
+    assert db.session.query(LogbookEntry).count() == 0
+    assert _archived(2020, 4) == ["Ana", "Ben", "Carla"]
+    archived_ben = next(e for e in logbook_archive.entries_between(date(2020, 4, 1), date(2020, 5, 1)) if e.visitor_name == "Ben")
+    assert (archived_ben.time_out, archived_ben.remarks) == (left, "Left his ID")
+    assert logbook_archive.manifest()["2020-04"]["daily"]["2020-04-03"] == [0, 1]
+    assert "pending" not in logbook_archive.manifest()["2020-04"]
@@ -0,0 +1,62 @@
+"""Batch check-in/check-out API with CSRF protection on."""
+import pytest
+
+from extensions import db
+from models import LogbookEntry
+
+KEY = "kiosk-test-key"
+BATCH = {"events": [
+    {"key": "evt-1", "type": "check_in", "visitor_name": "Ana Cruz", "purpose": "Enrollment"},
+    {"key": "evt-2", "type": "check_in", "visitor_name": "Ben Santos"},
+    {"key": "evt-3", "type": "check_out", "check_in_key": "evt-1"},
+]}
+
+
+@pytest.fixture(autouse=True)
+def kiosk_key(app, monkeypatch):
+    monkeypatch.setitem(app.config, "KIOSK_API_KEYS", [KEY])
+
+
+def test_kiosk_key_posts_a_batch_without_csrf_token(client):
+    resp = client.post("/logbook/api/events", json=BATCH, headers={"Authorization": f"Bearer {KEY}"})
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    assert resp.get_json()["summary"] == {"checked_in": 2, "checked_out": 1}
+    assert db.session.query(LogbookEntry).count() == 2
+
+    retry = client.post("/logbook/api/events", json=BATCH, headers={"Authorization": f"Bearer {KEY}"})
+    assert retry.get_json()["summary"] == {"duplicate": 3}
+    assert db.session.query(LogbookEntry).count() == 2
+
+
+def test_check_out_names_a_check_in_from_an_earlier_batch(client):
+    headers = {"Authorization": f"Bearer {KEY}"}
+    first = client.post("/logbook/api/events", json={"events": [
+        {"key": "a", "type": "check_in", "visitor_name": "Ana Cruz"},
+        {"key": "x", "type": "check_in", "visitor_name": "Ben Santos"},
+        {"key": "b", "type": "check_out", "check_in_key": "x"},
+    ]}, headers=headers).get_json()["results"]
+    entry_id = first[0]["entry_id"]
+    assert first[2]["status"] == "checked_out"
+
+    second = client.post("/logbook/api/events", json={"events": [
+        {"key": "c", "type": "check_out", "check_in_key": "a"},
+        {"key": "d", "type": "check_out", "check_in_key": "b"},  # a check-out key, not a check-in
+    ]}, headers=headers).get_json()["results"]
+    assert second[0] == {"key": "c", "status": "checked_out", "entry_id": entry_id}
+    assert second[1]["status"] == "not_found"
+    assert db.session.get(LogbookEntry, entry_id).time_out is not None
+
+
+def test_wrong_or_missing_key_is_refused(client):
+    assert client.post("/logbook/api/events", json=BATCH, headers={"Authorization": "Bearer nope"}).status_code == 401
+    assert client.post("/logbook/api/events", json=BATCH).status_code == 401
+    assert db.session.query(LogbookEntry).count() == 0
+
+
+def test_staff_session_needs_the_csrf_header(staff_client, csrf_token):
+    assert staff_client.post("/logbook/api/events", json=BATCH).status_code == 400
+
+    token = csrf_token(staff_client, "/logbook/")
+    resp = staff_client.post("/logbook/api/events", json=BATCH, headers={"X-CSRFToken": token})
+    assert resp.status_code == 200
+    assert resp.get_json()["summary"] == {"checked_in": 2, "checked_out": 1}
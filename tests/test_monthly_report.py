@@ -0,0 +1,36 @@
+"""Chronological order of the monthly transactions feed."""
+from datetime import date, datetime
+
+from extensions import db
+from models import Appointment, LogbookEntry, Ticket
+from services import monthly_report
+
+
+def _appointment(name, time):
+    return Appointment(
+        requester_name=name, requester_email="student@example.com", appointment_type="Counseling",
+        preferred_date=date(2024, 5, 6), preferred_time=time, status="Pending",
+    )
+
+
+def test_appointments_sort_by_their_preferred_time(app):
+    db.session.add_all([
+        LogbookEntry(visitor_name="Early visitor", time_in=datetime(2024, 5, 6, 8, 15), date=date(2024, 5, 6)),
+        _appointment("Afternoon", "14:30"),
+        Ticket(ticket_number="T-1", subject="Noon ticket", requester_name="Student", status="Open", created_at=datetime(2024, 5, 6, 12, 0)),
+        _appointment("Morning", "09:00"),
+        _appointment("Untimed", None),
+        LogbookEntry(visitor_name="Late visitor", time_in=datetime(2024, 5, 6, 16, 45), date=date(2024, 5, 6)),
+    ])
+    db.session.commit()
+    rows = list(monthly_report.iter_transactions(2024, 5))
+    assert [(r[1], r[2]) for r in rows] == [
+        ("2024-05-06", "Untimed"),
+        ("2024-05-06 08:15", "Early visitor"),
+        ("2024-05-06 09:00", "Morning"),
+        ("2024-05-06 12:00", "T-1"),
+        ("2024-05-06 14:30", "Afternoon"),
+        ("2024-05-06 16:45", "Late visitor"),
+    ]
+    page, more = monthly_report.transactions_page(2024, 5, per_page=10)
+    assert [r["Reference"] for r in page] == [r[2] for r in rows] and not more
@@ -0,0 +1,60 @@
+"""Keyset cursors: malformed or mistyped cursors fall back to the first page; list pages follow an index."""
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import event
+
+from extensions import db
+from utils.pagination import decode_cursor, encode_cursor
+
+KEY_TYPES = [datetime, int]
+
+
+def test_cursor_round_trip():
+    values = [datetime(2024, 5, 6, 9, 30), 42]
+    assert decode_cursor(encode_cursor(values), KEY_TYPES) == values
+    assert decode_cursor(encode_cursor([date(2024, 5, 6), "09:00", 7]), [date, str, int]) == [date(2024, 5, 6), "09:00", 7]
+
+
+@pytest.mark.parametrize("values", [
+    [[1], 1],
+    [{"x": 1}, 1],
+    ["2024-05-06", 1],
+    [datetime(2024, 5, 6), "1"],
+    [datetime(2024, 5, 6), True],
+    [None, 1],
+    [datetime(2024, 5, 6)],
+])
+def test_mistyped_cursor_is_rejected(values):
+    assert decode_cursor(encode_cursor(values), KEY_TYPES) is None
+
+
+def test_date_is_not_accepted_for_a_datetime_key():
+    assert decode_cursor(encode_cursor([date(2024, 5, 6), 1]), KEY_TYPES) is None
+
+
+def test_list_view_ignores_a_mistyped_cursor(staff_client):
+    resp = staff_client.get("/document-requests/", query_string={"after": encode_cursor([[1], 1])})
+    assert resp.status_code == 200
+
+
+@pytest.mark.parametrize("query", [{}, {"status": "Pending"}, {"appointment_type": "Online"}])
+def test_appointment_list_is_read_in_index_order(staff_client, query):
+    statements = []
+
+    def capture(_conn, _cursor, statement, parameters, _context, _many):
+        if statement.startswith("SELECT") and "FROM appointments" in statement and "ORDER BY" in statement:
+            statements.append((statement, parameters))
+
+    cursor = encode_cursor([date(2024, 5, 6), "09:00", 7])
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        assert staff_client.get("/appointments/", query_string=query).status_code == 200
+        assert staff_client.get("/appointments/", query_string={**query, "after": cursor}).status_code == 200
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+    assert len(statements) == 2
+    with db.engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = " ".join(row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters))
+            assert "USING INDEX ix_appointments_" in plan and "TEMP B-TREE" not in plan, plan
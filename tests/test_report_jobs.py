@@ -0,0 +1,90 @@
+"""Report rendering jobs over a month with more than PROGRESS_EVERY rows."""
+import csv
+import io
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from extensions import db
+from models import Job, LogbookEntry, MonthlyReport
+from services import jobs, monthly_report, report_artifacts
+
+ROWS = 5000
+
+
+@pytest.fixture
+def busy_month(app):
+    start = datetime(2024, 3, 1, 8)
+    db.session.execute(insert(LogbookEntry.__table__), [
+        {
+            "visitor_name": f"Visitor {i}",
+            "purpose": "Consultation",
+            "time_in": start + timedelta(minutes=i),
+            "date": (start + timedelta(minutes=i)).date(),
+        }
+        for i in range(ROWS)
+    ])
+    report = MonthlyReport(report_month=3, report_year=2024, report_type="all_transactions", summary_data="{}")
+    db.session.add(report)
+    db.session.commit()
+    return report
+
+
+def _warm_pool():
+    """Leave several idle pooled connections, as a busy worker has: the next checkout may be another connection."""
+    with db.engine.connect(), db.engine.connect(), db.engine.connect():
+        pass
+
+
+def _run_render(app, report, fmt):
+    _warm_pool()
+    job = Job(kind="report_render", params=f'{{"report_id": {report.id}, "fmt": "{fmt}"}}', status="queued")
+    db.session.add(job)
+    db.session.commit()
+    jobs._run(app, job.id)
+    db.session.expire_all()
+    return db.session.get(Job, job.id)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "xlsx"])
+def test_render_job_reports_progress_while_streaming(app, busy_month, fmt):
+    assert ROWS > monthly_report.PROGRESS_EVERY
+    job = _run_render(app, busy_month, fmt)
+    assert job.status == "done", job.error
+    assert job.progress == 100
+    path = report_artifacts.cached_artifact(busy_month, fmt)
+    assert path is not None
+    if fmt == "csv":
+        rows = list(csv.reader(io.StringIO(path.read_text(encoding="utf-8-sig"))))
+        assert len(rows) == ROWS + 1
+        assert rows[1][0] == "Logbook"
+
+
+def test_progress_is_visible_from_other_sessions_while_rendering(app, busy_month):
+    seen = []
+
+    def progress(rows_done):
+        jobs.report_progress(job, 50, f"{rows_done} rows")
+        with db.engine.connect() as conn:
+            seen.append(conn.execute(db.select(Job.message).where(Job.id == job.id)).scalar())
+
+    job = Job(kind="report_render", params="{}", status="running")
+    db.session.add(job)
+    db.session.commit()
+    report_artifacts.build_artifact(busy_month, "csv", progress=progress)
+    assert seen[0] == f"{monthly_report.PROGRESS_EVERY} rows"
+    assert seen[-1] == f"{ROWS} rows"
+
+
+def test_queued_render_job_completes_on_the_job_pool(app, busy_month):
+    from services.report_jobs import queue_render
+    job = queue_render(busy_month, "csv")
+    jobs._get_executor().submit(lambda: None).result()  # the pool runs jobs in order; wait for ours
+    deadline = datetime.utcnow() + timedelta(seconds=30)
+    while datetime.utcnow() < deadline:
+        db.session.expire_all()
+        job = db.session.get(Job, job.id)
+        if job.status in ("done", "failed"):
+            break
+    assert job.status == "done", job.error
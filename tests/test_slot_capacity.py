@@ -0,0 +1,108 @@
+"""Slot capacity ledger: concurrent claims, rejected reschedules, and agreement with rebuild()."""
+import threading
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
+from extensions import db
+from models import Appointment, AppointmentSlotCapacity, AppointmentSlotLoad
+from services import slot_capacity
+
+DAY = date.today() + timedelta(days=7)
+
+
+def _ledger() -> dict:
+    rows = db.session.execute(
+        select(AppointmentSlotLoad.day, AppointmentSlotLoad.slot, AppointmentSlotLoad.appointment_type, AppointmentSlotLoad.booked)
+        .where(AppointmentSlotLoad.booked != 0)
+    )
+    return {(d, s, t): n for d, s, t, n in rows}
+
+
+def _book(name, slot, apt_type="Counseling", day=DAY):
+    """What the book route does: claim, insert, commit."""
+    err = slot_capacity.claim(day, slot, apt_type)
+    if err:
+        db.session.rollback()
+        return err
+    apt = Appointment(
+        requester_name=name, requester_email=f"{name.lower()}@example.com", appointment_type=apt_type,
+        preferred_date=day, preferred_time=slot, status="Pending",
+    )
+    db.session.add(apt)
+    db.session.commit()
+    return apt
+
+
+def test_concurrent_claims_on_the_last_place(app):
+    db.session.add(AppointmentSlotCapacity(appointment_type="", slot="09:00", capacity=2))
+    db.session.commit()
+    assert isinstance(_book("First", "09:00"), Appointment)
+
+    workers = 6
+    barrier = threading.Barrier(workers)
+    results = []
+
+    def attempt(n):
+        with app.app_context():
+            barrier.wait()
+            try:
+                results.append(_book(f"Racer{n}", "09:00"))
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=attempt, args=(n,)) for n in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    booked = [r for r in results if isinstance(r, Appointment)]
+    assert len(results) == workers
+    assert len(booked) == 1
+    assert all("fully booked" in r for r in results if isinstance(r, str))
+    assert db.session.query(Appointment).filter_by(preferred_time="09:00").count() == 2
+    assert _ledger()[(DAY, "09:00", "")] == 2
+
+
+def test_reschedule_into_a_full_slot_is_rejected(staff_client, csrf_token):
+    _book("Ana", "09:00")
+    ben = _book("Ben", "10:00")
+    before = _ledger()
+
+    token = csrf_token(staff_client, f"/appointments/{ben.id}/edit")
+    resp = staff_client.post(f"/appointments/{ben.id}/edit", data={
+        "csrf_token": token, "preferred_date": DAY.isoformat(), "preferred_time": "09:00", "status": "Pending",
+    })
+    assert resp.status_code == 200
+    assert b"fully booked" in resp.data
+    db.session.expire_all()
+    assert db.session.get(Appointment, ben.id).preferred_time == "10:00"
+    assert _ledger() == before
+
+
+def test_routes_keep_the_ledger_equal_to_a_rebuild(client, staff_client, csrf_token):
+    token = csrf_token(client, "/appointments/book")
+    for name, slot, apt_type in [("Ana", "09:00", "Counseling"), ("Ben", "10:00", "Consultation"), ("Carla", "13:00", "Counseling")]:
+        resp = client.post("/appointments/book", data={
+            "csrf_token": token, "requester_name": name, "requester_email": f"{name.lower()}@example.com",
+            "appointment_type": apt_type, "preferred_date": DAY.isoformat(), "preferred_time": slot,
+        })
+        assert resp.status_code == 302, resp.get_data(as_text=True)
+    ana, ben, carla = db.session.query(Appointment).order_by(Appointment.id).all()
+
+    token = csrf_token(staff_client, "/appointments/")
+    later = (DAY + timedelta(days=1)).isoformat()
+    staff_client.post(f"/appointments/{ana.id}/edit", data={"csrf_token": token, "preferred_date": later, "preferred_time": "11:00", "status": "Pending"})
+    staff_client.post(f"/appointments/{ben.id}/accept", data={"csrf_token": token})
+    staff_client.post(f"/appointments/{carla.id}/status", data={"csrf_token": token, "status": "Cancelled"})
+
+    incremental = _ledger()
+    assert incremental == {
+        (DAY + timedelta(days=1), "11:00", ""): 1,
+        (DAY + timedelta(days=1), "11:00", "Counseling"): 1,
+        (DAY, "10:00", ""): 1,
+        (DAY, "10:00", "Consultation"): 1,
+    }
+    slot_capacity.rebuild()
+    assert _ledger() == incremental
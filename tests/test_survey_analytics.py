@@ -0,0 +1,49 @@
+"""Survey cross-tabs: label order and the bucket of grouped answers."""
+import pytest
+
+from extensions import db
+from models import Survey, SurveyQuestion
+from services import survey_analytics, survey_submissions
+
+
+@pytest.fixture
+def survey(app):
+    survey_analytics.analytics_cache.clear()
+    survey_submissions._definitions.clear()
+    s = Survey(title="Orientation feedback")
+    db.session.add(s)
+    db.session.flush()
+    q1 = SurveyQuestion(survey_id=s.id, question_text="Favourite session", question_type="text", order_index=0)
+    q2 = SurveyQuestion(survey_id=s.id, question_text="Rating", question_type="rating", order_index=1)
+    db.session.add_all([q1, q2])
+    db.session.commit()
+    return s, q1, q2
+
+
+def _respond(s, q1, q2, first, second):
+    definition = survey_submissions.definition(s.id)
+    survey_submissions.submit(definition, survey_submissions.parse(definition, {f"q{q1.id}": first, f"q{q2.id}": second}))
+
+
+def test_nan_and_inf_answers_sort_as_text(survey):
+    s, q1, q2 = survey
+    for first, second in [("abc", "nan"), ("2", "inf"), ("nan", "2"), ("inf", "abc"), ("10", "10")]:
+        _respond(s, q1, q2, first, second)
+    result = survey_analytics.crosstab(s.id, q1.id, q2.id)
+    assert result["rows"] == ["2", "10", "abc", "inf", "nan"]
+    assert result["columns"] == ["2", "10", "abc", "inf", "nan"]
+    assert result["respondents"] == 5
+
+
+def test_real_other_answer_is_not_merged_into_the_grouped_bucket(survey):
+    s, q1, q2 = survey
+    for _ in range(3):
+        _respond(s, q1, q2, "Other", "5")
+    for n in range(survey_analytics.MAX_CROSSTAB_CATEGORIES + 2):
+        _respond(s, q1, q2, f"Session {n:02d}", "4")
+    result = survey_analytics.crosstab(s.id, q1.id, q2.id)
+    assert len(result["rows"]) == survey_analytics.MAX_CROSSTAB_CATEGORIES + 1
+    assert result["rows"][-1] == survey_analytics.OTHER
+    counts = dict(zip(result["rows"], result["counts"]))
+    assert counts["Other"] == [0, 3]  # columns "4", "5"
+    assert sum(counts[survey_analytics.OTHER]) == 3  # the three least frequent sessions
@@ -0,0 +1,80 @@
+"""Public survey submissions: CSRF on the respond endpoint and the write-behind buffer's dead letters."""
+import json
+from datetime import datetime
+
+import pytest
+
+from extensions import db
+from models import Survey, SurveyQuestion, SurveyResponse
+from services import survey_submissions
+
+
+@pytest.fixture
+def survey(app):
+    survey_submissions._definitions.clear()
+    s = Survey(title="Career fair")
+    db.session.add(s)
+    db.session.flush()
+    q = SurveyQuestion(survey_id=s.id, question_text="How useful was it?", question_type="rating", order_index=0)
+    db.session.add(q)
+    db.session.commit()
+    return s, q
+
+
+@pytest.fixture
+def buffer(app):
+    conn = survey_submissions._buffer()
+    yield conn
+    for table in ("pending", "failures", "dead_letter"):
+        conn.execute(f"DELETE FROM {table}")
+
+
+def _responses(survey_id):
+    return db.session.query(SurveyResponse).filter_by(survey_id=survey_id).count()
+
+
+def test_json_submission_needs_no_csrf_token(client, survey):
+    s, q = survey
+    resp = client.post(f"/surveys/{s.id}/respond", json={"answers": {str(q.id): 5}})
+    assert resp.status_code == 201
+    assert _responses(s.id) == 1
+
+
+def test_form_submission_still_needs_csrf_token(client, survey, csrf_token):
+    s, q = survey
+    assert client.post(f"/surveys/{s.id}/respond", data={f"q{q.id}": "5"}).status_code == 400
+    assert _responses(s.id) == 0
+    token = csrf_token(client, f"/surveys/{s.id}/respond")
+    assert client.post(f"/surveys/{s.id}/respond", data={f"q{q.id}": "5", "csrf_token": token}).status_code == 302
+    assert _responses(s.id) == 1
+
+
+def test_submission_that_keeps_failing_is_dead_lettered(survey, buffer):
+    s, q = survey
+    now = datetime.utcnow().isoformat()
+    buffer.execute(
+        "INSERT INTO pending (survey_id, respondent_id, answers, created_at) VALUES (?, ?, ?, ?)",
+        (s.id, "broken", "not json", now),
+    )
+    buffer.execute(
+        "INSERT INTO pending (survey_id, respondent_id, answers, created_at) VALUES (?, ?, ?, ?)",
+        (s.id, "good", json.dumps([[q.id, 4.0, None]]), now),
+    )
+
+    assert survey_submissions.flush() == 1  # the good one goes through despite the broken one ahead of it
+    assert _responses(s.id) == 1
+    assert survey_submissions.pending() == 1
+    for _ in range(survey_submissions.MAX_FLUSH_ATTEMPTS - 2):
+        assert survey_submissions.flush() == 0
+    assert survey_submissions.dead_letters() == 0
+
+    assert survey_submissions.flush() == 1
+    assert survey_submissions.pending() == 0
+    assert survey_submissions.dead_letters() == 1
+    respondent, attempts, error = buffer.execute("SELECT respondent_id, attempts, error FROM dead_letter").fetchone()
+    assert (respondent, attempts) == ("broken", survey_submissions.MAX_FLUSH_ATTEMPTS)
+    assert error.startswith("JSONDecodeError")
+
+    assert survey_submissions.retry_dead_letters() == 1
+    assert survey_submissions.pending() == 1
+    assert survey_submissions.dead_letters() == 0
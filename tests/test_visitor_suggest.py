@@ -0,0 +1,49 @@
+"""Visitor autocomplete with check-ins from several workers."""
+from datetime import date, datetime
+
+from extensions import db
+from models import LogbookEntry
+from services.visitor_suggest import VisitorIndex
+
+
+def _check_in(name, purpose="Consultation"):
+    entry = LogbookEntry(visitor_name=name, purpose=purpose, time_in=datetime.utcnow(), date=date.today())
+    db.session.add(entry)
+    db.session.commit()
+    return entry
+
+
+def _refreshed(index):
+    index._checked_at = 0.0  # next lookup tops up from the database
+    return index
+
+
+def test_other_workers_lower_ids_are_not_skipped_after_record(app):
+    index = VisitorIndex()
+    _check_in("Ana Cruz")
+    assert index.suggest("ana")[0]["visits"] == 1
+
+    _check_in("Zelda Reyes")  # worker B; this index has not seen it yet
+    mine = _check_in("Ana Cruz")  # worker A, higher id
+    index.record(mine)
+
+    _refreshed(index)
+    assert [s["name"] for s in index.suggest("zelda")] == ["Zelda Reyes"]
+    assert index.suggest("ana")[0]["visits"] == 2  # recorded once, not again on top-up
+
+
+def test_rows_committed_out_of_id_order_are_picked_up(app):
+    index = VisitorIndex()
+    first = _check_in("Ben Santos")
+    index.suggest("ben")
+    late = LogbookEntry(id=first.id + 5, visitor_name="Carla Lim", time_in=datetime.utcnow(), date=date.today())
+    db.session.add(late)
+    db.session.commit()
+    _refreshed(index).suggest("carla")
+
+    early = LogbookEntry(id=first.id + 2, visitor_name="Dario Cruz", time_in=datetime.utcnow(), date=date.today())
+    db.session.add(early)  # an id below the highest seen, committed later
+    db.session.commit()
+    assert [s["name"] for s in _refreshed(index).suggest("dario")] == ["Dario Cruz"]
+    assert index.suggest("carla")[0]["visits"] == 1
+    assert index.suggest("ben")[0]["visits"] == 1
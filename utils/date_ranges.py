@@ -0,0 +1,98 @@
+"""Dialect-portable date ranges and buckets for report queries.
+
+Filters are half-open ranges on the raw column (``col >= start AND col < end``)
+so an index on the column can be used; only GROUP BY labels go through a
+dialect-specific truncation function.
+"""
+from datetime import date, datetime
+
+from sqlalchemy import Date, DateTime, Time, and_, case, cast, func, true
+
+from utils.db_helpers import dialect_name
+
+
+def month_start(year: int, month: int) -> date:
+    return date(year, month, 1)
+
+
+def next_month(year: int, month: int) -> tuple[int, int]:
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def month_range(year: int, month: int) -> tuple[date, date]:
+    """Half-open [first day of month, first day of next month)."""
+    return month_start(year, month), month_start(*next_month(year, month))
+
+
+def year_range(year: int) -> tuple[date, date]:
+    """Half-open [Jan 1, Jan 1 of next year)."""
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def _bound_for(column, value):
+    """Coerce a date/datetime bound to the column's type so comparisons stay sargable."""
+    col_type = getattr(column, "type", None)
+    if isinstance(col_type, DateTime) and not isinstance(value, datetime):
+        return datetime.combine(value, datetime.min.time())
+    if isinstance(col_type, Date) and not isinstance(col_type, DateTime) and isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def in_range(column, start, end):
+    """SQL predicate ``start <= column < end``. Either bound may be None (open-ended)."""
+    conditions = []
+    if start is not None:
+        conditions.append(column >= _bound_for(column, start))
+    if end is not None:
+        conditions.append(column < _bound_for(column, end))
+    return and_(true(), *conditions)
+
+
+def in_month(column, year: int, month: int):
+    """SQL predicate selecting rows of one calendar month."""
+    return in_range(column, *month_range(year, month))
+
+
+def month_bucket(column):
+    """'YYYY-MM' label expression for GROUP BY, using the current dialect's truncation."""
+    dialect = dialect_name()
+    if dialect == "postgresql":
+        return func.to_char(func.date_trunc("month", column), "YYYY-MM")
+    if dialect in ("mysql", "mariadb"):
+        return func.date_format(column, "%Y-%m")
+    return func.strftime("%Y-%m", column)
+
+
+def day_bucket(column):
+    """Calendar-day expression for GROUP BY on a DateTime column."""
+    if dialect_name() == "postgresql":
+        return cast(column, Date)
+    return func.date(column)
+
+
+def at_time(date_column, time_column):
+    """Timestamp expression for a Date column plus an 'HH:MM' time-of-day string column.
+
+    Midnight of the date when the time is missing or not a valid HH:MM.
+    """
+    dialect = dialect_name()
+    if dialect == "postgresql":
+        valid = time_column.op("~")(r"^([01][0-9]|2[0-3]):[0-5][0-9]$")
+        return case((valid, date_column + cast(time_column, Time)), else_=cast(date_column, DateTime))
+    if dialect in ("mysql", "mariadb"):
+        return func.coalesce(func.timestamp(date_column, time_column), func.timestamp(date_column))
+    return func.coalesce(func.datetime(date_column, time_column), func.datetime(date_column))
+
+
+def as_date(value) -> date | None:
+    """Normalize a day bucket result (SQLite returns 'YYYY-MM-DD' strings) to a date."""
+    if value is None or isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    return date.fromisoformat(str(value)[:10])
+
+
+def ym_label(year: int, month: int) -> str:
+    return f"{year}-{month:02d}"
@@ -0,0 +1,43 @@
+"""Small SQL helpers shared by services (dialect detection, batched streaming, atomic upsert-increment)."""
+from sqlalchemy import and_, insert, update
+
+from extensions import db
+
+
+def dialect_name() -> str:
+    """Name of the current database dialect, e.g. 'sqlite' or 'postgresql'."""
+    return db.session.get_bind().dialect.name
+
+
+def stream_select(stmt, batch_size: int = 1000):
+    """Execute a Core select and iterate its rows in batches (server-side cursor where supported)."""
+    return db.session.execute(stmt.execution_options(yield_per=batch_size))
+
+
+def increment(model, keys: dict, deltas: dict) -> None:
+    """Atomically add ``deltas`` to the row identified by ``keys``, inserting it if missing.
+
+    ``keys`` must match a unique constraint on the table. Runs in the current
+    session transaction; the caller commits.
+    """
+    table = model.__table__
+    dialect = dialect_name()
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table).values(**keys, **deltas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c[k] for k in keys],
+            set_={k: table.c[k] + stmt.excluded[k] for k in deltas},
+        )
+        db.session.execute(stmt)
+        return
+    # Other dialects: update first, insert when no row matched
+    where = and_(*[table.c[k] == v for k, v in keys.items()])
+    result = db.session.execute(
+        update(table).where(where).values({k: table.c[k] + v for k, v in deltas.items()})
+    )
+    if not result.rowcount:
+        db.session.execute(insert(table).values(**keys, **deltas))
@@ -1,8 +1,11 @@
 """Route decorators for role-based access."""
+import hmac
 from functools import wraps
-from flask import abort
+from flask import abort, current_app, request
 from flask_login import current_user
 
+from extensions import csrf
+
 
 def staff_required(f):
     """Only Admin or Staff can access."""
@@ -14,3 +17,30 @@ def staff_required(f):
             abort(403)
         return f(*args, **kwargs)
     return inner
+
+
+def _kiosk_key_valid(key: str) -> bool:
+    return any(hmac.compare_digest(key.encode(), k.encode()) for k in current_app.config.get("KIOSK_API_KEYS") or ())
+
+
+def kiosk_or_staff_required(f):
+    """JSON APIs for kiosks: a key from KIOSK_API_KEYS (``Authorization: Bearer <key>``), or a
+    logged-in Admin/Staff session that sends its CSRF token in an ``X-CSRFToken`` header.
+
+    Exempt the view from CSRFProtect (``@csrf.exempt`` above this decorator); the
+    session path checks the token here, a key needs none since no cookie is involved.
+    """
+    @wraps(f)
+    def inner(*args, **kwargs):
+        auth = request.headers.get("Authorization", "")
+        if auth.startswith("Bearer "):
+            if not _kiosk_key_valid(auth[7:].strip()):
+                abort(401)
+            return f(*args, **kwargs)
+        if not current_user.is_authenticated:
+            abort(401)
+        if not current_user.is_staff:
+            abort(403)
+        csrf.protect()
+        return f(*args, **kwargs)
+    return inner
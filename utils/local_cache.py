@@ -0,0 +1,109 @@
+"""Small key/value cache in a local SQLite file, shared by all gunicorn workers of an instance.
+
+Values are JSON; every entry has its own TTL and the file is bounded to
+``max_entries`` with least-recently-used eviction. The cache is best effort:
+any SQLite error (locked file, full disk) is logged and treated as a miss, so
+callers always fall back to the database.
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from flask import current_app
+
+MISS = object()  # returned by get() when the key is not cached (None is a valid cached value)
+TOUCH_AFTER_SECONDS = 30  # refresh last-access time at most this often per key, to keep reads read-only
+
+_local = threading.local()
+
+
+def local_db(name: str, *ddl: str) -> sqlite3.Connection:
+    """This thread's autocommit connection to ``CACHE_DIR/<name>.db`` (WAL), running ``ddl`` on first open."""
+    path = str(Path(current_app.config["CACHE_DIR"]) / f"{name}.db")
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=1.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in ddl:
+            conn.execute(statement)
+        conns[path] = conn
+    return conn
+
+
+class LocalCache:
+    def __init__(self, name: str, max_entries: int = 5000):
+        self.name = name
+        self.max_entries = max_entries
+
+    def _conn(self) -> sqlite3.Connection:
+        return local_db(
+            self.name,
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT, expires REAL NOT NULL, accessed REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS ix_cache_accessed ON cache (accessed)",
+        )
+
+    def _failed(self, action: str, e: Exception) -> None:
+        current_app.logger.warning("Local cache %s: %s failed: %s", self.name, action, e)
+
+    def get(self, key: str):
+        """Cached value for ``key``, or ``MISS``."""
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute("SELECT value, expires, accessed FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return MISS
+            value, expires, accessed = row
+            if expires <= now:
+                conn.execute("DELETE FROM cache WHERE key = ? AND expires <= ?", (key, now))
+                return MISS
+            if now - accessed > TOUCH_AFTER_SECONDS:
+                conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            self._failed("get", e)
+            return MISS
+        return json.loads(value)
+
+    def set(self, key: str, value, ttl: float) -> None:
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now),
+            )
+            self._evict(conn, now)
+        except sqlite3.Error as e:
+            self._failed("set", e)
+
+    def delete(self, *keys: str) -> None:
+        if not keys:
+            return
+        try:
+            self._conn().executemany("DELETE FROM cache WHERE key = ?", [(k,) for k in keys])
+        except sqlite3.Error as e:
+            self._failed("delete", e)
+
+    def clear(self) -> None:
+        try:
+            self._conn().execute("DELETE FROM cache")
+        except sqlite3.Error as e:
+            self._failed("clear", e)
+
+    def _evict(self, conn, now: float) -> None:
+        (count,) = conn.execute("SELECT count(*) FROM cache").fetchone()
+        if count <= self.max_entries:
+            return
+        conn.execute("DELETE FROM cache WHERE expires <= ?", (now,))
+        conn.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT "
+            "max(0, (SELECT count(*) FROM cache) - ?))",
+            (self.max_entries,),
+        )
@@ -0,0 +1,167 @@
+"""Keyset (seek) pagination for list views.
+
+Pages are addressed by an opaque cursor holding the sort key of the first or
+last row shown, and fetched with ``WHERE (sort..., id) < (:values)`` against an
+index on the same columns. Every page costs the same no matter how deep it is,
+unlike OFFSET, and rows inserted meanwhile do not shift the pages.
+"""
+import base64
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from flask import request
+from sqlalchemy import tuple_
+
+PER_PAGE = 25
+MAX_PER_PAGE = 100
+
+
+def _encode_value(v):
+    if isinstance(v, datetime):
+        return {"dt": v.isoformat()}
+    if isinstance(v, date):
+        return {"d": v.isoformat()}
+    return v
+
+
+def _decode_value(v):
+    if isinstance(v, dict):
+        if "dt" in v:
+            return datetime.fromisoformat(v["dt"])
+        if "d" in v:
+            return date.fromisoformat(v["d"])
+    return v
+
+
+def encode_cursor(values) -> str:
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _key_type(key) -> type | None:
+    """Python type of a sort key column (str, int, date, datetime...), None if unknown."""
+    try:
+        return key.type.python_type
+    except (AttributeError, NotImplementedError):
+        return None
+
+
+def _valid_value(value, expected: type | None) -> bool:
+    if expected is not None:
+        return type(value) is expected  # exact: a datetime is not a date, a bool is not an int
+    return isinstance(value, (str, int, float, date)) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor: str, types: list) -> list | None:
+    """Sort key from a cursor, or None if it is missing, malformed or its values do not match ``types``."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            return None
+        values = [_decode_value(v) for v in values]
+    except (ValueError, TypeError):
+        return None
+    return values if all(_valid_value(v, t) for v, t in zip(values, types)) else None
+
+
+def list_args(*names: str) -> dict:
+    """List-view filters from the query string.
+
+    Returns the named text filters (stripped, '' when absent), ``date_from``
+    and ``date_to`` as entered, and ``start``/``end`` as a half-open date
+    range (``end`` is the day after ``date_to``; None when unset or invalid).
+    """
+    args = {name: request.args.get(name, "").strip() for name in names}
+    for name in ("date_from", "date_to"):
+        args[name] = request.args.get(name, "").strip()
+    try:
+        args["start"] = date.fromisoformat(args["date_from"]) if args["date_from"] else None
+    except ValueError:
+        args["start"] = None
+    try:
+        args["end"] = date.fromisoformat(args["date_to"]) + timedelta(days=1) if args["date_to"] else None
+    except ValueError:
+        args["end"] = None
+    return args
+
+
+def filter_params(args: dict) -> dict:
+    """Non-empty filters from ``list_args`` as query parameters for pager links."""
+    return {k: v for k, v in args.items() if v and k not in ("start", "end")}
+
+
+def page_args() -> dict:
+    """Cursor and page size from the query string, as keyword arguments for ``keyset_page``."""
+    try:
+        per_page = int(request.args.get("per_page") or PER_PAGE)
+    except ValueError:
+        per_page = PER_PAGE
+    return {"after": request.args.get("after"), "before": request.args.get("before"), "per_page": per_page}
+
+
+@dataclass
+class KeysetPage:
+    items: list
+    next_cursor: str | None  # older rows
+    prev_cursor: str | None  # newer rows
+    per_page: int
+
+    @property
+    def per_page_param(self) -> int | None:
+        """``per_page`` for pager links, None (omitted) when it is the default."""
+        return self.per_page if self.per_page != PER_PAGE else None
+
+
+def keyset_page(
+    query, keys, after: str = None, before: str = None, per_page: int = PER_PAGE, row_key=None
+) -> KeysetPage:
+    """One page of ``query`` in descending order of ``keys`` (the last key must be unique, e.g. id).
+
+    ``keys`` are column expressions; pass ``after`` (the next_cursor of the
+    previous page) to go forward or ``before`` (a prev_cursor) to go back.
+    ``row_key(row)`` returns a row's key values; by default the attributes
+    named like the key columns are used.
+    """
+    per_page = max(1, min(MAX_PER_PAGE, per_page))
+    key_tuple = tuple_(*keys)
+    types = [_key_type(k) for k in keys]
+    after_values = decode_cursor(after, types)
+    before_values = decode_cursor(before, types) if after_values is None else None
+
+    if before_values is not None:
+        rows = (
+            query.filter(key_tuple > tuple_(*before_values))
+            .order_by(*[k.asc() for k in keys])
+            .limit(per_page + 1)
+            .all()
+        )
+        has_more_newer = len(rows) > per_page
+        rows = list(reversed(rows[:per_page]))
+        has_more_older = True
+    else:
+        q = query
+        if after_values is not None:
+            q = q.filter(key_tuple < tuple_(*after_values))
+        rows = q.order_by(*[k.desc() for k in keys]).limit(per_page + 1).all()
+        has_more_older = len(rows) > per_page
+        rows = rows[:per_page]
+        has_more_newer = after_values is not None
+
+    if row_key is None:
+        def row_key(row):
+            return [getattr(row, k.key) for k in keys]
+
+    def cursor_for(row):
+        return encode_cursor(row_key(row))
+
+    return KeysetPage(
+        items=rows,
+        next_cursor=cursor_for(rows[-1]) if rows and has_more_older else None,
+        prev_cursor=cursor_for(rows[0]) if rows and has_more_newer else None,
+        per_page=per_page,
+    )
+